@@ -15,7 +15,11 @@ MAX_RETRIES = 3
 # request timeout - in seconds
 TIMEOUT = 5
 
+# Connections kept open per host by each session
+POOL_SIZE = 10
+
 # Example {"http":"proxy_here","https":"proxy_here"} Accepts python dictionary.
+# These are defaults: InstaGPy(proxy=..., timeout=..., max_retries=..., pool_size=...) overrides them per instance.
 PROXY = None
 
 # Directory to save and load logged in sessions/cookies
@@ -15,7 +15,7 @@ from functools import reduce
 
 class InstaGPy:
 
-    def __init__(self, use_mutiple_account=False, session_ids=None, min_requests=None, max_requests=None):
+    def __init__(self, use_mutiple_account=False, session_ids=None, min_requests=None, max_requests=None, proxy=None, timeout=None, max_retries=None, pool_size=None):
         """
 
         Args:
@@ -23,7 +23,10 @@ class InstaGPy:
             session_ids (list, optional): List of Session IDs from Cookies. Applicable only if use_mutiple_accounts is True. Defaults to False.
             min_requests (int, optional): Minimum requests to make before shuffling a session ID. Defaults to None.
             max_requests (int, optional): Maximum requests to make before shuffling a session ID. Defaults to None.
-            timeout (int, optional): Request timeout. Defaults to None.
+            proxy (dict or str, optional): Proxy for this instance's requests, e.g. {"http":"proxy_here","https":"proxy_here"} or one URL for both. Defaults to config.PROXY.
+            timeout (int, optional): Request timeout in seconds. Defaults to config.TIMEOUT.
+            max_retries (int, optional): Maximum retries for each request. Defaults to config.MAX_RETRIES.
+            pool_size (int, optional): Connections kept open per host. Defaults to config.POOL_SIZE.
         """
         if use_mutiple_account and not session_ids:
             raise Exception(
@@ -38,6 +41,13 @@ class InstaGPy:
             self.session_ids_container = None
         self.session_ids = session_ids
         self.use_mutiple_account = use_mutiple_account
+        # Transport settings are read once, so instances can each have their own egress
+        self.proxy = proxy if proxy is not None else config.PROXY
+        if isinstance(self.proxy, str):
+            self.proxy = {"http": self.proxy, "https": self.proxy}
+        self.timeout = timeout or config.TIMEOUT
+        self.max_retries = max_retries or config.MAX_RETRIES
+        self.pool_size = pool_size or config.POOL_SIZE
         self.generate_session()
 
     @property
@@ -56,8 +66,14 @@ class InstaGPy:
         Returns:
             dict: Meta Data.
         """
-        response = make_request(path.META_DATA_URL, session=self.session)
+        response = self._make_request(path.META_DATA_URL)
         return response
+
+    def _make_request(self, url, session=None, **kwargs):
+        """make_request with this instance's session, timeout and retries."""
+        kwargs.setdefault("max_retries", self.max_retries)
+        kwargs.setdefault("timeout", self.timeout)
+        return make_request(url, session=session or self.session, **kwargs)
     
     def login_decorator(original_function):
         def wrapper(self, *args, **kwargs):
@@ -73,18 +89,22 @@ class InstaGPy:
             session_id (str, optional): Session Id from Instagram Session Cookies. Defaults to None.
         """
         session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
         try:
-            if config.PROXY is not None:
-                session.proxies = config.PROXY
+            if self.proxy is not None:
+                session.proxies = self.proxy
                 session.verify = False
             session.headers.update(
                 {"User-Agent": random.choice(config._USER_AGENTS)})
-            make_request(path.BASE_URL, session=session)
-            response = requests.get(path.LOGIN_URL)
-            for _ in range(config.MAX_RETRIES):
+            self._make_request(path.BASE_URL, session=session)
+            response = session.get(path.LOGIN_URL, timeout=self.timeout)
+            for _ in range(self.max_retries):
                 if response.cookies:
                     break
-                response = session.get(path.LOGIN_URL)
+                response = session.get(path.LOGIN_URL, timeout=self.timeout)
             csrf_token = dict(response.cookies).get("csrftoken",None)
             if not csrf_token:
                 raise Exception("Couldn't generate CSRF Token")
@@ -130,7 +150,7 @@ class InstaGPy:
         while data_container["has_next_page"]:
             try:
                 request_payload = self._generate_request_data(**request_config)
-                response = make_request(**request_payload)
+                response = self._make_request(**request_payload)
                 data = reduce(dict.get, data_path, response)
                 end_cursor = data.get("page_info",{}).get("end_cursor",None) if isinstance(data, dict) else None or response.get("next_max_id",None)
                 has_next_page = data.get("page_info",{}).get("has_next_page",None) if isinstance(data, dict) else None or response.get("big_list", None)
@@ -274,7 +294,7 @@ class InstaGPy:
                 'optIntoOneTap': 'false',
                 'trustedDeviceRecords': {}
             }
-            user = self.session.post(path.LOGIN_URL, data=payload).json()
+            user = self.session.post(path.LOGIN_URL, data=payload, timeout=self.timeout).json()
             try:
                 if user["authenticated"]:
                     csrf_token = self.session.cookies.get(
@@ -283,7 +303,7 @@ class InstaGPy:
                     user_id = user["userId"]
                     # test if the account is working
                     user = self.session.get(
-                        path.USER_DATA_ENDPOINT.format(user_id)).json()
+                        path.USER_DATA_ENDPOINT.format(user_id), timeout=self.timeout).json()
                     if user['status'] != 'ok':
                         raise Exception(
                             f"Not Working! Check if the given account is working.")
@@ -342,7 +362,7 @@ class InstaGPy:
         Returns:
             dict: user info like username,id,bio,follower/following count etc.
         """
-        response = make_request(path.USER_PROFILE_ENDPOINT.format(username), session=self.session)
+        response = self._make_request(path.USER_PROFILE_ENDPOINT.format(username))
         self.shuffle_session()
         return response
 
@@ -358,7 +378,7 @@ class InstaGPy:
         """
         # returns almost as same data as get_user_info method Except this one returns contact info (email/phone) as well. |LOGIN REQUIRED|
         user_id = self.get_user_id(user_id)
-        response = make_request(path.USER_DATA_ENDPOINT.format(user_id), session=self.session)
+        response = self._make_request(path.USER_DATA_ENDPOINT.format(user_id))
         self.shuffle_session()
         return response
 
@@ -470,7 +490,7 @@ class InstaGPy:
         post_id = utils.get_post_id(post_url)
         request_payload = self._generate_request_data(
             query=path.POST_DETAILS_QUERY, shortcode=post_id, is_graphql=True)
-        response = make_request(**request_payload)
+        response = self._make_request(**request_payload)
         self.shuffle_session()
         return response
 
@@ -507,7 +527,7 @@ class InstaGPy:
         user_id = self.get_user_id(username)
         data = {'referer_type': 'ProfileUsername', 'target_user_id': user_id, 'bk_client_context': {
             'bloks_version': path.ABOUT_USER_QUERY, 'style_id': 'instagram'}, 'bloks_versioning_id': path.ABOUT_USER_QUERY}
-        response = make_request(path.ABOUT_USER_URL, method='POST', data=data, session=self.session)
+        response = self._make_request(path.ABOUT_USER_URL, method='POST', data=data)
         if pretty_print:
             return utils.format_about_data(response)
         self.shuffle_session()
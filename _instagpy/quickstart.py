@@ -5,8 +5,9 @@ from instagpy import config
 def main():
     #config.TIMEOUT = 5
     #config.PROXY = {'http': 'proxy_here', 'https': 'proxy_here'}
+    # proxy/timeout/max_retries/pool_size given here apply to this instance only
     insta = InstaGPy(use_mutiple_account=False, session_ids=None,
-                     min_requests=None, max_requests=None)
+                     min_requests=None, max_requests=None, proxy=None, timeout=None)
     insta.get_user_basic_details('champagnepapi', pretty_print=True)
     #insta.login(username=None, password=None, show_saved_sessions=False, save_session=True)
     # insta.logged_in
@@ -17,13 +17,15 @@ for logger in streamlit_loggers:
 
 import streamlit as st
 import pandas as pd
-from database.config import SessionLocal, init_db, tables_exist
+from database.config import SessionLocal, ScopedSession, create_tables, tables_exist
 from database.models import InstagramAccount, Follower, ScrapingSession
 from datetime import datetime
 from sqlalchemy import func, text
 from scraper.manager import ScraperManager
+from scraper.profile_cache import get_profile_cache
+from scraper.circuit_breaker import get_circuit_breakers
 import time
-import threading
+import atexit
 import os
 from dotenv import load_dotenv
 
@@ -34,61 +36,45 @@ load_dotenv(override=True)
 logger = logging.getLogger(__name__)
 
 def get_db():
-    db = SessionLocal()
-    try:
-        return db
-    finally:
-        db.close()
+    """This script run's session; main() releases it when the page is rendered."""
+    return ScopedSession()
 
 def init_session_state():
     """Initialize session state variables."""
     if "scraper_manager" not in st.session_state:
-        db = get_db()
+        # The manager opens its own per-thread sessions from the factory
         st.session_state.scraper_manager = ScraperManager(
-            db=db,
+            db=SessionLocal,
             username=os.getenv('INSTAGRAM_USERNAME'),
             password=os.getenv('INSTAGRAM_PASSWORD')
         )
         logger.info(f"Initialized scraper manager with username: {os.getenv('INSTAGRAM_USERNAME')}")
+        # Results are persisted by the manager's own writer thread, visitors or not;
+        # on exit it drains what the workers queued
+        atexit.register(st.session_state.scraper_manager.shutdown)
+        
+        # Pick up crawls interrupted by a crash or restart from their last checkpoint
+        resumed = st.session_state.scraper_manager.resume_all()
+        if resumed:
+            logger.info(f"Resumed scraping sessions: {resumed}")
     
     if "active_sessions" not in st.session_state:
         st.session_state.active_sessions = {}
 
-def process_results_background():
-    """Background task to process scraping results."""
-    logger.info("Starting background processing thread")
-    while True:
-        if hasattr(st.session_state, "scraper_manager"):
-            try:
-                st.session_state.scraper_manager.process_results()
-            except Exception as e:
-                logger.error(f"Error in background processing: {str(e)}")
-        time.sleep(1)
-
 def main():
     st.set_page_config(page_title="Instagram Profiles Scraper", layout="wide")
     st.title("Instagram Profiles Scraper")
 
-    # Ensure database is initialized
+    # Ensure database is initialized; tables added by an upgrade are created next to the existing data
     if not tables_exist():
         with st.spinner("Initializing database..."):
-            init_db()
+            create_tables()
         st.success("Database initialized successfully!")
         logger.info("Database initialized successfully")
 
     # Initialize session state
     init_session_state()
 
-    # Start background processing if not already running
-    if "background_processor" not in st.session_state:
-        background_thread = threading.Thread(
-            target=process_results_background,
-            daemon=True
-        )
-        background_thread.start()
-        st.session_state.background_processor = background_thread
-        logger.info("Started background processing thread")
-
     # Auto-start scraping for saucotec if not already running
     if "auto_start_done" not in st.session_state:
         logger.info("Auto-starting scraping job for @saucotec")
@@ -112,16 +98,20 @@ def main():
         ["Dashboard", "Start Scraping", "Accounts", "Followers", "Settings"]
     )
 
-    if page == "Dashboard":
-        show_dashboard()
-    elif page == "Start Scraping":
-        show_scraping_page()
-    elif page == "Accounts":
-        show_accounts_page()
-    elif page == "Followers":
-        show_followers_page()
-    elif page == "Settings":
-        show_settings_page()
+    try:
+        if page == "Dashboard":
+            show_dashboard()
+        elif page == "Start Scraping":
+            show_scraping_page()
+        elif page == "Accounts":
+            show_accounts_page()
+        elif page == "Followers":
+            show_followers_page()
+        elif page == "Settings":
+            show_settings_page()
+    finally:
+        # One unit of work per script run: the page's reads end here
+        ScopedSession.remove()
 
 def show_dashboard():
     st.header("Dashboard")
@@ -144,6 +134,69 @@ def show_dashboard():
     with col3:
         st.metric("Active Sessions", active_sessions)
     
+    # Results waiting for the writer; a full queue means scrapers are being held back
+    writer_stats = st.session_state.scraper_manager.get_writer_stats()
+    if writer_stats:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Write Queue", f"{writer_stats['queued_results']} / {writer_stats['queue_capacity']}")
+        with col2:
+            st.metric("DB Rows/Second", st.session_state.scraper_manager.get_write_stats()["rows_per_second"])
+    
+    # What the account pool can still deliver within its hourly/daily request quotas
+    capacity = st.session_state.scraper_manager.get_capacity()
+    if capacity["profiles_per_day"] is not None:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Projected Profiles/Day", capacity["profiles_per_day"])
+        with col2:
+            st.metric("Profiles Left Today", capacity["profiles_left_today"])
+    
+    # Request budget saved by serving profiles hydrated earlier (any target) from the cache
+    cache_stats = get_profile_cache().get_stats()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Profile Cache Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    with col2:
+        st.metric("Requests Saved by Cache", cache_stats["requests_saved"])
+    
+    # Followers skipped on their listing fields, before any user_info request
+    filter_stats = st.session_state.scraper_manager.get_filter_stats()
+    if filter_stats:
+        columns = st.columns(len(filter_stats))
+        for column, (rule, saved) in zip(columns, sorted(filter_stats.items())):
+            with column:
+                st.metric(f"Requests Saved: {rule.replace('_', ' ').title()}", saved)
+    
+    # Current pace of every account and proxy bucket in the shared rate limiter
+    st.subheader("Rate Limits")
+    rate_limits = st.session_state.scraper_manager.rate_limiter.snapshot()
+    if rate_limits:
+        st.dataframe(pd.DataFrame(rate_limits))
+    else:
+        st.info("No requests made yet")
+    
+    # Rolling request counts of every account against its quotas
+    quota_usage = st.session_state.scraper_manager.quota_tracker.snapshot()
+    if quota_usage:
+        st.dataframe(pd.DataFrame.from_dict(quota_usage, orient="index"))
+    
+    # Health score of every proxy, the accounts bound to it and any eviction
+    st.subheader("Proxies")
+    proxies = st.session_state.scraper_manager.proxy_manager.snapshot()
+    if proxies:
+        st.dataframe(pd.DataFrame(proxies))
+    else:
+        st.info("No proxies configured, requests go out directly")
+    
+    # Sessions taken out of rotation by a challenge and their background recovery probes
+    st.subheader("Session Health")
+    circuits = get_circuit_breakers().snapshot()
+    if circuits:
+        st.dataframe(pd.DataFrame(circuits))
+    else:
+        st.info("All sessions healthy")
+    
     # Recent activity
     st.subheader("Recent Activity")
     
@@ -325,14 +378,8 @@ def show_settings_page():
             proxy_rotation = st.checkbox("Enable Proxy Rotation")
         
         if st.form_submit_button("Save Settings"):
-            # Update scraper manager settings
-            st.session_state.scraper_manager = ScraperManager(
-                db=get_db(),
-                batch_size=batch_size,
-                delay=delay,
-                username=os.getenv('INSTAGRAM_USERNAME'),
-                password=os.getenv('INSTAGRAM_PASSWORD')
-            )
+            # Update the running manager: its crawls, writer and exit hook stay in place
+            st.session_state.scraper_manager.configure(batch_size=batch_size, delay=delay)
             st.success("Settings saved successfully")
             logger.info("Updated scraper settings")
 
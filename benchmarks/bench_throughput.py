@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""End-to-end scraper throughput benchmark against the local fake Instagram.
+
+Runs ScraperManager.start_scraping through the result writer for a set of fake
+targets and reports profiles/minute, requests per stored profile and request
+latency percentiles. Nothing touches the network or MySQL: the backend is
+benchmarks/fake_instagram.py and results go to an in-memory SQLite database.
+
+    python -m benchmarks.bench_throughput --targets 2 --followers 500 --latency 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict
+
+# Add the project root directory to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import scraper.profile_cache
+import scraper.proxy_manager
+import scraper.quota
+from benchmarks.fake_instagram import FakeClient, FakeInstagramBackend
+from database.models import Base, Follower, ScrapingSession
+from scraper.circuit_breaker import CircuitBreakerRegistry, get_circuit_breakers, set_circuit_breakers
+from scraper.instagram_client import InstagramClient
+from scraper.manager import ScraperManager
+from scraper.profile_cache import ProfileCache, set_profile_cache
+from scraper.proxy_manager import ProxyManager, set_proxy_manager
+from scraper.quota import QuotaTracker, set_quota_tracker
+from scraper.rate_limiter import RateLimiter, get_rate_limiter, set_rate_limiter
+from scraper.session_manager import SessionManager
+
+TERMINAL_STATUSES = ("completed", "failed", "stopped")
+
+
+def run_benchmark(
+    targets: int = 2,
+    followers: int = 500,
+    max_followers: int = None,
+    accounts: int = 2,
+    page_size: int = 50,
+    latency: float = 0.02,
+    max_requests_per_minute: int = None,
+    rate_window: float = 60.0,
+    challenge_rate: float = 0.0,
+    login_required_rate: float = 0.0,
+    audience_overlap: float = 0.0,
+    challenged_after: Dict[str, int] = None,
+    rate: float = 50.0,
+    cooldown: float = 1.0,
+    batch_size: int = 50,
+    prefetch_pages: int = 2,
+    split_hydration: bool = True,
+    workers: int = 3,
+    bulk_insert: bool = True,
+    use_cache: bool = False,
+    hourly_quota: int = 0,
+    daily_quota: int = 0,
+    standby: int = 0,
+    proxies: int = 0,
+    bad_proxy_rate: float = 0.0,
+    timeout: float = 600.0
+) -> Dict[str, Any]:
+    """Scrape `targets` fake accounts of `followers` followers each (up to `max_followers`) and measure the run.
+
+    With `proxies`, requests go through that many fake proxies; the first one
+    fails `bad_proxy_rate` of its requests.
+    """
+    proxy_urls = [f"http://proxy-{i}.local:8080" for i in range(proxies)]
+    backend = FakeInstagramBackend(
+        name=f"bench-{uuid.uuid4().hex[:8]}",
+        targets={f"target_{i}": followers for i in range(targets)},
+        page_size=page_size,
+        latency=latency,
+        max_requests_per_minute=max_requests_per_minute,
+        rate_window=rate_window,
+        challenge_rate=challenge_rate,
+        login_required_rate=login_required_rate,
+        audience_overlap=audience_overlap,
+        challenged_after=challenged_after,
+        proxy_failure_rates={proxy_urls[0]: bad_proxy_rate} if proxy_urls else None
+    )
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    # The run replaces these process-wide objects; the caller's are put back afterwards
+    previous = (
+        scraper.profile_cache._profile_cache,
+        get_circuit_breakers(),
+        get_rate_limiter(),
+        scraper.quota._quota_tracker,
+        scraper.proxy_manager._proxy_manager
+    )
+    try:
+        set_profile_cache(ProfileCache(path=":memory:", ttl=24 * 3600 if use_cache else 0))
+        set_circuit_breakers(CircuitBreakerRegistry(recovery_timeout=cooldown, max_recovery_timeout=cooldown * 10, probe_interval=0.05))
+        set_rate_limiter(RateLimiter(account_rate=rate, proxy_rate=rate * 4, max_rate=rate * 4, cooldown=cooldown, max_cooldown=cooldown * 5))
+        set_quota_tracker(QuotaTracker(hourly_quota=hourly_quota, daily_quota=daily_quota))
+        proxy_manager = ProxyManager(proxies=proxy_urls, min_samples=5, eviction_time=timeout)
+        set_proxy_manager(proxy_manager)
+
+        with tempfile.TemporaryDirectory() as sessions_dir:
+            session_manager = SessionManager(
+                sessions_dir=sessions_dir,
+                client_factory=lambda username, password, settings: FakeClient(
+                    username, password, backend=backend.name, settings=settings
+                ),
+                standby_size=standby,
+                standby_accounts=[]
+            )
+            for i in range(accounts):
+                username = f"scraper_{i}"
+                client = FakeClient(username, "password", backend=backend.name)
+                session_manager.save_session(username, InstagramClient(username, "password", client=client))
+
+            manager = ScraperManager(
+                db,
+                batch_size=batch_size,
+                delay=1.0 / rate,
+                prefetch_pages=prefetch_pages,
+                session_manager=session_manager,
+                split_hydration=split_hydration,
+                num_workers=workers,
+                bulk_insert=bulk_insert
+            )
+
+            started = time.monotonic()
+            session_ids = [
+                manager.start_scraping(target, max_followers=max_followers or followers)
+                for target in backend.targets
+            ]
+            while time.monotonic() - started < timeout:
+                manager.process_results()
+                db.expire_all()
+                statuses = {
+                    session_id: db.get(ScrapingSession, session_id).status
+                    for session_id in session_ids if session_id
+                }
+                if all(
+                    status in TERMINAL_STATUSES or not manager.is_processing(session_id)
+                    for session_id, status in statuses.items()
+                ):
+                    break
+                time.sleep(0.1)
+            # Pages of jobs waiting for an account's quota to free up
+            parked_pages = manager.worker_pool.get_parked_count()
+            # Stop the workers and let the writer drain what they queued
+            manager.shutdown()
+            elapsed = time.monotonic() - started
+            capacity = manager.get_capacity()
+            db.expire_all()
+            statuses = {session_id: db.get(ScrapingSession, session_id).status for session_id in statuses}
+
+        stored = db.query(func.count(Follower.id)).scalar()
+        backend_stats = backend.get_stats()
+        db.close()
+        return {
+            "targets": targets,
+            "followers_per_target": followers,
+            "stored_profiles": stored,
+            "elapsed_seconds": round(elapsed, 2),
+            "profiles_per_minute": round(stored / elapsed * 60, 1) if elapsed else 0.0,
+            "requests_per_profile": round(backend_stats["total_requests"] / stored, 3) if stored else None,
+            "latency_p50_ms": round(backend_stats["latency_p50"] * 1000, 1),
+            "latency_p95_ms": round(backend_stats["latency_p95"] * 1000, 1),
+            "requests": backend_stats["requests"],
+            "requests_by_account": backend_stats["requests_by_account"],
+            "errors": backend_stats["errors"],
+            "db_rows_per_second": manager.get_write_stats()["rows_per_second"],
+            "hydrations_saved": manager.get_filter_stats(),
+            "capacity": capacity,
+            "parked_pages": parked_pages,
+            "requests_by_proxy": backend_stats["requests_by_proxy"],
+            "proxies": proxy_manager.snapshot(),
+            "circuit_trips": {breaker["session"]: breaker["trips"] for breaker in get_circuit_breakers().snapshot()},
+            "session_statuses": list(statuses.values())
+        }
+    finally:
+        profile_cache, circuit_breakers, rate_limiter, quota_tracker, previous_proxy_manager = previous
+        set_profile_cache(profile_cache)
+        set_circuit_breakers(circuit_breakers)
+        set_rate_limiter(rate_limiter)
+        set_quota_tracker(quota_tracker)
+        set_proxy_manager(previous_proxy_manager)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", type=int, default=2, help="Number of target accounts")
+    parser.add_argument("--followers", type=int, default=500, help="Followers per target")
+    parser.add_argument("--max-followers", type=int, default=None, help="Cap per target (default: all followers)")
+    parser.add_argument("--accounts", type=int, default=2, help="Scraper accounts (sessions)")
+    parser.add_argument("--page-size", type=int, default=50, help="Users per followers page")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean request latency in seconds")
+    parser.add_argument("--max-rpm", type=int, default=None, help="Per-account requests/minute before 'please wait'")
+    parser.add_argument("--challenge-rate", type=float, default=0.0, help="Probability of challenge_required")
+    parser.add_argument("--login-required-rate", type=float, default=0.0, help="Probability of login_required")
+    parser.add_argument("--overlap", type=float, default=0.0, help="Audience overlap between targets (0-1)")
+    parser.add_argument("--rate", type=float, default=50.0, help="Starting requests/second per account")
+    parser.add_argument("--cooldown", type=float, default=1.0, help="Base throttle cooldown in seconds")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--prefetch-pages", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=3, help="Worker pool size (pages in flight across jobs)")
+    parser.add_argument("--no-split", action="store_true", help="Hydrate each target on its paging session only")
+    parser.add_argument("--orm-writes", action="store_true", help="Store results one ORM object per row")
+    parser.add_argument("--cache", action="store_true", help="Enable the profile cache")
+    parser.add_argument("--hourly-quota", type=int, default=0, help="Requests per account per rolling hour (0: no limit)")
+    parser.add_argument("--daily-quota", type=int, default=0, help="Requests per account per rolling day (0: no limit)")
+    parser.add_argument("--standby", type=int, default=0, help="Accounts kept warm out of rotation for failover")
+    parser.add_argument("--proxies", type=int, default=0, help="Fake proxies the accounts are bound to")
+    parser.add_argument("--bad-proxy-rate", type=float, default=0.0, help="Connection failure rate of the first proxy")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--json", action="store_true", help="Print the raw result as JSON")
+    args = parser.parse_args()
+
+    result = run_benchmark(
+        targets=args.targets,
+        followers=args.followers,
+        max_followers=args.max_followers,
+        accounts=args.accounts,
+        page_size=args.page_size,
+        latency=args.latency,
+        max_requests_per_minute=args.max_rpm,
+        challenge_rate=args.challenge_rate,
+        login_required_rate=args.login_required_rate,
+        audience_overlap=args.overlap,
+        rate=args.rate,
+        cooldown=args.cooldown,
+        batch_size=args.batch_size,
+        prefetch_pages=args.prefetch_pages,
+        split_hydration=not args.no_split,
+        workers=args.workers,
+        bulk_insert=not args.orm_writes,
+        use_cache=args.cache,
+        hourly_quota=args.hourly_quota,
+        daily_quota=args.daily_quota,
+        standby=args.standby,
+        proxies=args.proxies,
+        bad_proxy_rate=args.bad_proxy_rate,
+        timeout=args.timeout
+    )
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"Stored profiles:        {result['stored_profiles']} "
+          f"({result['targets']} targets x {result['followers_per_target']} followers)")
+    print(f"Elapsed:                {result['elapsed_seconds']} s")
+    print(f"Profiles/minute:        {result['profiles_per_minute']}")
+    print(f"Requests/profile:       {result['requests_per_profile']}")
+    print(f"Request latency p50:    {result['latency_p50_ms']} ms")
+    print(f"Request latency p95:    {result['latency_p95_ms']} ms")
+    print(f"Requests by endpoint:   {result['requests']}")
+    print(f"Requests by account:    {result['requests_by_account']}")
+    print(f"Errors:                 {result['errors']}")
+    print(f"DB rows/second:         {result['db_rows_per_second']}")
+    print(f"Hydrations saved:       {result['hydrations_saved']}")
+    print(f"Capacity:               {result['capacity']}")
+    print(f"Requests by proxy:      {result['requests_by_proxy']}")
+    print(f"Session statuses:       {result['session_statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Result-writing benchmark: ORM path versus bulk path of process_results.
+
+Queues synthetic follower batches the way the worker pool does and times
+ScraperManager.process_results storing them, once per write path, on a fresh
+SQLite database (a file by default, so commits reach the disk).
+
+    python -m benchmarks.bench_writes --sessions 4 --rows 20000 --batch-size 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+# Add the project root directory to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.models import Base, Follower, InstagramAccount, ScrapingSession
+from scraper.manager import ScraperManager
+from scraper.session_manager import SessionManager
+
+
+def run_write_benchmark(
+    sessions: int = 4,
+    rows: int = 20000,
+    batch_size: int = 50,
+    bulk: bool = True,
+    in_memory: bool = False
+) -> Dict[str, Any]:
+    """Store `rows` followers spread over `sessions` crawls through one write path."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = "sqlite://" if in_memory else f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+
+        db = factory()
+        session_ids = []
+        for i in range(sessions):
+            account = InstagramAccount(username=f"target_{i}")
+            db.add(account)
+            db.flush()
+            record = ScrapingSession(
+                target_username=account.username,
+                account_id=account.id,
+                status="running",
+                max_followers=rows,
+                created_at=datetime.utcnow()
+            )
+            db.add(record)
+            db.flush()
+            session_ids.append(record.id)
+        db.commit()
+
+        manager = ScraperManager(
+            factory,
+            batch_size=batch_size,
+            session_manager=SessionManager(sessions_dir=os.path.join(tmp, "sessions")),
+            num_workers=1,
+            bulk_insert=bulk
+        )
+        for start in range(0, rows, batch_size):
+            session_id = session_ids[(start // batch_size) % sessions]
+            manager.add_result(session_id, [
+                {
+                    "username": f"follower_{n}",
+                    "full_name": f"Follower {n}",
+                    "follower_count": n % 997,
+                    "following_count": n % 313,
+                    "post_count": n % 71,
+                    "is_private": False,
+                    "is_verified": n % 50 == 0
+                }
+                for n in range(start, min(start + batch_size, rows))
+            ], cursor={"user_id": session_id, "rank_token": "bench", "max_id": str(start)})
+
+        started = time.perf_counter()
+        manager.process_results()
+        elapsed = time.perf_counter() - started
+
+        stored = db.query(func.count(Follower.id)).scalar()
+        db.close()
+        engine.dispose()
+
+    write_stats = manager.get_write_stats()
+    return {
+        "path": "bulk" if bulk else "orm",
+        "rows": rows,
+        "stored_rows": stored,
+        "transactions": write_stats["transactions"],
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(stored / elapsed, 1) if elapsed else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4, help="Scraping sessions the batches belong to")
+    parser.add_argument("--rows", type=int, default=20000, help="Follower rows to store")
+    parser.add_argument("--batch-size", type=int, default=50, help="Followers per queued result")
+    parser.add_argument("--memory", action="store_true", help="Use an in-memory database instead of a file")
+    parser.add_argument("--json", action="store_true", help="Print the raw results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        run_write_benchmark(args.sessions, args.rows, args.batch_size, bulk=bulk, in_memory=args.memory)
+        for bulk in (False, True)
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        print(f"{result['path']:>4}: {result['stored_rows']} rows in {result['transactions']} transactions, "
+              f"{result['elapsed_seconds']} s, {result['rows_per_second']} rows/s")
+    orm, bulk = results
+    if orm["rows_per_second"]:
+        print(f"Bulk speedup: {bulk['rows_per_second'] / orm['rows_per_second']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""Local stand-in for Instagram, for offline benchmarks and tests.
+
+Two front-ends share one simulated backend:
+
+* FakeClient mimics the parts of instagram_private_api.Client the scraper
+  uses (login, username_info, user_info, user_followers, ...).
+* FakeInstagramServer serves the HTTP endpoints from _instagpy/instagpy/path.py
+  on localhost; patch_instagpy_paths() points instagpy at it.
+
+The backend simulates request latency, pagination, per-account "please wait"
+throttling, random challenge_required / login_required errors and failing
+proxies, and keeps statistics of every request it served.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from instagram_private_api.errors import ClientError, ClientConnectionError
+
+PLEASE_WAIT = "Please wait a few minutes before you try again."
+
+# Backends by name, so FakeClient objects stay picklable like real sessions
+_BACKENDS: Dict[str, "FakeInstagramBackend"] = {}
+
+
+def get_backend(name: str) -> "FakeInstagramBackend":
+    return _BACKENDS[name]
+
+
+class FakeInstagramBackend:
+    """Simulated Instagram: deterministic users, follower listings and failure modes."""
+
+    FOLLOWER_PK_BASE = 1_000_000
+
+    def __init__(
+        self,
+        name: str = "default",
+        targets: Optional[Dict[str, int]] = None,
+        page_size: int = 100,
+        latency: float = 0.05,
+        latency_jitter: float = 0.5,
+        max_requests_per_minute: Optional[int] = None,
+        rate_window: float = 60.0,
+        challenge_rate: float = 0.0,
+        login_required_rate: float = 0.0,
+        private_ratio: float = 0.2,
+        audience_overlap: float = 0.0,
+        challenged_after: Optional[Dict[str, int]] = None,
+        proxy_failure_rates: Optional[Dict[str, float]] = None,
+        seed: int = 0
+    ):
+        """
+        Args:
+            targets: Target username -> number of followers.
+            page_size: Users per user_followers page.
+            latency: Mean simulated service time per request, in seconds.
+            latency_jitter: Relative spread of the service time (0.5 = +/-50%).
+            max_requests_per_minute: Per-account budget; requests beyond it get "please wait".
+            rate_window: Length of the sliding window the budget applies to, in seconds.
+            challenge_rate: Probability that a request trips challenge_required.
+            login_required_rate: Probability that a request expires the session.
+            private_ratio: Share of followers that are private accounts.
+            audience_overlap: Share of followers consecutive targets have in common.
+            challenged_after: Account -> request count after which it is stuck in
+                challenge_required for good (logging in again does not help).
+            proxy_failure_rates: Proxy URL -> probability that a request sent
+                through it fails with a connection error before reaching Instagram.
+        """
+        self.name = name
+        self.targets = targets or {"target": 1000}
+        self.page_size = page_size
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.max_requests_per_minute = max_requests_per_minute
+        self.rate_window = rate_window
+        self.challenge_rate = challenge_rate
+        self.login_required_rate = login_required_rate
+        self.private_ratio = private_ratio
+        self.audience_overlap = audience_overlap
+        self.challenged_after = challenged_after or {}
+        self.proxy_failure_rates = proxy_failure_rates or {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.target_pks = {username: index + 1 for index, username in enumerate(self.targets)}
+        self.account_state: Dict[str, Optional[str]] = defaultdict(lambda: None)
+        self.request_times: Dict[str, deque] = defaultdict(deque)
+        self.requests = Counter()
+        self.requests_by_account = Counter()
+        self.requests_by_proxy = Counter()
+        self.errors = Counter()
+        self.latencies: List[float] = []
+        _BACKENDS[name] = self
+
+    # Data model
+
+    def follower_pks(self, target_pk: int) -> range:
+        count = self.targets[self._target_username(target_pk)]
+        step = int(count * (1 - self.audience_overlap))
+        start = self.FOLLOWER_PK_BASE + (target_pk - 1) * step
+        return range(start, start + count)
+
+    def _target_username(self, pk: int) -> str:
+        for username, target_pk in self.target_pks.items():
+            if target_pk == pk:
+                return username
+        raise ClientError("User not found", code=404)
+
+    def profile(self, pk: int) -> Dict[str, Any]:
+        if pk in self.target_pks.values():
+            username = self._target_username(pk)
+            return {
+                "pk": pk, "username": username, "full_name": username.title(),
+                "biography": "Target account", "follower_count": self.targets[username],
+                "following_count": 10, "media_count": 100, "is_private": False,
+                "is_verified": False, "external_url": ""
+            }
+        rng = random.Random(pk)
+        return {
+            "pk": pk,
+            "username": f"user_{pk}",
+            "full_name": f"User {pk}",
+            "biography": f"Bio of user {pk}",
+            "follower_count": rng.randint(0, 5000),
+            "following_count": rng.randint(0, 2000),
+            "media_count": rng.randint(0, 500),
+            "is_private": rng.random() < self.private_ratio,
+            "is_verified": rng.random() < 0.01,
+            "external_url": f"https://example.com/{pk}" if rng.random() < 0.3 else ""
+        }
+
+    def listing_entry(self, pk: int) -> Dict[str, Any]:
+        profile = self.profile(pk)
+        return {key: profile[key] for key in ("pk", "username", "full_name", "is_private", "is_verified")}
+
+    def pk_for_username(self, username: str) -> int:
+        if username in self.target_pks:
+            return self.target_pks[username]
+        match = re.fullmatch(r"user_(\d+)", username)
+        if not match:
+            raise ClientError("User not found", code=404)
+        return int(match.group(1))
+
+    # Request handling
+
+    def handle(self, account: str, endpoint: str):
+        """Account for one request: latency, throttling and injected failures."""
+        started = time.monotonic()
+        with self.lock:
+            self.requests[endpoint] += 1
+            self.requests_by_account[account] += 1
+            if self.requests_by_account[account] > self.challenged_after.get(account, float("inf")):
+                self.account_state[account] = "challenge_required"
+            state = self.account_state[account]
+            if state is None:
+                roll = self.rng.random()
+                if roll < self.challenge_rate:
+                    state = "challenge_required"
+                elif roll < self.challenge_rate + self.login_required_rate:
+                    state = "login_required"
+                self.account_state[account] = state
+
+            throttled = False
+            if self.max_requests_per_minute:
+                window = self.request_times[account]
+                while window and window[0] < started - self.rate_window:
+                    window.popleft()
+                window.append(started)
+                throttled = len(window) > self.max_requests_per_minute
+
+            service_time = max(0.0, self.latency * (1 + self.rng.uniform(-1, 1) * self.latency_jitter))
+
+        time.sleep(service_time)
+        with self.lock:
+            self.latencies.append(time.monotonic() - started)
+            if state:
+                self.errors[state] += 1
+            elif throttled:
+                self.errors["please_wait"] += 1
+        if state:
+            raise ClientError(state, code=400)
+        if throttled:
+            raise ClientError(PLEASE_WAIT, code=429)
+
+    def connect(self, proxy: Optional[str]):
+        """Simulated transport: a request through a failing proxy never arrives."""
+        with self.lock:
+            self.requests_by_proxy[proxy or "direct"] += 1
+            failed = self.rng.random() < self.proxy_failure_rates.get(proxy, 0.0)
+            if failed:
+                self.errors["proxy"] += 1
+        if failed:
+            raise ClientConnectionError(f"Could not connect through proxy {proxy}")
+
+    def login(self, account: str):
+        with self.lock:
+            self.requests["login"] += 1
+            if self.requests_by_account[account] <= self.challenged_after.get(account, float("inf")):
+                self.account_state[account] = None
+
+    def user_followers(self, account: str, user_id: int, max_id: Optional[str] = None) -> Dict[str, Any]:
+        self.handle(account, "user_followers")
+        pks = self.follower_pks(int(user_id))
+        offset = int(max_id or 0)
+        page = pks[offset:offset + self.page_size]
+        next_offset = offset + self.page_size
+        return {
+            "users": [self.listing_entry(pk) for pk in page],
+            "next_max_id": str(next_offset) if next_offset < len(pks) else None,
+            "big_list": next_offset < len(pks),
+            "status": "ok"
+        }
+
+    def user_info(self, account: str, pk: int) -> Dict[str, Any]:
+        self.handle(account, "user_info")
+        return {"user": self.profile(int(pk)), "status": "ok"}
+
+    def username_info(self, account: str, username: str) -> Dict[str, Any]:
+        self.handle(account, "username_info")
+        return {"user": self.profile(self.pk_for_username(username)), "status": "ok"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                "requests": dict(self.requests),
+                "requests_by_account": dict(self.requests_by_account),
+                "requests_by_proxy": dict(self.requests_by_proxy),
+                "total_requests": sum(count for endpoint, count in self.requests.items() if endpoint != "login"),
+                "errors": dict(self.errors),
+                "latency_p50": percentile(latencies, 50),
+                "latency_p95": percentile(latencies, 95)
+            }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class FakeClient:
+    """Drop-in for instagram_private_api.Client backed by a FakeInstagramBackend."""
+
+    def __init__(self, username: str, password: str, backend: str = "default", **kwargs):
+        self.username = username
+        self.password = password
+        self.backend_name = backend
+        # Saved settings restore the device ids, like instagram_private_api.Client
+        settings = kwargs.get("settings") or {}
+        self.uuid = settings.get("uuid") or str(uuid.uuid4())
+        self.proxy = kwargs.get("proxy")
+        self.last_json: Dict[str, Any] = {}
+
+    @property
+    def backend(self) -> FakeInstagramBackend:
+        return get_backend(self.backend_name)
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "uuid": self.uuid,
+            "device_id": f"android-{self.uuid[:16]}",
+            "ad_id": self.uuid,
+            "session_id": self.uuid,
+            "cookie": f"sessionid={self.username}".encode(),
+            "created_ts": int(time.time())
+        }
+
+    def login(self):
+        self.backend.login(self.username)
+
+    def generate_uuid(self, return_hex: bool = False, seed: Optional[str] = None) -> str:
+        return uuid.uuid4().hex if return_hex else str(uuid.uuid4())
+
+    def challenge_resolve(self, *args, **kwargs) -> Dict[str, Any]:
+        return {}
+
+    def get_timeline_feed(self, **kwargs) -> Dict[str, Any]:
+        self.backend.connect(self.proxy)
+        self.backend.handle(self.username, "timeline")
+        return {"status": "ok", "items": []}
+
+    def username_info(self, username: str) -> Dict[str, Any]:
+        self.backend.connect(self.proxy)
+        self.last_json = self.backend.username_info(self.username, username)
+        return self.last_json
+
+    def user_info(self, user_id: int) -> Dict[str, Any]:
+        self.backend.connect(self.proxy)
+        self.last_json = self.backend.user_info(self.username, user_id)
+        return self.last_json
+
+    def user_followers(self, user_id: int, rank_token: str, **kwargs) -> Dict[str, Any]:
+        self.backend.connect(self.proxy)
+        self.last_json = self.backend.user_followers(self.username, user_id, kwargs.get("max_id"))
+        return self.last_json
+
+
+class _FakeInstagramHandler(BaseHTTPRequestHandler):
+    """Serves the instagpy endpoints (see _instagpy/instagpy/path.py)."""
+
+    backend: FakeInstagramBackend = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _account(self) -> str:
+        cookies = self.headers.get("Cookie", "")
+        match = re.search(r"sessionid=([^;]+)", cookies)
+        return match.group(1) if match else "anonymous"
+
+    def _send(self, status: int, payload: Any, cookies: Optional[Dict[str, str]] = None, html: bool = False):
+        body = (payload if html else json.dumps(payload)).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html" if html else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (cookies or {}).items():
+            self.send_header("Set-Cookie", f"{name}={value}; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method: str):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+        account = self._account()
+        csrf = {"csrftoken": "fake-csrf-token"}
+        try:
+            if path == "/accounts/login/ajax/" and method == "POST":
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode())
+                username = form.get("username", ["anonymous"])[0]
+                self.backend.login(username)
+                return self._send(200, {"authenticated": True, "userId": 1, "status": "ok"},
+                                  cookies={**csrf, "sessionid": username})
+            if path in ("/", "/accounts/login/", "/accounts/login/ajax/"):
+                return self._send(200, "<html><body>Instagram</body></html>", cookies=csrf, html=True)
+            if path == "/data/shared_data/":
+                viewer = None if account == "anonymous" else {"username": account, "full_name": account}
+                return self._send(200, {"config": {"viewer": viewer}})
+
+            match = re.fullmatch(r"/api/v1/users/(\d+)/info/?", path)
+            if match:
+                return self._send(200, self.backend.user_info(account, int(match.group(1))))
+
+            if path.rstrip("/") == "/api/v1/users/web_profile_info":
+                profile = self.backend.username_info(account, query.get("username", [""])[0])["user"]
+                return self._send(200, {"data": {"user": {
+                    "id": str(profile["pk"]),
+                    "username": profile["username"],
+                    "full_name": profile["full_name"],
+                    "biography": profile["biography"],
+                    "is_private": profile["is_private"],
+                    "is_verified": profile["is_verified"],
+                    "edge_followed_by": {"count": profile["follower_count"]},
+                    "edge_follow": {"count": profile["following_count"]},
+                    "edge_owner_to_timeline_media": {"count": profile["media_count"]},
+                    "external_url": profile["external_url"]
+                }}, "status": "ok"})
+
+            match = re.fullmatch(r"/api/v1/friendships/(\d+)/(followers|following)/?", path)
+            if match:
+                if match.group(2) == "following":
+                    self.backend.handle(account, "user_following")
+                    return self._send(200, {"users": [], "next_max_id": None, "big_list": False, "status": "ok"})
+                max_id = query.get("max_id", [None])[0]
+                return self._send(200, self.backend.user_followers(account, int(match.group(1)), max_id))
+
+            self._send(404, {"status": "fail", "message": "Not found"})
+        except ClientError as e:
+            status = 429 if e.code == 429 else 400
+            self._send(status, {"status": "fail", "message": str(e)})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+
+class FakeInstagramServer:
+    """Threaded local HTTP server exposing a FakeInstagramBackend."""
+
+    def __init__(self, backend: FakeInstagramBackend, host: str = "127.0.0.1", port: int = 0):
+        handler = type("FakeInstagramHandler", (_FakeInstagramHandler,), {"backend": backend})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeInstagramServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextmanager
+def patch_instagpy_paths(base_url: str):
+    """Temporarily rewrite instagpy's endpoint constants to point at base_url."""
+    from instagpy import path
+
+    originals = {name: getattr(path, name) for name in dir(path) if name.isupper()}
+    try:
+        for name, value in originals.items():
+            if isinstance(value, str) and value.startswith("https://"):
+                rewritten = re.sub(r"^https://(www|i)\.instagram\.com/", base_url, value)
+                setattr(path, name, rewritten)
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(path, name, value)
@@ -1,13 +1,16 @@
-from .config import init_db, get_db, create_database
-from .models import InstagramAccount, Follower, ScrapingSession
+from .config import init_db, create_tables, get_db, create_database, session_scope
+from .models import InstagramAccount, Follower, ScrapingSession, AccountUsage
 from .service import DatabaseService
 
 __all__ = [
     'init_db',
+    'create_tables',
     'get_db',
     'create_database',
+    'session_scope',
     'InstagramAccount',
     'Follower',
     'ScrapingSession',
+    'AccountUsage',
     'DatabaseService'
 ] 
\ No newline at end of file
@@ -1,8 +1,9 @@
 from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.pool import QueuePool
 from .models import Base
 import os
+from contextlib import contextmanager
 
 # Database configuration
 DB_USER = os.getenv('MYSQL_DB_USER')
@@ -27,10 +28,30 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Thread-local sessions: the Streamlit thread, the result writer and every
+# worker each get their own session (and connection) from SessionLocal
+ScopedSession = scoped_session(SessionLocal)
+
+@contextmanager
+def session_scope(session_factory=ScopedSession):
+    """Unit of work: commit on success, roll back on error, then release the session."""
+    db = session_factory()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if isinstance(session_factory, scoped_session):
+            session_factory.remove()
+        else:
+            db.close()
+
 def tables_exist():
-    """Check if all required tables exist."""
+    """Check if all required tables exist (every table of the models)."""
     inspector = inspect(engine)
-    required_tables = {'instagram_accounts', 'scraping_sessions', 'followers'}
+    required_tables = set(Base.metadata.tables)
     existing_tables = set(inspector.get_table_names())
     return required_tables.issubset(existing_tables)
 
@@ -41,10 +62,14 @@ def init_db():
     # Create all tables
     Base.metadata.create_all(bind=engine)
 
+def create_tables():
+    """Create the missing tables (e.g. added by an upgrade), keeping existing data."""
+    Base.metadata.create_all(bind=engine)
+
 def get_db():
     """Get a database session."""
     if not tables_exist():
-        init_db()
+        create_tables()
     db = SessionLocal()
     try:
         yield db
@@ -65,6 +90,6 @@ def create_database():
     
     temp_engine.dispose()
     
-    # Initialize tables if they don't exist
+    # Create the tables that don't exist yet
     if not tables_exist():
-        init_db()
\ No newline at end of file
+        create_tables()
\ No newline at end of file
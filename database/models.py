@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Float, JSON, Text
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Float, JSON, Text, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -64,11 +64,22 @@ class ScrapingSession(Base):
     followers_scraped = Column(Integer, default=0)
     error_count = Column(Integer, default=0)
     last_error = Column(Text)
-    last_cursor = Column(String(255))
+    last_cursor = Column(Text)  # JSON pagination checkpoint: user_id, rank_token, max_id
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = Column(DateTime)
     
     # Relationships
     account = relationship("InstagramAccount", back_populates="scraping_sessions")
-    followers = relationship("Follower", back_populates="session")
\ No newline at end of file
+    followers = relationship("Follower", back_populates="session")
+
+class AccountUsage(Base):
+    __tablename__ = 'account_usage'
+    __table_args__ = (UniqueConstraint('username', 'hour', name='uq_account_usage_hour'),)
+    
+    id = Column(Integer, primary_key=True)
+    username = Column(String(255), nullable=False)  # Scraper account the requests were sent from
+    hour = Column(DateTime, nullable=False)  # UTC start of the hour
+    requests = Column(Integer, default=0)
+    challenges = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
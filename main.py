@@ -97,10 +97,10 @@ class InstagramScraper:
             followers = []
             batch = []
             
-            for follower in session.get_followers(username):
+            for follower in session.get_followers(username, hydrate=True):
                 try:
-                    # Get detailed info for the follower
-                    follower_info = session.get_account_info(follower['username'])
+                    # Profiles are hydrated by get_followers, no second lookup needed
+                    follower_info = {k: v for k, v in follower.items() if k != 'pk'}
                     batch.append(follower_info)
                     
                     if len(batch) >= batch_size:
@@ -1,5 +1,6 @@
 from .manager import ScraperManager
 from .worker import WorkerPool, ScrapeWorker
 from .session_manager import SessionManager
+from .async_client import AsyncInstagramClient
 
-__all__ = ['ScraperManager', 'WorkerPool', 'ScrapeWorker', 'SessionManager'] 
\ No newline at end of file
+__all__ = ['ScraperManager', 'WorkerPool', 'ScrapeWorker', 'SessionManager', 'AsyncInstagramClient'] 
\ No newline at end of file
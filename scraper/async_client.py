@@ -0,0 +1,215 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from instagram_private_api.errors import ClientError, ClientConnectionError
+
+from .instagram_client import InstagramClient
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .profile_cache import get_profile_cache
+from .filters import FollowerFilter
+from .circuit_breaker import SessionUnavailable, get_circuit_breakers
+from .quota import get_quota_tracker
+from .proxy_manager import get_proxy_manager
+
+logger = logging.getLogger(__name__)
+
+# instagram_private_api is built on blocking urllib calls, so requests are
+# offloaded to one executor shared by every async session in the process.
+# Its size caps in-flight requests process-wide, not per job.
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASYNC_IO_THREADS', '32')),
+    thread_name_prefix="instagram-io"
+)
+
+
+class AsyncInstagramClient:
+    """Asyncio front-end for a single InstagramClient session.
+
+    Every request made through this object shares one concurrency bound and
+    the account's bucket in the shared rate limiter, so many followers can be
+    hydrated at once without the session exceeding its pace. A ``rate_limiter``
+    passed in is used instead of the process-wide one, and ``requests_per_second``
+    is set on it.
+    """
+
+    def __init__(
+        self,
+        session: InstagramClient,
+        max_concurrency: int = 3,
+        requests_per_second: Optional[float] = None,
+        max_retries: int = 3,
+        executor: Optional[ThreadPoolExecutor] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        self.session = session
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        if requests_per_second:
+            self.rate_limiter.set_rate(session.username, requests_per_second)
+        self._executor = executor or _EXECUTOR
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def _proxy(self) -> Optional[str]:
+        return getattr(self.session, 'proxy', None)
+
+    async def _wait_for_slot(self):
+        """Wait for the account's (and proxy's) token bucket without blocking the loop."""
+        wait_time = self.rate_limiter.reserve(self.session.username, self._proxy)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+    async def _run(self, func, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _call(self, func, *args, **kwargs) -> Any:
+        """Run a blocking API call under the session's concurrency and rate limits."""
+        circuit_breakers = get_circuit_breakers()
+        quota_tracker = get_quota_tracker()
+        proxy_manager = get_proxy_manager()
+        retry_count = 0
+        while True:
+            if not circuit_breakers.is_available(self.session.username):
+                raise SessionUnavailable(f"Session {self.session.username} is recovering from a challenge")
+            async with self._semaphore:
+                quota_tracker.check(self.session.username)
+                proxy = proxy_manager.proxy_for(self.session.username, self._proxy)
+                if proxy != self._proxy:
+                    self.session.set_proxy(proxy)
+                await self._wait_for_slot()
+                quota_tracker.reserve(self.session.username)
+                started = time.monotonic()
+                try:
+                    result = await self._run(func, *args, **kwargs)
+                    proxy_manager.record(self._proxy, time.monotonic() - started)
+                    self.rate_limiter.record_success(self.session.username, self._proxy)
+                    return result
+                except ClientError as e:
+                    proxy_manager.record(self._proxy, time.monotonic() - started, failed=isinstance(e, ClientConnectionError))
+                    if InstagramClient._is_auth_error(e):
+                        quota_tracker.record(self.session.username, requests=0, challenges=1)
+                        on_challenge = getattr(self.session, 'on_challenge', None)
+                        if on_challenge:
+                            on_challenge(self.session)
+                        # Recovery runs in the circuit breaker's background probes
+                        circuit_breakers.trip(self.session, e)
+                        raise SessionUnavailable(f"Session {self.session.username} needs to log in again: {str(e)}") from e
+                    retry_count += 1
+                    if InstagramClient._is_throttle(e):
+                        # The limiter's cooldown is awaited by the next _wait_for_slot
+                        self.rate_limiter.record_throttle(self.session.username, self._proxy)
+                    if isinstance(e, ClientConnectionError):
+                        # Retried, on another proxy once this one is evicted
+                        if retry_count > self.max_retries:
+                            raise
+                        continue
+                    if retry_count > self.max_retries or not InstagramClient._is_throttle(e):
+                        raise
+
+    async def get_account_info(self, username: str) -> Dict[str, Any]:
+        """Get information about an Instagram account."""
+        cached = get_profile_cache().get_by_username(username)
+        if cached:
+            return cached
+        user_info = await self._call(self.session.client.username_info, username)
+        if not user_info or 'user' not in user_info:
+            raise ValueError(f"Invalid response for username {username}")
+        profile = InstagramClient._format_user(user_info['user'])
+        get_profile_cache().put(profile)
+        return profile
+
+    async def _hydrate(self, user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            cached = get_profile_cache().get_by_pk(user['pk'])
+            if cached:
+                return cached
+            user_info = await self._call(self.session.client.user_info, user['pk'])
+            if not user_info or 'user' not in user_info:
+                logger.warning(f"Invalid user info response for user {user.get('pk')}")
+                return None
+            profile = InstagramClient._format_user(user_info['user'])
+            get_profile_cache().put(profile)
+            return profile
+        except SessionUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting follower info: {str(e)}")
+            return None
+
+    async def get_followers(
+        self,
+        username: str,
+        hydrate: bool = True,
+        user_id: Optional[int] = None,
+        prefetch_pages: int = 2,
+        listing_filter: Optional[FollowerFilter] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Async counterpart of InstagramClient.get_followers.
+
+        A producer task pages through the listing into a buffer of at most
+        prefetch_pages pages while the users of the current page are hydrated
+        concurrently (bounded by max_concurrency) and yielded in completion order.
+        Users rejected by listing_filter are dropped before any hydration request.
+        """
+        if user_id is None:
+            user_info = await self._call(self.session.client.username_info, username)
+            user_id = user_info['user']['pk']
+        rank_token = self.session.client.generate_uuid()
+        pages: asyncio.Queue = asyncio.Queue(maxsize=max(prefetch_pages, 1))
+
+        async def produce():
+            next_max_id = None
+            try:
+                while True:
+                    results = await self._call(
+                        self.session.client.user_followers,
+                        user_id,
+                        rank_token=rank_token,
+                        max_id=next_max_id
+                    )
+                    if results.get('users'):
+                        await pages.put(results['users'])
+                    next_max_id = results.get('next_max_id')
+                    if not results.get('users') or not next_max_id:
+                        break
+                await pages.put(None)
+            except Exception as e:
+                await pages.put(e)
+
+        producer = asyncio.create_task(produce())
+        seen_pks = set()
+        try:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+
+                users = [user for user in page if user.get('pk') not in seen_pks]
+                seen_pks.update(user.get('pk') for user in users)
+                if listing_filter:
+                    users = [user for user in users if not listing_filter.rejects(user)]
+
+                if hydrate:
+                    tasks = [asyncio.create_task(self._hydrate(user)) for user in users]
+                    try:
+                        for task in asyncio.as_completed(tasks):
+                            follower = await task
+                            if follower:
+                                yield follower
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+                else:
+                    for user in users:
+                        yield InstagramClient._format_listing_user(user)
+        finally:
+            producer.cancel()
@@ -0,0 +1,178 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class SessionUnavailable(Exception):
+    """Raised when a request is attempted on a session whose circuit is not closed."""
+
+
+class CircuitBreaker:
+    """Per-session circuit breaker.
+
+    ``closed``: the session takes work. ``open``: it hit challenge_required or
+    login_required and gets no work until ``retry_at``. ``half_open``: a single
+    recovery probe (re-login plus a cheap authenticated request) is running in
+    the background; it either closes the circuit or reopens it with a longer
+    recovery timeout.
+    """
+
+    def __init__(self, name: str, recovery_timeout: float = 300.0, max_recovery_timeout: float = 3600.0):
+        self.name = name
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = 0.0
+        self.opened_at = float("-inf")  # monotonic time of the last trip
+        self.last_error: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether the session may be given work."""
+        with self.lock:
+            return self.state == CLOSED
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self, error: Optional[Exception] = None) -> bool:
+        """Open the circuit. Returns True when this call tripped it."""
+        with self.lock:
+            self.last_error = str(error) if error else self.last_error
+            if self.state == OPEN:
+                # Requests already in flight when the circuit opened
+                return False
+            self.failures += 1
+            # Back off longer after every failed probe
+            timeout = min(self.max_recovery_timeout, self.recovery_timeout * 2 ** (self.failures - 1))
+            self.opened_at = time.monotonic()
+            self.retry_at = self.opened_at + timeout
+            self.state = OPEN
+            self.trips += 1
+            logger.warning(f"Circuit for {self.name} opened for {timeout:.0f} seconds: {self.last_error}")
+            return True
+
+    def start_probe(self) -> bool:
+        """Move an open circuit whose recovery timeout elapsed to half-open."""
+        with self.lock:
+            if self.state != OPEN or time.monotonic() < self.retry_at:
+                return False
+            self.state = HALF_OPEN
+            return True
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers of every session, with a background thread probing open ones."""
+
+    def __init__(self, recovery_timeout: float = 300.0, max_recovery_timeout: float = 3600.0, probe_interval: float = 1.0):
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self.probe_interval = probe_interval
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.sessions: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.prober: Optional[threading.Thread] = None
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self.lock:
+            breaker = self.breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self.recovery_timeout, self.max_recovery_timeout)
+                self.breakers[name] = breaker
+            return breaker
+
+    def is_available(self, name: str) -> bool:
+        return self.get(name).allow()
+
+    def trip(self, session: Any, error: Optional[Exception] = None):
+        """Open the circuit of a session and schedule background recovery probes."""
+        with self.lock:
+            self.sessions[session.username] = session
+        self.get(session.username).record_failure(error)
+        self._ensure_prober()
+
+    def _ensure_prober(self):
+        with self.lock:
+            if self.prober is None or not self.prober.is_alive():
+                self.stop_event.clear()
+                self.prober = threading.Thread(target=self._probe_loop, name="circuit-prober", daemon=True)
+                self.prober.start()
+
+    def _probe_loop(self):
+        while not self.stop_event.wait(self.probe_interval):
+            with self.lock:
+                candidates = [
+                    (self.breakers[name], session) for name, session in self.sessions.items()
+                    if name in self.breakers
+                ]
+            for breaker, session in candidates:
+                if breaker.start_probe():
+                    self.probe(breaker, session)
+
+    def probe(self, breaker: CircuitBreaker, session: Any):
+        """Log the session in again and check it with an authenticated request."""
+        logger.info(f"Probing session {breaker.name}")
+        try:
+            session._login()
+            if session.is_logged_in():
+                breaker.record_success()
+                # The re-login renewed the session's cookies: let its owner persist them
+                on_login = getattr(session, "on_login", None)
+                if on_login:
+                    on_login(session)
+                return
+            breaker.record_failure(SessionUnavailable("still not logged in after re-login"))
+        except Exception as e:
+            breaker.record_failure(e)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def snapshot(self) -> List[Dict]:
+        """Current state of every breaker, for the dashboard."""
+        now = time.monotonic()
+        with self.lock:
+            breakers = list(self.breakers.values())
+        return [
+            {
+                "session": breaker.name,
+                "state": breaker.state,
+                "trips": breaker.trips,
+                "retry_in_seconds": round(max(0.0, breaker.retry_at - now)) if breaker.state == OPEN else 0,
+                "last_error": breaker.last_error
+            }
+            for breaker in breakers
+        ]
+
+
+_circuit_breakers = CircuitBreakerRegistry(
+    recovery_timeout=float(os.getenv('SESSION_RECOVERY_TIMEOUT', '300')),
+    max_recovery_timeout=float(os.getenv('SESSION_MAX_RECOVERY_TIMEOUT', '3600'))
+)
+
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """Return the process-wide circuit breaker registry shared by every client."""
+    return _circuit_breakers
+
+
+def set_circuit_breakers(circuit_breakers: CircuitBreakerRegistry):
+    """Replace the process-wide circuit breaker registry (benchmarks and tests)."""
+    global _circuit_breakers
+    _circuit_breakers.stop()
+    _circuit_breakers = circuit_breakers
@@ -0,0 +1,79 @@
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A rule looks at the fields of a followers page entry and returns True to skip the user
+Rule = Callable[[Dict[str, Any]], bool]
+
+
+class FollowerFilter:
+    """Ordered set of rules evaluated on followers listing entries before hydration.
+
+    ``user_followers`` pages already carry ``username``, ``full_name``,
+    ``is_private`` and ``is_verified``, so a follower that a rule rejects costs no
+    user_info request. Every rejection is counted per rule: each one is a
+    hydration request saved.
+    """
+
+    def __init__(self, rules: Optional[Iterable[Tuple[str, Rule]]] = None):
+        self.rules: List[Tuple[str, Rule]] = list(rules or [])
+        self.saved = Counter()
+        self.counted = set()  # A page re-read after a resume must not count its users twice
+        self.lock = threading.Lock()
+
+    def add_rule(self, name: str, rule: Rule) -> "FollowerFilter":
+        self.rules.append((name, rule))
+        return self
+
+    def rejects(self, user: Dict[str, Any]) -> Optional[str]:
+        """Return the name of the first rule that skips this user, or None to hydrate it."""
+        for name, rule in self.rules:
+            try:
+                if rule(user):
+                    with self.lock:
+                        key = user.get('pk', user.get('username'))
+                        if key not in self.counted:
+                            self.counted.add(key)
+                            self.saved[name] += 1
+                    return name
+            except Exception as e:
+                logger.error(f"Error evaluating filter rule {name}: {str(e)}")
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Hydration requests saved so far, by rule."""
+        with self.lock:
+            return dict(self.saved)
+
+
+def skip_private() -> Tuple[str, Rule]:
+    """Private accounts are out of scope, their profiles are not scraped."""
+    return "private", lambda user: bool(user.get('is_private'))
+
+
+def skip_usernames(usernames: set, name: str = "already_stored") -> Tuple[str, Rule]:
+    """Skip followers whose username is in ``usernames`` (checked at call time, so the set may grow)."""
+    return name, lambda user: user.get('username') in usernames
+
+
+def skip_bot_patterns(patterns: Iterable[str]) -> Tuple[str, Rule]:
+    """Skip usernames matching any of the given regular expressions (case-insensitive)."""
+    compiled = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    return "bot_pattern", lambda user: any(regex.search(user.get('username') or '') for regex in compiled)
+
+
+def parse_patterns(value: Optional[str]) -> List[str]:
+    """Split a comma-separated list of regular expressions (e.g. from the environment)."""
+    return [pattern.strip() for pattern in (value or '').split(',') if pattern.strip()]
+
+
+def merge_stats(filters: Iterable[FollowerFilter]) -> Dict[str, int]:
+    """Sum the per-rule counters of several filters."""
+    total = Counter()
+    for follower_filter in filters:
+        total.update(follower_filter.get_stats())
+    return dict(total)
@@ -0,0 +1,163 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from instagram_private_api.errors import ClientError
+
+from .circuit_breaker import SessionUnavailable, get_circuit_breakers
+from .quota import get_quota_tracker
+
+logger = logging.getLogger(__name__)
+
+
+class SplitHydrator:
+    """Hydrate the followers of one target on several sessions at once.
+
+    The session walking the follower cursor hands each page to this pool; every
+    session runs one worker that pulls pks from a shared queue, so each account
+    hydrates at its own rate-limiter pace and faster (unthrottled) accounts take
+    more of the page. One target is then no longer capped at one account's rate.
+
+    With a ``session_manager``, every page only uses the helper sessions it can
+    lease at that moment (the pager is already leased by its job), so accounts
+    busy with other jobs are not shared. Pages of the same job in flight at once
+    share one lease per helper, released when the last of them finishes; they
+    take turns on it, so an account never sends two user_info requests at once.
+    """
+
+    def __init__(self, sessions: List[Any], session_manager: Any = None):
+        self.sessions = list(sessions)
+        self.session_manager = session_manager
+        self.held: Dict[str, int] = {}
+        self.held_lock = threading.Lock()
+        # One request at a time per account, whichever page it is hydrating for
+        self.session_locks = {session.username: threading.Lock() for session in self.sessions}
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(len(self.sessions), 1),
+            thread_name_prefix="hydrator"
+        )
+        logger.info(f"Initialized SplitHydrator with {len(self.sessions)} sessions")
+
+    def _drain(
+        self,
+        session: Any,
+        work: queue.Queue,
+        results: queue.Queue,
+        stop: threading.Event,
+        errors: list,
+        should_stop: Optional[Callable[[], bool]] = None
+    ):
+        """Hydrate users from the shared queue on one session until it is empty."""
+        while not stop.is_set():
+            if should_stop and should_stop():
+                return
+            try:
+                user = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                with self._session_lock(session):
+                    profile = session._hydrate_with_backoff(user['pk'], should_stop)
+                if profile:
+                    results.put(profile)
+            except SessionUnavailable as e:
+                # The circuit breaker took this session out; hand the user to the others
+                logger.warning(f"Session {session.username} left the hydration pool: {str(e)}")
+                work.put(user)
+                return
+            except ClientError as e:
+                if session._is_throttle(e):
+                    # Still throttled after every backoff round: the page is retried as a whole
+                    errors.append(e)
+                    stop.set()
+                    return
+                logger.error(f"Error getting follower info: {str(e)}")
+            except KeyError as e:
+                logger.error(f"Missing field in user info response: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error getting follower info on {session.username}: {str(e)}")
+
+    def _session_lock(self, session: Any) -> threading.Lock:
+        # The pager passed to hydrate() may be a session the pool was not built with
+        with self.held_lock:
+            return self.session_locks.setdefault(session.username, threading.Lock())
+
+    def _hold(self, session: Any) -> bool:
+        """Lease a helper for a page, reusing the lease of another page in flight."""
+        with self.held_lock:
+            if self.held.get(session.username):
+                self.held[session.username] += 1
+                return True
+            if not self.session_manager.try_acquire(session):
+                return False
+            self.held[session.username] = 1
+            return True
+
+    def _unhold(self, session: Any):
+        with self.held_lock:
+            self.held[session.username] -= 1
+            if not self.held[session.username]:
+                del self.held[session.username]
+                self.session_manager.release(session)
+
+    def hydrate(
+        self,
+        users: List[Dict[str, Any]],
+        pager: Any = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield the full profiles of a page of listing users, in completion order.
+
+        Raises SessionUnavailable when users are left and every session's circuit
+        is open, and the throttle error of a user that stayed throttled through
+        every backoff round. Stops early once ``should_stop`` returns True.
+        """
+        if not users:
+            return
+        pager = pager or self.sessions[0]
+        helpers = [session for session in self.sessions if session is not pager and session.username != pager.username]
+        if self.session_manager:
+            helpers = [session for session in helpers if self._hold(session)]
+        pool = [pager] + helpers
+        circuit_breakers = get_circuit_breakers()
+        quota_tracker = get_quota_tracker()
+        work = queue.Queue()
+        for user in users:
+            work.put(user)
+        results = queue.Queue()
+        stop = threading.Event()
+        errors = []
+        futures = []
+        try:
+            while True:
+                if all(future.done() for future in futures) and results.empty():
+                    if errors:
+                        raise errors[0]
+                    if work.empty() or (should_stop and should_stop()):
+                        break
+                    # Users handed back by a tripped (or spent) session: restart the healthy workers
+                    healthy = [
+                        session for session in pool
+                        if circuit_breakers.is_available(session.username) and quota_tracker.has_budget(session.username)
+                    ]
+                    if not healthy:
+                        raise SessionUnavailable("No healthy session left to hydrate this page")
+                    futures = [
+                        self.executor.submit(self._drain, session, work, results, stop, errors, should_stop)
+                        for session in healthy[:work.qsize()]
+                    ]
+                try:
+                    yield results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        finally:
+            # The consumer may stop early; workers finish their current user and exit
+            stop.set()
+            if self.session_manager:
+                for session in helpers:
+                    self._unhold(session)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -1,21 +1,163 @@
 from instagram_private_api import Client, ClientCompatPatch
-from instagram_private_api.errors import ClientError
-import time
+from instagram_private_api.errors import ClientError, ClientConnectionError
 import logging
-from typing import Generator, Dict, Any
+import queue
+import threading
+import time
+import urllib.request
+from typing import Callable, Generator, Dict, Any, Optional, Iterator, Tuple
+from .rate_limiter import get_rate_limiter
+from .profile_cache import get_profile_cache
+from .filters import FollowerFilter
+from .hydration import SplitHydrator
+from .circuit_breaker import SessionUnavailable, get_circuit_breakers
+from .quota import get_quota_tracker
+from .proxy_manager import get_proxy_manager
 
 logger = logging.getLogger(__name__)
 
+_PREFETCH_DONE = object()
+
+# Serializes lazy API client construction: without saved settings it logs in
+_build_lock = threading.Lock()
+
+
+def prefetch(iterator: Iterator, depth: int) -> Generator[Any, None, None]:
+    """Run an iterator in a background thread, buffering at most `depth` items ahead.
+
+    Used to overlap listing-page requests with hydration of the current page.
+    The bounded buffer keeps memory flat regardless of the listing size, and
+    an exception raised by the producer is re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((_PREFETCH_DONE, None))
+        except Exception as e:
+            put((_PREFETCH_DONE, e))
+
+    threading.Thread(target=produce, daemon=True, name="follower-page-prefetch").start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _PREFETCH_DONE:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
 class InstagramClient:
-    def __init__(self, username, password):
+    # Throttled calls are retried this many times before the error is raised
+    max_throttle_retries = 3
+    # Rounds of those retries (each after a longer cooldown) spent on one user or
+    # page before the throttle error is raised to the caller
+    max_throttle_rounds = 3
+
+    def __init__(self, username, password, client=None, settings=None, client_factory=None, proxy=None):
         self.username = username
         self.password = password
-        self.client = Client(
-            username, 
-            password,
+        # Proxy the client's requests go through; kept in sync with the account's
+        # binding in the shared ProxyManager before every request
+        self.proxy = proxy
+        # `client` lets callers supply a pre-built API client (e.g. the local fake backend).
+        # Otherwise it is built on first use, from saved `settings` (cookies and device
+        # ids, so no new login) when there are some, by `client_factory` if given
+        self._client = client
+        self._settings = settings
+        self.client_factory = client_factory
+        # Set by the SessionManager holding the session, and called with it: after
+        # a challenge or logout is hit, and after a re-login that renewed its cookies
+        self.on_challenge: Optional[Callable[["InstagramClient"], None]] = None
+        self.on_login: Optional[Callable[["InstagramClient"], None]] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            with _build_lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def _build_client(self):
+        if self.client_factory:
+            client = self.client_factory(self.username, self.password, self._settings)
+            self._apply_proxy(client)
+            return client
+        kwargs = {"proxy": self.proxy} if self.proxy else {}
+        # A login without saved settings already goes through the proxy
+        return Client(
+            self.username,
+            self.password,
             auto_patch=True,
-            drop_incompat_keys=False
+            drop_incompat_keys=False,
+            settings=self._settings,
+            **kwargs
+        )
+
+    def _apply_proxy(self, client):
+        """Route an API client's transport through ``self.proxy`` (None: direct)."""
+        cookie_jar = getattr(getattr(client, "opener", None), "cookie_jar", None)
+        if cookie_jar is None:
+            # Not an instagram_private_api opener (e.g. the local fake backend)
+            client.proxy = self.proxy
+            return
+        proxies = {"http": self.proxy, "https": self.proxy} if self.proxy else {}
+        opener = urllib.request.build_opener(
+            urllib.request.ProxyHandler(proxies),
+            urllib.request.HTTPHandler(),
+            urllib.request.HTTPSHandler(),
+            urllib.request.HTTPCookieProcessor(cookie_jar)
         )
+        opener.cookie_jar = cookie_jar
+        client.opener = opener
+
+    def set_proxy(self, proxy: Optional[str]):
+        """Move this session to another proxy, keeping its cookies."""
+        if proxy == self.proxy:
+            return
+        logger.info(f"Session {self.username} now uses proxy {proxy}")
+        self.proxy = proxy
+        if self._client is not None:
+            self._apply_proxy(self._client)
+
+    def connect(self):
+        """Build the API client now; without saved settings this logs in."""
+        return self.client
+
+    def get_settings(self) -> Optional[Dict[str, Any]]:
+        """Cookie jar and device settings to persist; never builds the API client."""
+        if self._client is None:
+            return self._settings
+        return getattr(self._client, "settings", None)
+
+    def __setstate__(self, state):
+        # Sessions pickled before the client became lazy
+        if "client" in state:
+            state["_client"] = state.pop("client")
+        state.setdefault("_settings", None)
+        state.setdefault("client_factory", None)
+        state.setdefault("proxy", None)
+        self.__dict__.update(state)
 
     def _login(self):
         """Login to Instagram."""
@@ -34,9 +176,9 @@ class InstagramClient:
                         # Choose email verification by default
                         challenge = self.client.challenge_resolve(challenge["step_data"]["choice"])
                         if challenge.get("step_name") == "verify_email":
-                            # Wait for user to enter code
+                            # No blocking wait for the code here: this runs from the circuit
+                            # breaker's background probe, which retries with growing backoff
                             logger.info("Please check your email for verification code")
-                            time.sleep(30)  # Give user time to check email
                             # Try to verify with empty code first (in case user already entered it)
                             challenge = self.client.challenge_resolve("")
                             if challenge.get("step_name") == "verify_email":
@@ -53,117 +195,343 @@ class InstagramClient:
             logger.error(f"Failed to login: {str(e)}")
             raise
 
-    def get_followers(self, username: str) -> Generator[Dict[str, Any], None, None]:
-        """Get followers of an Instagram account."""
-        try:
-            # Get user info first
-            user_info = self.client.username_info(username)
-            user_id = user_info['user']['pk']
-            rank_token = self.client.generate_uuid()
-            followers = []
-            next_max_id = None
-            retry_count = 0
-            max_retries = 3
-            
-            while True:
-                try:
-                    # Get followers with pagination
-                    results = self.client.user_followers(
-                        user_id, 
-                        rank_token=rank_token,
-                        max_id=next_max_id
-                    )
-                    
-                    if not results.get('users', []):
-                        break
-                        
-                    for user in results.get('users', []):
-                        try:
-                            # Get detailed user info
-                            user_info = self.client.user_info(user['pk'])
-                            if not user_info or 'user' not in user_info:
-                                logger.warning(f"Invalid user info response for user {user.get('pk')}")
-                                continue
-
-                            user_data = user_info['user']
-                            yield {
-                                "username": user_data.get('username', ''),
-                                "full_name": user_data.get('full_name', ''),
-                                "biography": user_data.get('biography', ''),
-                                "follower_count": user_data.get('follower_count', 0),
-                                "following_count": user_data.get('following_count', 0),
-                                "post_count": user_data.get('media_count', 0),
-                                "is_private": user_data.get('is_private', False),
-                                "is_verified": user_data.get('is_verified', False),
-                                "external_url": user_data.get('external_url', '')
-                            }
-                            time.sleep(2)  # Rate limiting between user info requests
-                            retry_count = 0  # Reset retry count on successful request
-                            
-                        except ClientError as e:
-                            error_msg = str(e).lower()
-                            if "challenge_required" in error_msg:
-                                logger.warning(f"Challenge required while getting follower info")
-                                self._login()  # Re-login to handle challenge
-                                continue
-                            elif "login_required" in error_msg:
-                                logger.warning(f"Login required while getting follower info")
-                                self._login()  # Re-login to handle expired session
-                                continue
-                            elif "please wait" in error_msg:
-                                retry_count += 1
-                                if retry_count >= max_retries:
-                                    logger.error("Max retries reached, taking a longer break")
-                                    time.sleep(300)  # 5 minute break
-                                    retry_count = 0
-                                else:
-                                    wait_time = 60 * retry_count  # Exponential backoff
-                                    logger.warning(f"Rate limited, waiting {wait_time} seconds")
-                                    time.sleep(wait_time)
-                                continue
-                            else:
-                                logger.error(f"Error getting follower info: {str(e)}")
-                                continue
-                        except KeyError as e:
-                            logger.error(f"Missing field in user info response: {str(e)}")
-                            continue
-                        except Exception as e:
-                            logger.error(f"Error getting follower info: {str(e)}")
-                            continue
-                    
-                    next_max_id = results.get('next_max_id')
-                    if not next_max_id:
-                        break
-                        
-                    time.sleep(5)  # Rate limiting between follower page requests
-                    
-                except ClientError as e:
-                    error_msg = str(e).lower()
-                    if "challenge_required" in error_msg:
-                        logger.warning(f"Challenge required while getting followers")
-                        self._login()  # Re-login to handle challenge
-                        continue
-                    elif "login_required" in error_msg:
-                        logger.warning(f"Login required while getting followers")
-                        self._login()  # Re-login to handle expired session
-                        continue
-                    elif "please wait" in error_msg:
-                        retry_count += 1
-                        if retry_count >= max_retries:
-                            logger.error("Max retries reached, taking a longer break")
-                            time.sleep(300)  # 5 minute break
-                            retry_count = 0
-                        else:
-                            wait_time = 60 * retry_count  # Exponential backoff
-                            logger.warning(f"Rate limited, waiting {wait_time} seconds")
-                            time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error(f"Error getting followers batch: {str(e)}")
-                        break
-                except Exception as e:
+    @staticmethod
+    def _is_throttle(error: Exception) -> bool:
+        """Whether an API error means Instagram wants us to slow down."""
+        error_msg = str(error).lower()
+        return (
+            getattr(error, 'code', None) == 429
+            or "please wait" in error_msg
+            or "rate limit" in error_msg
+            or "too many requests" in error_msg
+        )
+
+    @staticmethod
+    def _is_auth_error(error: Exception) -> bool:
+        """Whether an API error means the session must log in again before more work."""
+        error_msg = str(error).lower()
+        return "challenge_required" in error_msg or "login_required" in error_msg or "checkpoint" in error_msg
+
+    def _request(self, func, *args, **kwargs) -> Any:
+        """Perform one API call paced by the shared rate limiter.
+
+        Throttling errors are reported to the limiter, which lowers the account's
+        rate and imposes a cooldown before the call is retried. Challenge and
+        login errors open the session's circuit breaker instead of logging in
+        inline; recovery happens in the breaker's background probes. Every call
+        sent counts against the account's quotas; once they are used up this
+        raises QuotaExceeded so the work moves to another account. Each call
+        goes through the account's proxy and feeds that proxy's health score;
+        connection errors are retried.
+        """
+        circuit_breakers = get_circuit_breakers()
+        if not circuit_breakers.is_available(self.username):
+            raise SessionUnavailable(f"Session {self.username} is recovering from a challenge")
+        rate_limiter = get_rate_limiter()
+        quota_tracker = get_quota_tracker()
+        proxy_manager = get_proxy_manager()
+        for attempt in range(1, self.max_throttle_retries + 1):
+            quota_tracker.check(self.username)
+            # The account's proxy binding changes only when its proxy is evicted
+            proxy = proxy_manager.proxy_for(self.username, self.proxy)
+            self.set_proxy(proxy)
+            rate_limiter.acquire(self.username, proxy)
+            # Counted atomically with the check, right before the request goes out
+            quota_tracker.reserve(self.username)
+            started = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except ClientError as e:
+                if isinstance(e, ClientConnectionError):
+                    # The proxy's fault, not the account's: retry, on another proxy once it is evicted
+                    proxy_manager.record(proxy, time.monotonic() - started, failed=True)
+                    if attempt == self.max_throttle_retries:
+                        raise
+                    continue
+                proxy_manager.record(proxy, time.monotonic() - started)
+                if self._is_auth_error(e):
+                    quota_tracker.record(self.username, requests=0, challenges=1)
+                    if self.on_challenge:
+                        self.on_challenge(self)
+                    circuit_breakers.trip(self, e)
+                    raise SessionUnavailable(f"Session {self.username} needs to log in again: {str(e)}") from e
+                if not self._is_throttle(e):
+                    raise
+                rate_limiter.record_throttle(self.username, proxy)
+                if attempt == self.max_throttle_retries:
+                    raise
+                continue
+            except Exception:
+                proxy_manager.record(proxy, time.monotonic() - started, failed=True)
+                raise
+            proxy_manager.record(proxy, time.monotonic() - started)
+            rate_limiter.record_success(self.username, proxy)
+            return result
+
+    @staticmethod
+    def _format_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize a full user_info/username_info payload into a profile record."""
+        return {
+            "pk": user_data.get('pk'),
+            "username": user_data.get('username', ''),
+            "full_name": user_data.get('full_name', ''),
+            "biography": user_data.get('biography', ''),
+            "follower_count": user_data.get('follower_count', 0),
+            "following_count": user_data.get('following_count', 0),
+            "post_count": user_data.get('media_count', 0),
+            "is_private": user_data.get('is_private', False),
+            "is_verified": user_data.get('is_verified', False),
+            "external_url": user_data.get('external_url', '')
+        }
+
+    @staticmethod
+    def _format_listing_user(user: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize an entry of a user_followers page (no extra request needed)."""
+        return {
+            "pk": user.get('pk'),
+            "username": user.get('username', ''),
+            "full_name": user.get('full_name', ''),
+            "is_private": user.get('is_private', False),
+            "is_verified": user.get('is_verified', False)
+        }
+
+    def fetch_follower_page(self, user_id: int, rank_token: str, max_id: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch one page of the followers listing (a single paced request)."""
+        return self._request(
+            self.client.user_followers,
+            user_id,
+            rank_token=rank_token,
+            max_id=max_id
+        )
+
+    def hydrate_user(self, pk: int) -> Optional[Dict[str, Any]]:
+        """Return the full profile for a pk, from the profile cache or one user_info request."""
+        profile_cache = get_profile_cache()
+        cached = profile_cache.get_by_pk(pk)
+        if cached:
+            return cached
+
+        user_info = self._request(self.client.user_info, pk)
+        if not user_info or 'user' not in user_info:
+            logger.warning(f"Invalid user info response for user {pk}")
+            return None
+
+        profile = self._format_user(user_info['user'])
+        profile_cache.put(profile)
+        return profile
+
+    def _hydrate_with_backoff(
+        self,
+        pk: int,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Hydrate a follower, waiting out throttling instead of dropping the user.
+
+        Each round of ``_request`` retries lowers the account rate and lengthens
+        the cooldown. After ``max_throttle_rounds`` rounds the throttle error is
+        raised, so the page is retried or failed by its worker; None is returned
+        once ``should_stop`` says the job no longer wants the user.
+        """
+        for round_number in range(1, self.max_throttle_rounds + 1):
+            if should_stop and should_stop():
+                return None
+            try:
+                return self.hydrate_user(pk)
+            except ClientError as e:
+                if not self._is_throttle(e) or round_number == self.max_throttle_rounds:
+                    raise
+                logger.warning(f"Still throttled hydrating user {pk}, retrying after cooldown")
+
+    def hydrate_users(
+        self,
+        users: list,
+        hydrate: bool = True,
+        listing_filter: Optional[FollowerFilter] = None,
+        hydrator: Optional[SplitHydrator] = None,
+        seen_pks: Optional[set] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Yield the profiles of one followers page, skipping duplicates and filtered users.
+
+        Raises SessionUnavailable when this session's circuit opens; the page
+        should then be read again on another session. A throttle error that
+        outlasted every backoff round is raised as well, so the whole page is
+        retried rather than its users dropped. ``should_stop`` is checked before
+        every user.
+        """
+        seen_pks = seen_pks if seen_pks is not None else set()
+        pending = []
+        for user in users:
+            if should_stop and should_stop():
+                return
+            if user.get('pk') in seen_pks:
+                continue
+            seen_pks.add(user.get('pk'))
+            if listing_filter and listing_filter.rejects(user):
+                continue
+
+            if not hydrate:
+                yield self._format_listing_user(user)
+                continue
+
+            if hydrator:
+                pending.append(user)
+                continue
+
+            try:
+                profile = self._hydrate_with_backoff(user['pk'], should_stop)
+                if profile:
+                    yield profile
+                
+            except SessionUnavailable:
+                raise
+            except ClientError as e:
+                if self._is_throttle(e):
+                    raise
+                logger.error(f"Error getting follower info: {str(e)}")
+                continue
+            except KeyError as e:
+                logger.error(f"Missing field in user info response: {str(e)}")
+                continue
+            except Exception as e:
+                logger.error(f"Error getting follower info: {str(e)}")
+                continue
+
+        if pending:
+            yield from hydrator.hydrate(pending, pager=self, should_stop=should_stop)
+
+    def _iter_follower_pages(
+        self,
+        user_id: int,
+        rank_token: str,
+        max_id: Optional[str],
+        state: Dict[str, Any],
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Generator[Tuple[Optional[str], list], None, None]:
+        """Yield (page max_id, users) for every followers page starting at max_id.
+
+        ``state["max_id"]`` always holds the page being requested and
+        ``state["exhausted"]`` is set only when the listing really ended.
+        ``state["unavailable"]`` is set when the session's circuit opened and
+        ``state["throttled"]`` when a page stayed throttled for
+        ``max_throttle_rounds`` rounds. Listing ends early once ``should_stop``
+        returns True.
+        """
+        throttle_rounds = 0
+        while True:
+            if should_stop and should_stop():
+                return
+            state["max_id"] = max_id
+            try:
+                # Get followers with pagination
+                results = self.fetch_follower_page(user_id, rank_token, max_id)
+            except SessionUnavailable as e:
+                # Another session picks the listing up from this page
+                logger.warning(f"Session unavailable while getting followers: {str(e)}")
+                state["unavailable"] = e
+                return
+            except ClientError as e:
+                if self._is_throttle(e):
+                    throttle_rounds += 1
+                    if throttle_rounds >= self.max_throttle_rounds:
+                        logger.error(f"Followers page still throttled after {throttle_rounds} rounds")
+                        state["throttled"] = e
+                        return
+                    # The rate limiter is already cooling this account down
+                    continue
+                else:
                     logger.error(f"Error getting followers batch: {str(e)}")
-                    break
+                    return
+            except Exception as e:
+                logger.error(f"Error getting followers batch: {str(e)}")
+                return
+
+            throttle_rounds = 0
+            users = results.get('users', [])
+            if users:
+                yield max_id, users
+
+            max_id = results.get('next_max_id')
+            if not users or not max_id:
+                state["exhausted"] = True
+                return
+
+    def get_followers(
+        self,
+        username: str,
+        hydrate: bool = True,
+        user_id: Optional[int] = None,
+        cursor: Optional[Dict[str, Any]] = None,
+        listing_filter: Optional[FollowerFilter] = None,
+        prefetch_pages: int = 2,
+        hydrator: Optional[SplitHydrator] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Get followers of an Instagram account.
+
+        Args:
+            username: Target account whose followers are listed.
+            hydrate: When True every follower is fetched once with user_info and the
+                full profile is yielded. When False only the fields already present
+                on the followers page are yielded and no per-user request is made.
+            user_id: Target pk, if already known, to skip the username_info lookup.
+            cursor: Pagination checkpoint. Crawling starts from its ``max_id`` and
+                ``rank_token`` when present, and the dict is updated in place: when
+                the next page is requested ``max_id`` points at it, so every follower
+                yielded before that is safe to commit against the stored cursor.
+                ``exhausted`` is set once the last page has been consumed.
+            listing_filter: Rules evaluated on the listing fields of each follower;
+                followers it rejects are skipped without any user_info request.
+            prefetch_pages: Number of listing pages fetched ahead by a background
+                thread while the current page is hydrated. 0 pages serially.
+            hydrator: When given, each page is hydrated on the hydrator's sessions
+                in parallel while this client only walks the follower cursor.
+            should_stop: Checked between requests; listing and hydration end
+                (with the cursor at the current page) once it returns True.
+
+        Raises:
+            SessionUnavailable: This session's circuit breaker opened. The cursor
+                points at the page to continue from on another session.
+            ClientError: A page or user stayed throttled through every backoff
+                round. The cursor points at that page.
+        """
+        if cursor is None:
+            cursor = {}
+        try:
+            user_id = user_id or cursor.get('user_id')
+            if user_id is None:
+                user_info = self._request(self.client.username_info, username)
+                user_id = user_info['user']['pk']
+            rank_token = cursor.get('rank_token') or self.client.generate_uuid()
+            cursor.update({"user_id": user_id, "rank_token": rank_token, "exhausted": False})
+            seen_pks = set()  # Pages can overlap; never hydrate the same profile twice
+
+            page_state = {"max_id": cursor.get('max_id'), "exhausted": False}
+            pages = self._iter_follower_pages(user_id, rank_token, cursor.get('max_id'), page_state, should_stop)
+            if prefetch_pages > 0 and hydrate:
+                pages = prefetch(pages, prefetch_pages)
+
+            for page_max_id, users in pages:
+                # The checkpoint follows the page being hydrated, not the prefetcher
+                cursor["max_id"] = page_max_id
+                yield from self.hydrate_users(
+                    users,
+                    hydrate=hydrate,
+                    listing_filter=listing_filter,
+                    hydrator=hydrator,
+                    seen_pks=seen_pks,
+                    should_stop=should_stop
+                )
+
+            if page_state["exhausted"]:
+                cursor["exhausted"] = True
+            else:
+                # Listing stopped on an error: resume at the page that failed
+                cursor["max_id"] = page_state["max_id"]
+                if page_state.get("unavailable"):
+                    raise page_state["unavailable"]
+                if page_state.get("throttled"):
+                    raise page_state["throttled"]
                     
         except Exception as e:
             logger.error(f"Error getting followers for {username}: {str(e)}")
@@ -172,30 +540,22 @@ class InstagramClient:
     def get_account_info(self, username: str) -> Dict[str, Any]:
         """Get information about an Instagram account."""
         try:
-            user_info = self.client.username_info(username)
+            profile_cache = get_profile_cache()
+            cached = profile_cache.get_by_username(username)
+            if cached:
+                return cached
+
+            user_info = self._request(self.client.username_info, username)
             if not user_info or 'user' not in user_info:
                 raise ValueError(f"Invalid response for username {username}")
                 
-            user = user_info['user']
-            return {
-                "username": user.get('username', ''),
-                "full_name": user.get('full_name', ''),
-                "biography": user.get('biography', ''),
-                "follower_count": user.get('follower_count', 0),
-                "following_count": user.get('following_count', 0),
-                "post_count": user.get('media_count', 0),
-                "is_private": user.get('is_private', False),
-                "is_verified": user.get('is_verified', False),
-                "external_url": user.get('external_url', '')
-            }
-        except ClientError as e:
-            if "challenge_required" in str(e):
-                logger.warning(f"Challenge required while getting account info for {username}")
-                self._login()  # Re-login to handle challenge
-                return self.get_account_info(username)  # Retry after re-login
-            else:
-                logger.error(f"Error getting account info for {username}: {str(e)}")
-                raise
+            profile = self._format_user(user_info['user'])
+            profile_cache.put(profile)
+            return profile
+        except SessionUnavailable as e:
+            # The circuit breaker recovers the session; callers retry on another one
+            logger.warning(f"Session unavailable while getting account info for {username}: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"Error getting account info for {username}: {str(e)}")
             raise
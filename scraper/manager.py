@@ -1,15 +1,23 @@
 from typing import Optional, Dict, List, Generator, Any
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker, scoped_session
+from database.config import session_scope
 from database.models import InstagramAccount, Follower, ScrapingSession
-from .worker import WorkerPool
-from .session_manager import SessionManager
-from .proxy_manager import ProxyManager
+from .worker import WorkerPool, ScrapeJob
+from .session_manager import SessionManager, get_session_manager
+from .proxy_manager import get_proxy_manager
+from .rate_limiter import get_rate_limiter
+from .quota import get_quota_tracker
+from .hydration import SplitHydrator
+from .circuit_breaker import SessionUnavailable
+from .writer import ResultWriter, WriteFailed
+from .filters import FollowerFilter, skip_private, skip_usernames, skip_bot_patterns, parse_patterns, merge_stats
 import logging
 from datetime import datetime
 import json
 import time
 import threading
-from queue import Queue
+import queue
 import os
 from dotenv import load_dotenv
 
@@ -18,39 +26,181 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Statuses a crawl can be resumed from after a crash or restart
+RESUMABLE_STATUSES = ("running", "failed")
+
+# Sessions being processed by any ScraperManager in this process (Streamlit
+# builds one manager per browser session, so resumes must not double up)
+_claimed_sessions = set()
+_claimed_lock = threading.Lock()
+# The job of each claimed session, so any manager can stop it
+_active_jobs: Dict[int, ScrapeJob] = {}
+
 class ScraperManager:
-    def __init__(self, db, username=None, password=None, batch_size=50, delay=2):
-        self.db = db
+    # Sessions tried in a row for a target's account lookup while their circuits open
+    max_session_switches = 3
+
+    def __init__(
+        self,
+        db,
+        username=None,
+        password=None,
+        batch_size=50,
+        delay=2,
+        prefetch_pages=2,
+        session_manager: Optional[SessionManager] = None,
+        skip_private_accounts=True,
+        bot_patterns: Optional[List[str]] = None,
+        split_hydration=True,
+        num_workers: Optional[int] = None,
+        bulk_insert=True,
+        max_queued_results: Optional[int] = None,
+        flush_rows: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        # `db` is a sessionmaker (or a Session whose engine is reused). Every thread
+        # gets its own session from it, and each method is one session_scope()
+        factory = db if isinstance(db, sessionmaker) else sessionmaker(bind=db.get_bind())
+        self.Session = scoped_session(factory)
+        self.db = self.Session
         self.username = username or os.getenv('INSTAGRAM_USERNAME')
         self.password = password or os.getenv('INSTAGRAM_PASSWORD')
         self.batch_size = batch_size
         self.delay = delay
-        self.results_queue = Queue()
-        self.session_manager = SessionManager()
-        self.proxy_manager = ProxyManager()
+        self.prefetch_pages = prefetch_pages
+        # Pre-hydration rules, evaluated on the fields of the followers listing
+        self.skip_private_accounts = skip_private_accounts
+        self.bot_patterns = bot_patterns if bot_patterns is not None else parse_patterns(os.getenv('BOT_USERNAME_PATTERNS'))
+        self.listing_filters: List[FollowerFilter] = []
+        # Hydrate one target's followers on every healthy session, not just the pager
+        self.split_hydration = split_hydration
+        # Sessions are loaded once per process, not once per manager (the settings
+        # page builds a new manager on every save)
+        self.shared_session_manager = session_manager is None
+        self.session_manager = session_manager or get_session_manager()
+        self.proxy_manager = get_proxy_manager()
+        # Start every account at one request per `delay` seconds; AIMD adapts from there
+        self.rate_limiter = get_rate_limiter()
+        if delay and delay > 0:
+            self.rate_limiter.configure(account_rate=1.0 / delay)
+        # Hourly/daily request counts per account, kept in this database across restarts
+        self.quota_tracker = get_quota_tracker()
+        self.quota_tracker.bind(factory)
+        # Every crawl runs as page tasks on this pool; the worker count bounds how
+        # many pages (across all jobs) are listed and hydrated at once
         self.worker_pool = WorkerPool(
-            num_workers=3,
-            db=db,
+            num_workers=num_workers or int(os.getenv('SCRAPER_WORKERS', '3')),
+            db=self.Session,
             session_manager=self.session_manager,
             batch_size=batch_size,
-            delay=delay
+            delay=delay,
+            max_queued_results=max_queued_results or int(os.getenv('RESULT_QUEUE_SIZE', '100'))
         )
+        self.results_queue = self.worker_pool.result_queue
+        # Results are persisted by a dedicated writer thread once a crawl starts
+        self.flush_rows = flush_rows or int(os.getenv('WRITER_FLUSH_ROWS', '500'))
+        self.flush_interval = flush_interval or float(os.getenv('WRITER_FLUSH_INTERVAL', '1.0'))
+        self.writer: Optional[ResultWriter] = None
         self.active_sessions = {}
+        # Seconds a crawl's worker waits for a free session to page with
+        self.lease_timeout = float(os.getenv('SESSION_LEASE_TIMEOUT', '60'))
+        # Drain the results queue into one multi-row INSERT instead of an ORM object per row
+        self.bulk_insert = bulk_insert
+        self.write_stats = {"rows": 0, "transactions": 0, "seconds": 0.0}
+        self.write_lock = threading.Lock()
+        # Results process_results could not store, written first by its next call
+        self.unwritten: List[Dict] = []
         logger.info(f"Initialized ScraperManager with batch_size={batch_size}, delay={delay}")
 
-    def get_valid_session(self) -> Any:
-        """Get a valid Instagram session."""
+    def configure(self, batch_size: Optional[int] = None, delay: Optional[float] = None):
+        """Apply new scraping settings to this manager and its running workers."""
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if delay is not None:
+            self.delay = delay
+            if delay > 0:
+                self.rate_limiter.configure(account_rate=1.0 / delay)
+        self.worker_pool.configure(batch_size=batch_size, delay=delay)
+        logger.info(f"Updated ScraperManager settings: batch_size={self.batch_size}, delay={self.delay}")
+
+    def start_writer(self) -> ResultWriter:
+        """Start the thread that persists queued results (idempotent)."""
+        with self.write_lock:
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = ResultWriter(
+                    self.results_queue,
+                    self.write_results,
+                    flush_rows=self.flush_rows,
+                    flush_interval=self.flush_interval
+                )
+                self.writer.start()
+                logger.info(f"Started result writer (flush at {self.flush_rows} rows or {self.flush_interval}s)")
+            return self.writer
+
+    def shutdown(self):
+        """Stop the workers, let the writer drain the queue, then flush the sessions."""
+        self.worker_pool.stop()
+        # Crawls cut short keep their checkpoint and can be resumed by another manager
+        for session_id, active in list(self.active_sessions.items()):
+            job = active["job"]
+            if not job.finished:
+                job.release_session(self.session_manager)
+                self._release(session_id)
+        if self.writer:
+            self.writer.stop()
+            self.writer = None
+        self.quota_tracker.flush()
+        if self.shared_session_manager:
+            # Other managers still use it; just persist what changed
+            self.session_manager.flush()
+        else:
+            self.session_manager.close()
+        logger.info("Scraper manager shut down")
+
+    def get_capacity(self) -> Dict[str, Any]:
+        """Profiles per day the saved accounts can deliver within their request quotas.
+
+        Requests per stored profile is measured from this process's crawls
+        (1.0 until something has been written).
+        """
+        rows = self.get_write_stats()["rows"]
+        requests = self.quota_tracker.recorded
+        requests_per_profile = requests / rows if rows and requests else 1.0
+        usernames = [entry.session_id for entry in self.session_manager.sessions.values() if entry.challenges < 3]
+        return self.quota_tracker.capacity(usernames, requests_per_profile)
+
+    def get_writer_stats(self) -> Optional[Dict[str, Any]]:
+        return self.writer.get_stats() if self.writer else None
+
+    def session_scope(self):
+        """Open a unit of work on this thread's own session."""
+        return session_scope(self.Session)
+
+    def get_valid_session(self, lease: bool = False, timeout: Optional[float] = None) -> Any:
+        """Get a valid Instagram session.
+
+        With ``lease`` the session is leased for exclusive use (up to the
+        per-account limit) and must be given back with session_manager.release;
+        ``timeout`` bounds the wait for one (default: lease_timeout).
+        """
         logger.info("Attempting to get valid Instagram session")
-        session = self.session_manager.get_best_session()
+        timeout = self.lease_timeout if timeout is None else timeout
+        if lease:
+            session = self.session_manager.acquire(timeout=timeout)
+            if not session and len(self.session_manager.sessions):
+                raise RuntimeError(f"No Instagram session free within {timeout} seconds")
+        else:
+            session = self.session_manager.get_best_session()
         
         if not session:
+            # Last resort, logging in on the caller's thread: no saved session and no warm standby
             logger.info("No valid session found, creating new session")
             if not self.username or not self.password:
                 error_msg = "Instagram credentials not found"
                 logger.error(error_msg)
                 raise ValueError(error_msg)
             
-            proxy = self.proxy_manager.get_next_proxy()
+            proxy = self.proxy_manager.proxy_for(self.username)
             logger.info(f"Creating new session with proxy: {proxy}")
             
             try:
@@ -63,241 +213,508 @@ class ScraperManager:
             except Exception as e:
                 logger.error(f"Failed to create session: {str(e)}")
                 raise
+            if lease:
+                session = self.session_manager.acquire(timeout=timeout)
+                if not session:
+                    raise RuntimeError(f"No Instagram session free within {timeout} seconds")
         
         return session
 
     def start_scraping(self, target_username: str, max_followers: int = 1000) -> Optional[int]:
-        """Start a new scraping session."""
+        """Start a new scraping session.
+
+        The account lookup runs on a shared (unleased) session, so this does
+        not wait for a free account. The crawl's worker leases its pager, held
+        until the crawl finishes (SESSION_MAX_LEASES jobs per account).
+        """
         try:
             logger.info(f"Starting scraping process for @{target_username}")
             session = self.get_valid_session()
             
-            # Get account info
+            # Get account info, moving to another session if this one's circuit opens
             logger.info(f"Fetching account info for @{target_username}")
             try:
-                account_info = session.get_account_info(target_username)
+                for attempt in range(1, self.max_session_switches + 1):
+                    try:
+                        account_info = session.get_account_info(target_username)
+                        break
+                    except SessionUnavailable as e:
+                        if attempt == self.max_session_switches:
+                            raise
+                        logger.warning(f"Retrying account info for @{target_username} on another session: {str(e)}")
+                        session = self.get_valid_session()
                 logger.info(f"Successfully fetched account info for @{target_username}")
             except Exception as e:
                 logger.error(f"Failed to fetch account info: {str(e)}")
                 raise
 
-            # Create or update account
-            account = self.db.query(InstagramAccount).filter_by(username=target_username).first()
-            if not account:
-                account = InstagramAccount(
-                    username=target_username,
-                    full_name=account_info.get('full_name'),
-                    biography=account_info.get('biography'),
-                    follower_count=account_info.get('follower_count', 0),
-                    following_count=account_info.get('following_count', 0),
-                    post_count=account_info.get('post_count', 0),
-                    is_private=account_info.get('is_private', False),
-                    is_verified=account_info.get('is_verified', False),
-                    external_url=account_info.get('external_url'),
+            # One unit of work: the account upsert and the new session commit together
+            with self.session_scope() as db:
+                # Create or update account
+                account = db.query(InstagramAccount).filter_by(username=target_username).first()
+                if not account:
+                    account = InstagramAccount(
+                        username=target_username,
+                        full_name=account_info.get('full_name'),
+                        biography=account_info.get('biography'),
+                        follower_count=account_info.get('follower_count', 0),
+                        following_count=account_info.get('following_count', 0),
+                        post_count=account_info.get('post_count', 0),
+                        is_private=account_info.get('is_private', False),
+                        is_verified=account_info.get('is_verified', False),
+                        external_url=account_info.get('external_url'),
+                        created_at=datetime.utcnow(),
+                        updated_at=datetime.utcnow()
+                    )
+                    db.add(account)
+                    logger.info(f"Created new account record for @{target_username}")
+                else:
+                    # Update existing account
+                    for key, value in account_info.items():
+                        if hasattr(account, key):
+                            setattr(account, key, value)
+                    account.updated_at = datetime.utcnow()
+                    logger.info(f"Updated existing account record for @{target_username}")
+            
+                db.flush()
+
+                # Create scraping session
+                session_record = ScrapingSession(
+                    target_username=target_username,
+                    account_id=account.id,
+                    status="running",
+                    max_followers=max_followers,
                     created_at=datetime.utcnow(),
                     updated_at=datetime.utcnow()
                 )
-                self.db.add(account)
-                logger.info(f"Created new account record for @{target_username}")
-            else:
-                # Update existing account
-                for key, value in account_info.items():
-                    if hasattr(account, key):
-                        setattr(account, key, value)
-                account.updated_at = datetime.utcnow()
-                logger.info(f"Updated existing account record for @{target_username}")
+                db.add(session_record)
+                db.flush()
+                session_id = session_record.id
             
-            self.db.commit()
+            logger.info(f"Started scraping session #{session_id} for @{target_username}")
 
-            # Create scraping session
-            session_record = ScrapingSession(
-                target_username=target_username,
-                account_id=account.id,
-                status="running",
-                max_followers=max_followers,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
+            # Start the scraping process in background; its first page leases the pager
+            if not self._claim(session_id):
+                return None
+            self._launch(
+                session_id,
+                target_username,
+                None,
+                cursor={"user_id": account_info.get("pk")},
+                max_followers=max_followers
             )
-            self.db.add(session_record)
-            self.db.commit()
-            
-            logger.info(f"Started scraping session #{session_record.id} for @{target_username}")
-
-            # Start the scraping process in background
-            self.active_sessions[session_record.id] = {
-                "session": session,
-                "cursor": None,
-                "followers_scraped": 0,
-                "max_followers": max_followers,
-                "errors": 0,
-                "last_request": datetime.utcnow()
-            }
-
-            # Start processing followers
-            threading.Thread(
-                target=self._process_followers,
-                args=(session_record.id, target_username),
-                daemon=True
-            ).start()
-
-            return session_record.id
+
+            return session_id
 
         except Exception as e:
             logger.error(f"Error starting scraping session: {str(e)}")
             return None
 
-    def _process_followers(self, session_id: int, username: str):
-        """Process followers in background."""
+    def _launch(
+        self,
+        session_id: int,
+        target_username: str,
+        session: Optional[Any],
+        cursor: Dict[str, Any],
+        max_followers: int,
+        known_usernames: Optional[set] = None
+    ):
+        """Register a crawl in active_sessions and queue its first page on the worker pool.
+
+        The caller holds the session's claim (see ``_claim``); it is given back
+        if the job cannot be built. ``session`` is a pager already leased for
+        the job; without one the worker leases it when the first page runs.
+        """
+        known_usernames = known_usernames if known_usernames is not None else set()
         try:
-            session_data = self.active_sessions.get(session_id)
-            if not session_data:
-                logger.error(f"No session data found for session #{session_id}")
-                return
+            if not cursor.get("rank_token") and session is not None:
+                cursor["rank_token"] = session.client.generate_uuid()
+            job = ScrapeJob(
+                session_id,
+                target_username,
+                cursor,
+                session=session,
+                listing_filter=self.build_listing_filter(known_usernames),
+                known_usernames=known_usernames,
+                hydrator=self.build_hydrator(session),
+                # Followers stored before a resume count against the budget
+                max_followers=max_followers - len(known_usernames),
+                max_in_flight=self.prefetch_pages + 1,
+                on_finish=self._finish_job,
+                leased=True,
+                lease_timeout=self.lease_timeout
+            )
+        except Exception:
+            self._release(session_id)
+            raise
 
-            instagram_session = session_data["session"]
-            batch = []
-            
-            logger.info(f"Starting follower processing for session #{session_id}")
-            
-            for follower in instagram_session.get_followers(username):
-                try:
-                    if len(batch) >= self.batch_size:
-                        self.add_result(session_id, batch)
-                        batch = []
-                        time.sleep(self.delay)  # Rate limiting
-                    
-                    # Get detailed follower info
-                    follower_info = instagram_session.get_account_info(follower['username'])
-                    batch.append(follower_info)
-                    
-                    # Handle rate limits and challenges
-                    self.handle_rate_limit(instagram_session)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing follower {follower['username']}: {str(e)}")
-                    self.handle_rate_limit(instagram_session, error=e)
-                    continue
-            
-            # Add remaining followers
-            if batch:
-                self.add_result(session_id, batch)
-            
-            logger.info(f"Completed follower processing for session #{session_id}")
-            
+        with _claimed_lock:
+            _active_jobs[session_id] = job
+        self.active_sessions[session_id] = {
+            "session": session,
+            "job": job,
+            "cursor": cursor,
+            "known_usernames": known_usernames,
+            "followers_scraped": 0,
+            "max_followers": max_followers,
+            "errors": 0,
+            "last_request": datetime.utcnow()
+        }
+
+        self.start_writer()
+        self.worker_pool.add_job(job)
+        logger.info(f"Queued session #{session_id} on the worker pool")
+
+    def _claim(self, session_id: int) -> bool:
+        """Mark a session as processed here; False when a crawl of it is already running."""
+        with _claimed_lock:
+            if session_id in _claimed_sessions:
+                logger.warning(f"Session #{session_id} is already being processed")
+                return False
+            _claimed_sessions.add(session_id)
+            return True
+
+    def _release(self, session_id: int):
+        with _claimed_lock:
+            _claimed_sessions.discard(session_id)
+            _active_jobs.pop(session_id, None)
+
+    def _finish_job(self, job: ScrapeJob):
+        """Called by the worker pool once a job has no page left in flight."""
+        logger.info(
+            f"Finished follower processing for session #{job.session_id} "
+            f"({job.followers_found} followers, stopped={job.stopped})"
+        )
+        job.release_session(self.session_manager)
+        self._release(job.session_id)
+
+    def build_listing_filter(self, known_usernames: set) -> FollowerFilter:
+        """Rules that skip followers before hydration, so they cost no user_info request."""
+        listing_filter = FollowerFilter([skip_usernames(known_usernames)])
+        if self.skip_private_accounts:
+            listing_filter.add_rule(*skip_private())
+        if self.bot_patterns:
+            listing_filter.add_rule(*skip_bot_patterns(self.bot_patterns))
+        self.listing_filters.append(listing_filter)
+        return listing_filter
+
+    def get_filter_stats(self) -> Dict[str, int]:
+        """Hydration requests saved by each pre-hydration rule, across all crawls."""
+        return merge_stats(self.listing_filters)
+
+    def build_hydrator(self, pager: Optional[Any]) -> Optional[SplitHydrator]:
+        """Pool of the healthy sessions that hydrate the pages walked by ``pager``.
+
+        The pager takes part too: its page requests are paced by the same account
+        bucket. With a single healthy session there is nothing to split. Each page
+        only uses the helpers that have a free lease slot at that moment. Without
+        a pager yet, every healthy session is in the pool.
+        """
+        if not self.split_hydration:
+            return None
+        sessions = [pager] if pager is not None else []
+        sessions += [
+            session for session in self.session_manager.get_valid_sessions()
+            if pager is None or (session is not pager and session.username != pager.username)
+        ]
+        if len(sessions) < 2:
+            return None
+        logger.info(f"Hydrating with up to {len(sessions)} sessions: {', '.join(s.username for s in sessions)}")
+        # Helpers are leased page by page, so accounts other jobs hold are left alone
+        return SplitHydrator(sessions, session_manager=self.session_manager)
+
+    def is_processing(self, session_id: int) -> bool:
+        """Whether the worker pool still has pages of this session queued or in flight."""
+        with _claimed_lock:
+            return session_id in _claimed_sessions
+
+    def resume_scraping(self, session_id: int, lease_timeout: Optional[float] = None) -> bool:
+        """Continue a running or failed scraping session from its last committed page.
+
+        ``lease_timeout`` bounds the wait for a free account (default: lease_timeout).
+        """
+        # Claimed before anything is changed: the crawl may be running in this process already
+        if not self._claim(session_id):
+            return False
+        session = None
+        try:
+            with self.session_scope() as db:
+                session_record = db.get(ScrapingSession, session_id)
+                if not session_record or session_record.status not in RESUMABLE_STATUSES:
+                    logger.warning(f"Session #{session_id} cannot be resumed")
+                    self._release(session_id)
+                    return False
+
+                cursor = json.loads(session_record.last_cursor) if session_record.last_cursor else {}
+                # The page the cursor points at may be partly stored already
+                known_usernames = {
+                    username for (username,) in db.query(Follower.username)
+                    .filter_by(scraping_session_id=session_id)
+                }
+                if len(known_usernames) >= session_record.max_followers:
+                    # Stopped right after its last page was stored: nothing left to fetch
+                    now = datetime.utcnow()
+                    session_record.status = "completed"
+                    session_record.completed_at = now
+                    session_record.updated_at = now
+                    logger.info(f"Session #{session_id} already has its {session_record.max_followers} followers")
+                    self._release(session_id)
+                    return False
+
+                session = self.get_valid_session(lease=True, timeout=lease_timeout)
+                session_record.status = "running"
+                session_record.error_count = 0
+                session_record.updated_at = datetime.utcnow()
+                target_username = session_record.target_username
+                max_followers = session_record.max_followers
+
+            self._launch(
+                session_id,
+                target_username,
+                session,
+                cursor=cursor,
+                max_followers=max_followers,
+                known_usernames=known_usernames
+            )
+            logger.info(
+                f"Resumed scraping session #{session_id} for @{target_username} "
+                f"at cursor {cursor.get('max_id')} ({len(known_usernames)} followers already stored)"
+            )
+            return True
         except Exception as e:
-            logger.error(f"Error in follower processing thread: {str(e)}")
-            self._handle_scraping_error(session_id, str(e))
+            logger.error(f"Error resuming session #{session_id}: {str(e)}")
+            if session is not None:
+                self.session_manager.release(session)
+            self._release(session_id)
+            return False
 
-    def handle_rate_limit(self, session: Any, error: Optional[Exception] = None, cooldown: int = 600):
-        """Handle rate limiting and challenges."""
+    def resume_all(self) -> List[int]:
+        """Resume every running or failed session left over from a previous process."""
         try:
-            if error and "challenge_required" in str(error):
-                logger.warning(f"Challenge required for session, attempting to resolve")
-                try:
-                    # Try to resolve challenge
-                    session._login()  # This will trigger challenge resolution
-                    logger.info("Successfully resolved challenge")
-                    return
-                except Exception as ce:
-                    logger.error(f"Failed to resolve challenge: {str(ce)}")
-                    self.session_manager.increment_challenges(session)
-                    
-                    # Get a new session if this one has too many challenges
-                    if not self.session_manager.is_session_valid(session):
-                        logger.info("Session no longer valid, getting new session")
-                        session = self.get_valid_session()
-            
-            # Handle rate limits
-            if error and ("rate limit" in str(error).lower() or "too many requests" in str(error).lower()):
-                logger.warning(f"Rate limit hit, cooling down for {cooldown} seconds")
-                time.sleep(cooldown)
-            
-            # Always increment requests and save session state
-            self.session_manager.increment_requests(session)
-            # Find username for the session
-            for username, data in self.session_manager.sessions.items():
-                if data["session"] == session:
-                    self.session_manager.save_session(username, session)
-                    break
-            
-            # Add delay between requests
-            time.sleep(self.delay)
+            with self.session_scope() as db:
+                session_ids = [
+                    session_id for (session_id,) in db.query(ScrapingSession.id)
+                    .filter(ScrapingSession.status.in_(RESUMABLE_STATUSES))
+                ]
         except Exception as e:
-            logger.error(f"Error handling rate limit: {str(e)}")
+            logger.error(f"Error listing resumable sessions: {str(e)}")
+            return []
+        # Crawls that find no free account now stay resumable for a later call
+        return [session_id for session_id in session_ids if self.resume_scraping(session_id, lease_timeout=0)]
 
     def _handle_scraping_error(self, session_id: int, error_message: str):
-        """Handle scraping errors."""
+        """Record the error that ended a crawl (a page failed after every attempt).
+
+        The worker pool has stopped the job, so the session is marked failed
+        (resumable) unless it was stopped or completed meanwhile.
+        """
         try:
-            session_record = self.db.get(ScrapingSession, session_id)
-            if session_record:
-                session_record.error_count += 1
-                session_record.last_error = error_message
-                session_record.status = "failed" if session_record.error_count >= 3 else "running"
-                session_record.updated_at = datetime.utcnow()
-                self.db.commit()
-                logger.error(f"Updated session #{session_id} with error: {error_message}")
+            with self.session_scope() as db:
+                session_record = db.get(ScrapingSession, session_id)
+                if session_record:
+                    session_record.error_count += 1
+                    session_record.last_error = error_message
+                    if session_record.status == "running":
+                        session_record.status = "failed"
+                    session_record.updated_at = datetime.utcnow()
+                    logger.error(f"Updated session #{session_id} with error: {error_message}")
         except Exception as e:
             logger.error(f"Error handling scraping error: {str(e)}")
 
-    def process_results(self):
-        """Process scraping results from the queue."""
+    def process_results(self, bulk: Optional[bool] = None):
+        """Process scraping results from the queue.
+
+        The bulk path (default) drains everything queued and writes it in one
+        transaction; the ORM path commits one transaction per queued result.
+        While the writer thread runs it owns the queue, and this only asks it
+        to flush now.
+        """
+        writer = self.writer
+        if writer and writer.is_alive():
+            writer.flush()
+            return
+        results, self.unwritten = self.unwritten + self._drain_results(), []
+        if results:
+            try:
+                self.write_results(results, bulk=bulk)
+            except WriteFailed as e:
+                logger.error(f"Keeping {len(e.results)} results for the next write: {str(e)}")
+                self.unwritten = e.results
+
+    def write_results(self, results: List[Dict], bulk: Optional[bool] = None):
+        """Persist a list of queued results through the bulk or the ORM path."""
+        bulk = self.bulk_insert if bulk is None else bulk
+        if bulk:
+            self._write_results_bulk(results)
+        else:
+            self._write_results_orm(results)
+
+    def _drain_results(self) -> List[Dict]:
+        results = []
+        while True:
+            try:
+                results.append(self.results_queue.get_nowait())
+            except queue.Empty:
+                return results
+
+    def _follower_row(self, follower_data: Dict, session: ScrapingSession, now: datetime) -> Dict[str, Any]:
+        """Column values of one stored follower."""
+        return {
+            "username": follower_data["username"],
+            "full_name": follower_data.get("full_name"),
+            "follower_count": follower_data.get("follower_count", 0),
+            "following_count": follower_data.get("following_count", 0),
+            "post_count": follower_data.get("post_count", 0),
+            "is_private": follower_data.get("is_private", False),
+            "is_verified": follower_data.get("is_verified", False),
+            "account_id": session.account_id,
+            "scraping_session_id": session.id,
+            "created_at": now,
+            "updated_at": now
+        }
+
+    def _apply_result(self, session: ScrapingSession, stored: int, cursor: Optional[Dict], now: datetime):
+        """Advance a session record past a stored batch and the checkpoint that covers it."""
+        session.followers_scraped += stored
+        session.updated_at = now
+        if cursor:
+            # Checkpoint committed in the same transaction as the batch
+            session.last_cursor = json.dumps({
+                "user_id": cursor.get("user_id"),
+                "rank_token": cursor.get("rank_token"),
+                "max_id": cursor.get("max_id")
+            })
+
+        # A stopped session keeps its status while its last in-flight rows land
+        if session.status == "running" and (
+            session.followers_scraped >= session.max_followers or (cursor and cursor.get("exhausted"))
+        ):
+            session.status = "completed"
+            session.completed_at = now
+            logger.info(f"Session #{session.id} completed successfully")
+
+    def _record_write(self, rows: int, seconds: float):
+        with self.write_lock:
+            self.write_stats["rows"] += rows
+            self.write_stats["transactions"] += 1
+            self.write_stats["seconds"] += seconds
+
+    def get_write_stats(self) -> Dict[str, Any]:
+        """Follower rows written so far and the time spent in those transactions."""
+        with self.write_lock:
+            stats = dict(self.write_stats)
+        stats["rows_per_second"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+        return stats
+
+    def _write_results_orm(self, results: List[Dict]):
+        """One Follower object per row, one transaction per queued result.
+
+        A result that cannot be stored holds back the later results of its
+        session, so checkpoints are never stored out of order; the others are
+        written. Raises WriteFailed with the results left unwritten.
+        """
+        unwritten = []
+        held_back = set()
+        error = None
+        for result in results:
+            session_id = result.get("session_id")
+            if session_id in held_back:
+                unwritten.append(result)
+                continue
+            if not result.get("success", True):
+                self._handle_scraping_error(session_id, result.get("error"))
+                continue
+            followers = result.get("data", {}).get("followers", [])
+
+            # Each queued result is one transaction: its rows and its checkpoint
+            started = time.perf_counter()
+            try:
+                with self.session_scope() as db:
+                    session = db.get(ScrapingSession, session_id)  # Using newer Session.get() syntax
+                    if session:
+                        now = datetime.utcnow()
+                        for follower_data in followers:
+                            db.add(Follower(**self._follower_row(follower_data, session, now)))
+                        self._apply_result(session, len(followers), result.get("cursor"), now)
+                        logger.debug(f"Processed {len(followers)} followers for session #{session_id}")
+            except Exception as e:
+                logger.error(f"Error storing {len(followers)} followers for session #{session_id}: {str(e)}")
+                held_back.add(session_id)
+                unwritten.append(result)
+                error = e
+                continue
+            self._record_write(len(followers), time.perf_counter() - started)
+        if unwritten:
+            raise WriteFailed(f"{len(unwritten)} results not stored: {str(error)}", unwritten)
+
+    def _write_results_bulk(self, results: List[Dict]):
+        """Store a list of queued results in one transaction with one multi-row INSERT.
+
+        Failure results are applied to their sessions after the rows are stored.
+        If the transaction fails, the results are written one transaction each
+        instead, and WriteFailed names the ones that still could not be stored.
+        """
+        failures = [result for result in results if not result.get("success", True)]
+        results = [result for result in results if result.get("success", True)]
         try:
-            # Process any pending results
-            while not self.results_queue.empty():
-                result = self.results_queue.get()
-                session_id = result.get("session_id")
-                followers = result.get("followers", [])
-                
-                session = self.db.get(ScrapingSession, session_id)  # Using newer Session.get() syntax
-                if session:
-                    for follower_data in followers:
-                        follower = Follower(
-                            username=follower_data["username"],
-                            full_name=follower_data.get("full_name"),
-                            follower_count=follower_data.get("follower_count", 0),
-                            following_count=follower_data.get("following_count", 0),
-                            post_count=follower_data.get("post_count", 0),
-                            is_private=follower_data.get("is_private", False),
-                            is_verified=follower_data.get("is_verified", False),
-                            account_id=session.account_id,
-                            scraping_session_id=session.id,
-                            created_at=datetime.utcnow(),
-                            updated_at=datetime.utcnow()
-                        )
-                        self.db.add(follower)
-                    
-                    session.followers_scraped += len(followers)
-                    session.updated_at = datetime.utcnow()
-                    
-                    if session.followers_scraped >= session.max_followers:
-                        session.status = "completed"
-                        session.completed_at = datetime.utcnow()
-                        logger.info(f"Session #{session_id} completed successfully")
-                    
-                    self.db.commit()
-                    logger.debug(f"Processed {len(followers)} followers for session #{session_id}")
+            if results:
+                started = time.perf_counter()
+                with self.session_scope() as db:
+                    session_ids = {result.get("session_id") for result in results}
+                    sessions = {
+                        session.id: session for session in
+                        db.query(ScrapingSession).filter(ScrapingSession.id.in_(session_ids))
+                    }
+                    now = datetime.utcnow()
+                    rows = []
+                    # Queue order is checkpoint order, so the last cursor of a session wins
+                    for result in results:
+                        session = sessions.get(result.get("session_id"))
+                        if not session:
+                            continue
+                        followers = result.get("data", {}).get("followers", [])
+                        rows.extend(self._follower_row(follower_data, session, now) for follower_data in followers)
+                        self._apply_result(session, len(followers), result.get("cursor"), now)
+                    if rows:
+                        # Core insert with a parameter list: rendered as multi-row VALUES
+                        db.execute(insert(Follower), rows)
+                seconds = time.perf_counter() - started
+                self._record_write(len(rows), seconds)
+                logger.debug(
+                    f"Stored {len(rows)} followers from {len(results)} results in {seconds:.3f}s "
+                    f"({len(rows) / seconds if seconds else 0:.0f} rows/s)"
+                )
         except Exception as e:
-            logger.error(f"Error processing results: {str(e)}")
+            # One bad result must not cost the whole batch
+            logger.warning(f"Bulk write of {len(results)} results failed, writing them one by one: {str(e)}")
+            self._write_results_orm(results)
+        finally:
+            for result in failures:
+                self._handle_scraping_error(result.get("session_id"), result.get("error"))
 
-    def add_result(self, session_id, followers):
-        """Add scraping results to the queue."""
+    def add_result(self, session_id, followers, cursor=None):
+        """Add scraping results to the queue, with the pagination checkpoint that covers them."""
         self.results_queue.put({
+            "success": True,
             "session_id": session_id,
-            "followers": followers
+            "data": {"followers": followers, "next_cursor": None},
+            "cursor": dict(cursor) if cursor else None
         })
         logger.debug(f"Added {len(followers)} followers to queue for session #{session_id}")
 
     def stop_scraping(self, session_id):
         """Stop a specific scraping session."""
         try:
-            session = self.db.get(ScrapingSession, session_id)  # Using newer Session.get() syntax
-            if session:
-                session.status = "stopped"
-                session.updated_at = datetime.utcnow()
-                self.db.commit()
-                logger.info(f"Stopped scraping session #{session_id}")
-                return True
-            return False
+            # The crawl itself stops before its next request
+            self._cancel_job(session_id)
+            with self.session_scope() as db:
+                session = db.get(ScrapingSession, session_id)  # Using newer Session.get() syntax
+                if session:
+                    session.status = "stopped"
+                    session.updated_at = datetime.utcnow()
+                    logger.info(f"Stopped scraping session #{session_id}")
+                    return True
+                return False
         except Exception as e:
             logger.error(f"Error stopping session #{session_id}: {str(e)}")
             return False
@@ -305,37 +722,50 @@ class ScraperManager:
     def stop_all(self):
         """Stop all running scraping sessions."""
         try:
-            running_sessions = self.db.query(ScrapingSession).filter_by(status="running").all()
-            for session in running_sessions:
-                session.status = "stopped"
-                session.updated_at = datetime.utcnow()
-            self.db.commit()
+            with self.session_scope() as db:
+                running_sessions = db.query(ScrapingSession).filter_by(status="running").all()
+                for session in running_sessions:
+                    session.status = "stopped"
+                    session.updated_at = datetime.utcnow()
+            # Jobs started by other managers (other browser sessions) stop too
+            with _claimed_lock:
+                jobs = list(_active_jobs.values())
+            for job in jobs:
+                job.cancel()
             logger.info(f"Stopped all running sessions ({len(running_sessions)} sessions)")
             return True
         except Exception as e:
             logger.error(f"Error stopping all sessions: {str(e)}")
             return False
 
+    def _cancel_job(self, session_id: int):
+        """Cancel the job of a session, whichever manager in this process started it."""
+        with _claimed_lock:
+            job = _active_jobs.get(session_id)
+        if job:
+            job.cancel()
+
     def get_session_status(self, session_id):
         """Get the current status of a scraping session."""
         try:
-            session = self.db.get(ScrapingSession, session_id)  # Using newer Session.get() syntax
-            if not session:
-                logger.warning(f"Session #{session_id} not found")
-                return None
+            with self.session_scope() as db:
+                session = db.get(ScrapingSession, session_id)  # Using newer Session.get() syntax
+                if not session:
+                    logger.warning(f"Session #{session_id} not found")
+                    return None
 
-            return {
-                "id": session.id,
-                "target_username": session.target_username,
-                "status": session.status,
-                "followers_scraped": session.followers_scraped,
-                "max_followers": session.max_followers,
-                "error_count": session.error_count,
-                "last_error": session.last_error,
-                "created_at": session.created_at.isoformat() if session.created_at else None,
-                "updated_at": session.updated_at.isoformat() if session.updated_at else None,
-                "completed_at": session.completed_at.isoformat() if session.completed_at else None
-            }
+                return {
+                    "id": session.id,
+                    "target_username": session.target_username,
+                    "status": session.status,
+                    "followers_scraped": session.followers_scraped,
+                    "max_followers": session.max_followers,
+                    "error_count": session.error_count,
+                    "last_error": session.last_error,
+                    "created_at": session.created_at.isoformat() if session.created_at else None,
+                    "updated_at": session.updated_at.isoformat() if session.updated_at else None,
+                    "completed_at": session.completed_at.isoformat() if session.completed_at else None
+                }
         except Exception as e:
             logger.error(f"Error getting status for session #{session_id}: {str(e)}")
             return None 
\ No newline at end of file
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileCache:
+    """Persistent TTL cache of hydrated profiles, keyed by pk and by username.
+
+    Targets with overlapping audiences hydrate many of the same followers;
+    serving those from here instead of calling user_info/username_info again
+    saves request budget. Entries live in a local SQLite file so they survive
+    restarts and are shared by every client in the process.
+    """
+
+    def __init__(self, path: str = "profile_cache.db", ttl: float = 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "pk INTEGER PRIMARY KEY, username TEXT NOT NULL, data TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_profiles_username ON profiles (username)")
+        self.conn.commit()
+        logger.info(f"Initialized ProfileCache at {path} with ttl={ttl}s")
+
+    def _lookup(self, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        if not self.ttl or value is None:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT data FROM profiles WHERE {column} = ? AND fetched_at >= ? "
+                "ORDER BY fetched_at DESC LIMIT 1",
+                (value, time.time() - self.ttl)
+            ).fetchone()
+            if row:
+                self.hits += 1
+                return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def get_by_pk(self, pk: int) -> Optional[Dict[str, Any]]:
+        """Return the cached profile for a pk if it is younger than the TTL."""
+        return self._lookup("pk", pk)
+
+    def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Return the cached profile for a username if it is younger than the TTL."""
+        return self._lookup("username", username)
+
+    def put(self, profile: Dict[str, Any]):
+        """Store a hydrated profile. Profiles without a pk are not cached."""
+        if not self.ttl or profile.get("pk") is None:
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO profiles (pk, username, data, fetched_at) VALUES (?, ?, ?, ?)",
+                (profile["pk"], profile.get("username", ""), json.dumps(profile), time.time())
+            )
+            self.conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete entries older than the TTL. Returns the number removed."""
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM profiles WHERE fetched_at < ?", (time.time() - self.ttl,))
+            self.conn.commit()
+            return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters since startup. Every hit is one profile request saved."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "requests_saved": self.hits
+        }
+
+
+_profile_cache = None
+_profile_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> ProfileCache:
+    """Return the process-wide profile cache, configured from the environment."""
+    global _profile_cache
+    with _profile_cache_lock:
+        if _profile_cache is None:
+            _profile_cache = ProfileCache(
+                path=os.getenv('PROFILE_CACHE_PATH', 'profile_cache.db'),
+                ttl=float(os.getenv('PROFILE_CACHE_TTL', str(24 * 3600)))
+            )
+        return _profile_cache
+
+
+def set_profile_cache(profile_cache: ProfileCache):
+    """Replace the process-wide profile cache (benchmarks and tests)."""
+    global _profile_cache
+    with _profile_cache_lock:
+        _profile_cache = profile_cache
@@ -1,76 +1,255 @@
 import logging
 import random
-from typing import Optional, List
+import threading
+import time
+from typing import Any, Dict, List, Optional
 import os
-from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
-class ProxyManager:
+
+class ProxyStats:
+    """Observed health of one proxy."""
+
+    __slots__ = ("latency", "error_rate", "requests", "failures", "evicted_until")
+
     def __init__(self):
-        self.proxies = []
-        self.current_index = 0
-        self.last_rotation = datetime.utcnow()
-        self.rotation_interval = timedelta(minutes=30)  # Rotate proxies every 30 minutes
-        self._load_proxies()
+        self.latency: Optional[float] = None  # Moving average, seconds
+        self.error_rate = 0.0  # Moving average of transport failures
+        self.requests = 0
+        self.failures = 0  # In a row
+        self.evicted_until = 0.0
+
+
+class ProxyManager:
+    """Proxy pool with sticky account binding and health scoring.
+
+    Proxies come from ``HTTP_PROXY``/``HTTPS_PROXY`` and from ``PROXY_FILE``
+    (one URL per line, ``#`` comments). Each account is bound to one proxy
+    and keeps it, so Instagram always sees the same account behind the same
+    IP; new bindings are drawn at random, weighted by the proxy's score
+    (success rate over observed latency) and by how many accounts it already
+    carries. A proxy failing too often is evicted for ``eviction_time``
+    seconds; the accounts on it are rebound, and it comes back on probation.
+    An explicit ``proxies`` list replaces both sources (benchmarks and tests).
+    """
+
+    # Weight of the newest sample in the latency and error-rate averages
+    smoothing = 0.2
+
+    def __init__(
+        self,
+        proxy_file: Optional[str] = None,
+        proxies: Optional[List[str]] = None,
+        max_error_rate: Optional[float] = None,
+        max_failures: int = 5,
+        min_samples: int = 10,
+        eviction_time: Optional[float] = None
+    ):
+        self.proxies: List[str] = []
+        self.stats: Dict[str, ProxyStats] = {}
+        self.bindings: Dict[str, str] = {}  # account -> proxy
+        self.proxy_file = proxy_file or os.getenv('PROXY_FILE')
+        self.max_error_rate = max_error_rate or float(os.getenv('PROXY_MAX_ERROR_RATE', '0.5'))
+        self.max_failures = max_failures
+        self.min_samples = min_samples
+        self.eviction_time = eviction_time or float(os.getenv('PROXY_EVICTION_TIME', '600'))
+        self.lock = threading.RLock()
+        self._load_proxies(proxies)
         logger.info("Initialized ProxyManager")
 
-    def _load_proxies(self):
-        """Load proxies from environment variables or configuration."""
+    def _load_proxies(self, proxies: Optional[List[str]]):
+        """Load proxies from environment variables and the proxy file, or from ``proxies``."""
+        if proxies is not None:
+            for proxy in proxies:
+                self.add_proxy(proxy)
+            return
+
         # Try to get proxy from environment variable
         proxy = os.getenv('HTTP_PROXY') or os.getenv('HTTPS_PROXY')
         if proxy:
-            self.proxies.append(proxy)
+            self.add_proxy(proxy)
             logger.info(f"Loaded proxy from environment: {proxy}")
-        
-        # TODO: Add support for loading proxy list from file or API
-        # For now, we'll use a default proxy if none are configured
+
+        if self.proxy_file:
+            try:
+                with open(self.proxy_file, 'r') as f:
+                    lines = [line.split('#', 1)[0].strip() for line in f]
+                for line in lines:
+                    if line:
+                        self.add_proxy(line)
+                logger.info(f"Loaded {len(self.proxies)} proxies from {self.proxy_file}")
+            except Exception as e:
+                logger.error(f"Error loading proxies from {self.proxy_file}: {str(e)}")
+
         if not self.proxies:
             logger.warning("No proxies configured, will proceed without proxy")
 
-    def get_next_proxy(self) -> Optional[str]:
-        """Get the next proxy in the rotation."""
-        if not self.proxies:
-            return None
+    def _available(self, now: float) -> List[str]:
+        available = [proxy for proxy in self.proxies if self.stats[proxy].evicted_until <= now]
+        if available or not self.proxies:
+            return available
+        # Every proxy is evicted: never fall back to the direct connection, take
+        # the one back soonest
+        return [min(self.proxies, key=lambda proxy: self.stats[proxy].evicted_until)]
 
-        # Check if it's time to rotate
-        now = datetime.utcnow()
-        if now - self.last_rotation >= self.rotation_interval:
-            self.rotate_proxies()
+    def score(self, proxy: str) -> float:
+        """Selection weight: success rate over latency (unmeasured proxies get the pool average)."""
+        with self.lock:
+            stats = self.stats[proxy]
+            latency = stats.latency
+            if latency is None:
+                measured = [s.latency for s in self.stats.values() if s.latency is not None]
+                latency = sum(measured) / len(measured) if measured else 1.0
+            return max(1.0 - stats.error_rate, 0.01) ** 2 / (latency + 0.05)
 
-        # Get next proxy
-        proxy = self.proxies[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.proxies)
-        
+    def _pick(self, candidates: List[str]) -> str:
+        load = {}
+        for proxy in self.bindings.values():
+            load[proxy] = load.get(proxy, 0) + 1
+        weights = [self.score(proxy) / (1 + load.get(proxy, 0)) for proxy in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+    def get_next_proxy(self) -> Optional[str]:
+        """Pick a proxy, weighted by score, without binding it to an account."""
+        with self.lock:
+            candidates = self._available(time.monotonic())
+            if not candidates:
+                return None
+            proxy = self._pick(candidates)
         logger.info(f"Using proxy: {proxy}")
         return proxy
 
+    def proxy_for(self, account: str, current: Optional[str] = None) -> Optional[str]:
+        """The proxy an account is bound to, binding one first if needed.
+
+        ``current`` is the proxy the account's client already uses (e.g. loaded
+        with its saved session); it is kept when it is still in the pool.
+        """
+        with self.lock:
+            now = time.monotonic()
+            proxy = self.bindings.get(account)
+            if proxy is None and current in self.stats:
+                proxy = current
+            if proxy is not None and proxy in self.stats and self.stats[proxy].evicted_until <= now:
+                self.bindings[account] = proxy
+                return proxy
+            candidates = self._available(now)
+            if not candidates:
+                self.bindings.pop(account, None)
+                return None
+            proxy = self._pick(candidates)
+            self.bindings[account] = proxy
+        logger.info(f"Bound {account} to proxy {proxy}")
+        return proxy
+
+    def record(self, proxy: Optional[str], latency: float, failed: bool = False):
+        """Update a proxy's score with one request; evict it when it fails too often."""
+        if proxy is None:
+            return
+        with self.lock:
+            stats = self.stats.get(proxy)
+            if stats is None or stats.evicted_until > time.monotonic():
+                # Unknown, or requests still in flight when it was evicted
+                return
+            alpha = self.smoothing
+            stats.requests += 1
+            stats.latency = latency if stats.latency is None else (1 - alpha) * stats.latency + alpha * latency
+            stats.error_rate = (1 - alpha) * stats.error_rate + alpha * (1.0 if failed else 0.0)
+            stats.failures = stats.failures + 1 if failed else 0
+            if stats.failures >= self.max_failures:
+                self.evict(proxy, f"{stats.failures} failures in a row")
+            elif stats.requests >= self.min_samples and stats.error_rate > self.max_error_rate:
+                self.evict(proxy, f"error rate {stats.error_rate:.0%}")
+
+    def evict(self, proxy: str, reason: str = ""):
+        """Take a proxy out of the pool for ``eviction_time`` seconds and rebind its accounts."""
+        with self.lock:
+            stats = self.stats.get(proxy)
+            if stats is None:
+                return
+            stats.evicted_until = time.monotonic() + self.eviction_time
+            # Back on probation when it returns
+            stats.error_rate = 0.0
+            stats.failures = 0
+            stats.requests = 0
+            accounts = [account for account, bound in self.bindings.items() if bound == proxy]
+            for account in accounts:
+                del self.bindings[account]
+        logger.warning(
+            f"Evicted proxy {proxy} for {self.eviction_time:.0f} seconds"
+            f"{f' ({reason})' if reason else ''}, rebinding {len(accounts)} accounts"
+        )
+
     def rotate_proxies(self):
-        """Rotate the proxy list."""
-        if self.proxies:
+        """Shuffle the proxy list. Bound accounts keep their proxy."""
+        with self.lock:
             random.shuffle(self.proxies)
-            self.current_index = 0
-            self.last_rotation = datetime.utcnow()
             logger.info("Rotated proxy list")
 
     def add_proxy(self, proxy: str):
         """Add a new proxy to the list."""
-        if proxy not in self.proxies:
-            self.proxies.append(proxy)
-            logger.info(f"Added new proxy: {proxy}")
+        with self.lock:
+            if proxy not in self.proxies:
+                self.proxies.append(proxy)
+                self.stats[proxy] = ProxyStats()
+                logger.info(f"Added new proxy: {proxy}")
 
     def remove_proxy(self, proxy: str):
         """Remove a proxy from the list."""
-        if proxy in self.proxies:
-            self.proxies.remove(proxy)
-            logger.info(f"Removed proxy: {proxy}")
+        with self.lock:
+            if proxy in self.proxies:
+                self.proxies.remove(proxy)
+                del self.stats[proxy]
+                for account in [account for account, bound in self.bindings.items() if bound == proxy]:
+                    del self.bindings[account]
+                logger.info(f"Removed proxy: {proxy}")
 
     def get_proxy_count(self) -> int:
         """Get the number of available proxies."""
-        return len(self.proxies)
+        with self.lock:
+            return len([proxy for proxy in self.proxies if self.stats[proxy].evicted_until <= time.monotonic()])
 
     def clear_proxies(self):
         """Clear all proxies from the list."""
-        self.proxies = []
-        self.current_index = 0
-        logger.info("Cleared all proxies") 
\ No newline at end of file
+        with self.lock:
+            self.proxies = []
+            self.stats = {}
+            self.bindings = {}
+            logger.info("Cleared all proxies")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Health and bindings of every proxy, for the dashboard."""
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "proxy": proxy,
+                    "score": round(self.score(proxy), 3),
+                    "latency_ms": round(stats.latency * 1000, 1) if stats.latency is not None else None,
+                    "error_rate": round(stats.error_rate, 3),
+                    "accounts": sum(1 for bound in self.bindings.values() if bound == proxy),
+                    "evicted_for_seconds": round(max(0.0, stats.evicted_until - now))
+                }
+                for proxy, stats in ((proxy, self.stats[proxy]) for proxy in self.proxies)
+            ]
+
+
+_proxy_manager = None
+_proxy_manager_lock = threading.Lock()
+
+
+def get_proxy_manager() -> ProxyManager:
+    """Return the process-wide proxy pool shared by every client."""
+    global _proxy_manager
+    with _proxy_manager_lock:
+        if _proxy_manager is None:
+            _proxy_manager = ProxyManager()
+        return _proxy_manager
+
+
+def set_proxy_manager(proxy_manager: ProxyManager):
+    """Replace the process-wide proxy pool (benchmarks and tests)."""
+    global _proxy_manager
+    with _proxy_manager_lock:
+        _proxy_manager = proxy_manager
@@ -0,0 +1,331 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from database.config import session_scope
+from database.models import AccountUsage
+from .circuit_breaker import SessionUnavailable
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+
+
+class QuotaExceeded(SessionUnavailable):
+    """Raised when a request would take an account over its hourly or daily quota.
+
+    ``retry_after`` is the number of seconds until the account has a request
+    to spend again.
+    """
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class QuotaTracker:
+    """Rolling hourly and daily request counts per scraper account.
+
+    Requests are counted in one-hour buckets. The rolling hour is the current
+    bucket plus the share of the previous one still inside the window (the
+    sliding-window counter approximation); the rolling day is the same over
+    24 buckets. Accounts whose rolling count reaches their quota get no work
+    until the window frees up; ``wait_time`` says when that is, so their jobs
+    can be parked instead of polling. A quota of 0 means no limit.
+
+    With a ``session_factory`` the buckets live in the ``account_usage`` table:
+    changed buckets are written behind every ``flush_interval`` seconds and the
+    last day of them is read back when the tracker is bound, so quotas hold
+    across restarts.
+    """
+
+    def __init__(
+        self,
+        hourly_quota: Optional[int] = None,
+        daily_quota: Optional[int] = None,
+        session_factory: Any = None,
+        flush_interval: Optional[float] = None,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        self.hourly_quota = int(os.getenv('ACCOUNT_HOURLY_QUOTA', '0')) if hourly_quota is None else hourly_quota
+        self.daily_quota = int(os.getenv('ACCOUNT_DAILY_QUOTA', '0')) if daily_quota is None else daily_quota
+        # username -> (hourly, daily) for accounts that differ from the defaults
+        self.overrides: Dict[str, Tuple[int, int]] = {}
+        self.clock = clock
+        # username -> {hour: [requests, challenges]}
+        self.buckets: Dict[str, Dict[datetime, list]] = {}
+        # (username, hour) -> [requests, challenges] not written to the database yet
+        self.pending: Dict[Tuple[str, datetime], list] = {}
+        # Requests counted by this process, for the requests-per-profile ratio
+        self.recorded = 0
+        self.lock = threading.Lock()
+        self.session_factory = None
+        self.flush_interval = flush_interval or float(os.getenv('QUOTA_FLUSH_INTERVAL', '30'))
+        self.stop_event = threading.Event()
+        self.flusher: Optional[threading.Thread] = None
+        if session_factory is not None:
+            self.bind(session_factory)
+
+    def bind(self, session_factory: Any):
+        """Persist to this database from now on, loading the usage already recorded there."""
+        if self.session_factory is not None:
+            return
+        since = _hour(self.clock()) - 24 * HOUR
+        try:
+            with session_scope(session_factory) as db:
+                AccountUsage.__table__.create(bind=db.get_bind(), checkfirst=True)
+                rows = db.query(AccountUsage).filter(AccountUsage.hour >= since).all()
+                loaded = [(row.username, row.hour, row.requests or 0, row.challenges or 0) for row in rows]
+        except Exception as e:
+            logger.error(f"Error loading account usage: {str(e)}")
+            return
+        with self.lock:
+            for username, hour, requests, challenges in loaded:
+                bucket = self.buckets.setdefault(username, {}).setdefault(hour, [0, 0])
+                bucket[0] += requests
+                bucket[1] += challenges
+            self.session_factory = session_factory
+        logger.info(f"Loaded {len(loaded)} hours of account usage")
+
+    def set_quota(self, username: str, hourly: Optional[int] = None, daily: Optional[int] = None):
+        """Give one account its own quotas (None keeps the default)."""
+        with self.lock:
+            self.overrides[username] = (
+                self.hourly_quota if hourly is None else hourly,
+                self.daily_quota if daily is None else daily
+            )
+
+    def quota(self, username: str) -> Tuple[int, int]:
+        return self.overrides.get(username, (self.hourly_quota, self.daily_quota))
+
+    def _add(self, username: str, hour: datetime, requests: int, challenges: int):
+        # Called with the lock held
+        bucket = self.buckets.setdefault(username, {}).setdefault(hour, [0, 0])
+        bucket[0] += requests
+        bucket[1] += challenges
+        self.recorded += requests
+        pending = self.pending.setdefault((username, hour), [0, 0])
+        pending[0] += requests
+        pending[1] += challenges
+        # Buckets older than the daily window are no longer read
+        if len(self.buckets[username]) > 26:
+            cutoff = hour - 25 * HOUR
+            self.buckets[username] = {h: b for h, b in self.buckets[username].items() if h >= cutoff}
+
+    def record(self, username: str, requests: int = 1, challenges: int = 0):
+        """Count requests (and challenges) sent from an account in the current hour."""
+        hour = _hour(self.clock())
+        with self.lock:
+            self._add(username, hour, requests, challenges)
+        if self.session_factory is not None:
+            self._ensure_flusher()
+
+    def reserve(self, username: str):
+        """Count one request about to be sent, or raise QuotaExceeded if it would not fit.
+
+        Checking and counting happen under one lock, so concurrent requests of
+        an account can never spend more than its quota between them.
+        """
+        now = self.clock()
+        with self.lock:
+            if not self._fits(username, now):
+                raise QuotaExceeded(
+                    f"Session {username} reached its request quota",
+                    retry_after=self._wait_time(username, now)
+                )
+            self._add(username, _hour(now), 1, 0)
+        if self.session_factory is not None:
+            self._ensure_flusher()
+
+    def _windows(self, username: str, hour: datetime, hours: int) -> Tuple[float, float]:
+        """(requests in the ``hours`` buckets up to ``hour``, requests in the bucket before them)."""
+        buckets = self.buckets.get(username, {})
+        full = sum(buckets.get(hour - n * HOUR, (0, 0))[0] for n in range(hours))
+        return full, buckets.get(hour - hours * HOUR, (0, 0))[0]
+
+    def _usage(self, username: str, now: datetime) -> Dict[str, float]:
+        hour = _hour(now)
+        # Share of the oldest bucket still inside the window
+        overlap = 1.0 - (now - hour) / HOUR
+        usage = {}
+        for name, hours in (("hour", 1), ("day", 24)):
+            full, oldest = self._windows(username, hour, hours)
+            usage[name] = full + overlap * oldest
+        return usage
+
+    def _fits(self, username: str, now: datetime) -> bool:
+        hourly, daily = self.quota(username)
+        usage = self._usage(username, now)
+        return all(used + 1 <= quota for quota, used in ((hourly, usage["hour"]), (daily, usage["day"])) if quota)
+
+    def _wait_time(self, username: str, now: datetime) -> float:
+        # Within one hour bucket the rolling count only falls, linearly, as the
+        # oldest bucket slides out: solve for the first moment one more request
+        # fits, hour by hour, assuming nothing else is sent meanwhile.
+        hourly, daily = self.quota(username)
+        current = _hour(now)
+        for ahead in range(26):
+            hour = current + ahead * HOUR
+            start = (now - hour) / HOUR if ahead == 0 else 0.0
+            needed = start
+            for quota, hours in ((hourly, 1), (daily, 24)):
+                if not quota:
+                    continue
+                full, oldest = self._windows(username, hour, hours)
+                room = quota - 1 - full
+                if room < 0:
+                    needed = None
+                    break
+                if full + oldest > quota - 1:
+                    needed = max(needed, 1.0 - room / oldest)
+            if needed is not None and needed < 1.0:
+                return max(0.0, ((hour - now) + needed * HOUR).total_seconds())
+        return 25 * 3600.0
+
+    def usage(self, username: str) -> Dict[str, float]:
+        """Rolling requests of the last hour and of the last 24 hours."""
+        now = self.clock()
+        with self.lock:
+            return self._usage(username, now)
+
+    def remaining(self, username: str) -> Optional[float]:
+        """Requests the account may still send right now (None: no quota)."""
+        hourly, daily = self.quota(username)
+        usage = self.usage(username)
+        left = [quota - used for quota, used in ((hourly, usage["hour"]), (daily, usage["day"])) if quota]
+        return max(0.0, min(left)) if left else None
+
+    def has_budget(self, username: str) -> bool:
+        remaining = self.remaining(username)
+        return remaining is None or remaining >= 1
+
+    def wait_time(self, username: str) -> float:
+        """Seconds until the account may send one more request (0 when it may now)."""
+        now = self.clock()
+        with self.lock:
+            return 0.0 if self._fits(username, now) else self._wait_time(username, now)
+
+    def check(self, username: str):
+        """Raise QuotaExceeded when the account has no request left in its windows."""
+        now = self.clock()
+        with self.lock:
+            if not self._fits(username, now):
+                raise QuotaExceeded(
+                    f"Session {username} reached its request quota",
+                    retry_after=self._wait_time(username, now)
+                )
+
+    def capacity(self, usernames: Iterable[str], requests_per_profile: float = 1.0) -> Dict[str, Any]:
+        """Profiles per day these accounts can deliver within their quotas.
+
+        ``profiles_per_day`` is the sustained figure (the smaller of the daily
+        quota and 24 full hours); ``profiles_left_today`` is what the rolling
+        windows still allow. Both are None when an account has no quota at all.
+        """
+        per_day, left = 0.0, 0.0
+        usernames = list(usernames)
+        for username in usernames:
+            hourly, daily = self.quota(username)
+            if not hourly and not daily:
+                per_day = left = None
+                break
+            usage = self.usage(username)
+            limits = [(daily, usage["day"])] if daily else []
+            if hourly:
+                limits.append((hourly * 24, usage["hour"]))
+            per_day += min(quota for quota, _ in limits)
+            left += max(0.0, min(quota - used for quota, used in limits))
+        ratio = max(requests_per_profile, 1e-9)
+        return {
+            "accounts": len(usernames),
+            "requests_per_profile": round(requests_per_profile, 3),
+            "profiles_per_day": None if per_day is None else int(per_day / ratio),
+            "profiles_left_today": None if left is None else int(left / ratio)
+        }
+
+    def flush(self) -> int:
+        """Write the changed buckets to the database. Returns the number of rows touched."""
+        if self.session_factory is None:
+            return 0
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+        try:
+            with session_scope(self.session_factory) as db:
+                for (username, hour), (requests, challenges) in pending.items():
+                    row = db.query(AccountUsage).filter_by(username=username, hour=hour).first()
+                    if row is None:
+                        row = AccountUsage(username=username, hour=hour, requests=0, challenges=0)
+                        db.add(row)
+                    row.requests = (row.requests or 0) + requests
+                    row.challenges = (row.challenges or 0) + challenges
+            return len(pending)
+        except Exception as e:
+            logger.error(f"Error saving account usage: {str(e)}")
+            # Keep the counts for the next flush
+            with self.lock:
+                for key, (requests, challenges) in pending.items():
+                    counts = self.pending.setdefault(key, [0, 0])
+                    counts[0] += requests
+                    counts[1] += challenges
+            return 0
+
+    def _ensure_flusher(self):
+        with self.lock:
+            if self.flusher is None or not self.flusher.is_alive():
+                self.flusher = threading.Thread(target=self._flush_loop, name="quota-flusher", daemon=True)
+                self.flusher.start()
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the background writer and flush what is left."""
+        self.stop_event.set()
+        if self.flusher:
+            self.flusher.join()
+        self.flush()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Rolling usage against the quotas of every account seen, for the dashboard."""
+        with self.lock:
+            usernames = list(self.buckets)
+        snapshot = {}
+        for username in usernames:
+            hourly, daily = self.quota(username)
+            usage = self.usage(username)
+            snapshot[username] = {
+                "requests_last_hour": round(usage["hour"]),
+                "hourly_quota": hourly or None,
+                "requests_last_day": round(usage["day"]),
+                "daily_quota": daily or None
+            }
+        return snapshot
+
+
+_quota_tracker = None
+_quota_tracker_lock = threading.Lock()
+
+
+def get_quota_tracker() -> QuotaTracker:
+    """Return the process-wide quota tracker, configured from the environment."""
+    global _quota_tracker
+    with _quota_tracker_lock:
+        if _quota_tracker is None:
+            _quota_tracker = QuotaTracker()
+        return _quota_tracker
+
+
+def set_quota_tracker(quota_tracker: QuotaTracker):
+    """Replace the process-wide quota tracker (benchmarks and tests)."""
+    global _quota_tracker
+    with _quota_tracker_lock:
+        _quota_tracker = quota_tracker
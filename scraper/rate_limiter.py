@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts with additive-increase/multiplicative-decrease.
+
+    Every successful request nudges the rate up by ``increase`` requests/second;
+    every throttling error multiplies it by ``decrease`` and imposes a cooldown
+    that grows with consecutive throttles. The bucket therefore settles just
+    under the rate Instagram actually tolerates for that account or proxy.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        min_rate: float = 1 / 60,
+        max_rate: float = 2.0,
+        increase: float = 0.01,
+        decrease: float = 0.5,
+        cooldown: float = 60.0,
+        max_cooldown: float = 300.0
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self.successes = 0
+        self.throttles = 0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it.
+
+        Tokens may go negative, so concurrent callers queue up behind each other
+        instead of all waking at the same moment.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait_time = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait_time, self.blocked_until - now)
+
+    def on_success(self):
+        with self.lock:
+            self.successes += 1
+            self.consecutive_throttles = 0
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, cooldown: Optional[float] = None):
+        with self.lock:
+            now = time.monotonic()
+            self.throttles += 1
+            self.consecutive_throttles += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0.0)
+            if cooldown is None:
+                cooldown = min(self.max_cooldown, self.cooldown * self.consecutive_throttles)
+            self.blocked_until = max(self.blocked_until, now + cooldown)
+            return cooldown
+
+
+class RateLimiter:
+    """Shared registry of adaptive token buckets, one per account and one per proxy.
+
+    A request must obtain a token from its account bucket and, when it goes
+    through a proxy, from that proxy's bucket as well.
+    """
+
+    def __init__(
+        self,
+        account_rate: float = 0.5,
+        proxy_rate: float = 2.0,
+        min_rate: float = 1 / 60,
+        max_rate: float = 2.0,
+        cooldown: float = 60.0,
+        max_cooldown: float = 300.0
+    ):
+        self.account_rate = account_rate
+        self.proxy_rate = proxy_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def configure(self, account_rate: Optional[float] = None, proxy_rate: Optional[float] = None):
+        """Change the starting rate of buckets created from now on."""
+        if account_rate is not None:
+            self.account_rate = account_rate
+        if proxy_rate is not None:
+            self.proxy_rate = proxy_rate
+
+    def _bucket(self, kind: str, name: str) -> TokenBucket:
+        key = (kind, name)
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                rate = self.account_rate if kind == "account" else self.proxy_rate
+                bucket = TokenBucket(
+                    rate=max(rate, self.min_rate),
+                    min_rate=self.min_rate,
+                    max_rate=max(self.max_rate, rate),
+                    cooldown=self.cooldown,
+                    max_cooldown=self.max_cooldown
+                )
+                self.buckets[key] = bucket
+            return bucket
+
+    def _buckets_for(self, account: str, proxy: Optional[str]) -> List[TokenBucket]:
+        buckets = [self._bucket("account", account)]
+        if proxy:
+            buckets.append(self._bucket("proxy", proxy))
+        return buckets
+
+    def set_rate(self, account: str, rate: float):
+        """Pin the current rate of an account bucket (AIMD keeps adapting from there)."""
+        bucket = self._bucket("account", account)
+        with bucket.lock:
+            bucket.rate = rate
+            bucket.max_rate = max(bucket.max_rate, rate)
+
+    def reserve(self, account: str, proxy: Optional[str] = None) -> float:
+        """Reserve a request slot and return the seconds to wait (for async callers)."""
+        return max(bucket.reserve() for bucket in self._buckets_for(account, proxy))
+
+    def acquire(self, account: str, proxy: Optional[str] = None) -> float:
+        """Block until a request may be sent for this account/proxy. Returns the time waited."""
+        wait_time = self.reserve(account, proxy)
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    def record_success(self, account: str, proxy: Optional[str] = None):
+        for bucket in self._buckets_for(account, proxy):
+            bucket.on_success()
+
+    def record_throttle(self, account: str, proxy: Optional[str] = None, cooldown: Optional[float] = None) -> float:
+        """Register a rate-limit error; returns the cooldown imposed on the account."""
+        waits = [bucket.on_throttle(cooldown) for bucket in self._buckets_for(account, proxy)]
+        bucket = self._bucket("account", account)
+        logger.warning(
+            f"Rate limited on {account}{f' via {proxy}' if proxy else ''}, "
+            f"rate lowered to {bucket.rate:.3f} req/s, cooling down {waits[0]:.0f} seconds"
+        )
+        return waits[0]
+
+    def snapshot(self) -> List[Dict]:
+        """Current state of every bucket, for the dashboard."""
+        now = time.monotonic()
+        with self.lock:
+            items = list(self.buckets.items())
+        return [
+            {
+                "type": kind,
+                "name": name,
+                "rate_per_minute": round(bucket.rate * 60, 2),
+                "cooldown_seconds": round(max(0.0, bucket.blocked_until - now)),
+                "successes": bucket.successes,
+                "throttles": bucket.throttles
+            }
+            for (kind, name), bucket in items
+        ]
+
+
+_rate_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter shared by every client."""
+    return _rate_limiter
+
+
+def set_rate_limiter(rate_limiter: RateLimiter):
+    """Replace the process-wide rate limiter (benchmarks and tests)."""
+    global _rate_limiter
+    _rate_limiter = rate_limiter
@@ -1,55 +1,254 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable
+import base64
 import time
 import json
 import os
 import logging
 from datetime import datetime, timedelta
 import pickle
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
 from .instagram_client import InstagramClient
+from .circuit_breaker import get_circuit_breakers
+from .quota import get_quota_tracker
+from .proxy_manager import get_proxy_manager
+from .session_registry import SessionRegistry
 
 logger = logging.getLogger(__name__)
 
+SESSION_FORMAT_VERSION = 1
+
+
+def _encode(value: Any) -> Any:
+    """JSON-safe copy of client settings; the cookie jar is bytes."""
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"__bytes__"}:
+            return base64.b64decode(value["__bytes__"])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _env_credentials(username: str) -> Optional[str]:
+    if username == os.getenv('INSTAGRAM_USERNAME'):
+        return os.getenv('INSTAGRAM_PASSWORD')
+    return None
+
+
 class SessionManager:
-    def __init__(self, sessions_dir: str = "Insta Saved Sessions"):
+    """Saved Instagram sessions, with write-behind persistence.
+
+    Each session is stored as a small versioned JSON record: the API client's
+    cookie jar and device settings plus the usage counters, never the password.
+    ``save_session`` and ``mark_dirty`` only flag a session; a background thread
+    writes flagged sessions every ``flush_interval`` seconds, to a temporary
+    file renamed over the old one so a crash never leaves a truncated record.
+    ``close()`` runs a final flush.
+
+    Whether a session is still logged in costs a timeline request, so the
+    answer is cached for ``health_ttl`` seconds. Session selection only reads
+    the cache; a background prober re-checks stale entries, and an entry
+    checked before the session's circuit breaker last tripped (an auth error)
+    counts as stale.
+
+    ``standby_size`` sessions are kept out of rotation on warm standby: their
+    client is built and their login checked (or redone) in the background, so
+    when no session in rotation can take work any more (its circuit opened, its
+    quota ran out) a standby one is promoted at once instead of a job waiting
+    for a fresh login. The pool is refilled in the background after a promotion.
+    """
+
+    # Seconds between standby pool checks when nothing wakes the warmer earlier
+    standby_check_interval = 10.0
+
+    def __init__(
+        self,
+        sessions_dir: str = "Insta Saved Sessions",
+        flush_interval: Optional[float] = None,
+        health_ttl: Optional[float] = None,
+        client_factory: Optional[Callable[[str, Optional[str], Optional[Dict]], Any]] = None,
+        credentials: Optional[Callable[[str], Optional[str]]] = None,
+        standby_size: Optional[int] = None,
+        standby_accounts: Optional[List[str]] = None
+    ):
         self.sessions_dir = Path(sessions_dir)
-        self.sessions: Dict[str, Dict] = {}
+        # Builds the API client of a loaded session (default: instagram_private_api.Client)
+        self.client_factory = client_factory
+        # Passwords are not stored with the sessions; they are only needed to log in again
+        self.credentials = credentials or _env_credentials
+        self.legacy_files = set()
+        # Keyed by username, the stable id the session files are named after
+        self.sessions = SessionRegistry()
+        self.lock = threading.RLock()
+        self.dirty = set()
+        self.flush_interval = flush_interval or float(os.getenv('SESSION_FLUSH_INTERVAL', '30'))
+        self.stop_event = threading.Event()
+        self.flusher: Optional[threading.Thread] = None
+        # username -> (logged in, monotonic time of the check)
+        self.health: Dict[str, tuple] = {}
+        self.health_ttl = health_ttl or float(os.getenv('SESSION_HEALTH_TTL', '600'))
+        self.probe_requested = threading.Event()
+        self.health_prober: Optional[threading.Thread] = None
+        # Loaded sessions still waiting for their first login check
+        self.validating = set()
+        self.validation_progress = threading.Event()
+        self.validation_workers = int(os.getenv('SESSION_VALIDATION_WORKERS', '8'))
+        self.validation_timeout = float(os.getenv('SESSION_VALIDATION_TIMEOUT', '30'))
+        # Leases: concurrent users per account, and the callers queued for one (FIFO)
+        self.max_leases = int(os.getenv('SESSION_MAX_LEASES', '1'))
+        self.leases: Dict[str, int] = {}
+        self.lease_waiters = deque()
+        self.lease_changed = threading.Condition(self.lock)
+        # Warm standby: sessions held out of rotation, and the ones being warmed up
+        self.standby_size = int(os.getenv('SESSION_STANDBY_SIZE', '0')) if standby_size is None else standby_size
+        # Accounts without a saved session the warmer may log in (passwords from `credentials`)
+        self.standby_accounts = standby_accounts if standby_accounts is not None else [
+            username for username in [os.getenv('INSTAGRAM_USERNAME')] if username
+        ]
+        self.standby = set()
+        self.warming = set()
+        self.standby_retry_at: Dict[str, float] = {}
+        self.standby_needed = threading.Event()
+        self.standby_warmer: Optional[threading.Thread] = None
         self.load_sessions()
+        self._ensure_standby_warmer()
         logger.info("Initialized SessionManager")
 
     def load_sessions(self):
-        """Load all saved sessions from disk."""
+        """Load all saved sessions from disk.
+
+        Only the small JSON records are read; each API client is rebuilt from
+        its saved settings when the session is first used. Sessions pickled by
+        older versions are loaded once and rewritten as JSON. Whether the loaded
+        sessions are still logged in is checked concurrently in the background.
+        """
         try:
             if not self.sessions_dir.exists():
                 self.sessions_dir.mkdir(parents=True)
                 return
 
+            loaded = []
+            for file in self.sessions_dir.glob("*.json"):
+                try:
+                    loaded.append(self._load_record(file))
+                except Exception as e:
+                    logger.error(f"Error loading session {file}: {str(e)}")
+
             for file in self.sessions_dir.glob("*.pkl"):
                 try:
-                    username = file.stem
-                    with open(file, 'rb') as f:
-                        session_data = pickle.load(f)
-                        if isinstance(session_data, InstagramClient) and session_data.is_logged_in():
-                            self.sessions[username] = {
-                                "session": session_data,
-                                "last_used": datetime.now(),
-                                "challenges": 0,
-                                "requests": 0
-                            }
-                            logger.info(f"Loaded valid session for {username}")
-                        else:
-                            logger.warning(f"Invalid or expired session for {username}")
+                    loaded.append(self._migrate_pickle(file))
                 except Exception as e:
                     logger.error(f"Error loading session {file}: {str(e)}")
 
+            self._start_validation([username for username in loaded if username])
+
         except Exception as e:
             logger.error(f"Error loading sessions: {str(e)}")
 
+    def _load_record(self, file: Path) -> Optional[str]:
+        with open(file, 'r') as f:
+            record = json.load(f)
+        if record.get("version") != SESSION_FORMAT_VERSION:
+            logger.warning(f"Unsupported session format {record.get('version')} in {file}")
+            return None
+        username = record["username"]
+        session = InstagramClient(
+            username,
+            self.credentials(username),
+            settings=_decode(record.get("settings")),
+            client_factory=self.client_factory,
+            # Kept if the proxy is still in the pool, so the account stays on the same IP
+            proxy=record.get("proxy")
+        )
+        self._register(username, session, challenges=record.get("challenges", 0), requests=record.get("requests", 0))
+        logger.info(f"Loaded session for {username}")
+        return username
+
+    def _migrate_pickle(self, file: Path) -> Optional[str]:
+        username = file.stem
+        if username in self.sessions:
+            # Already migrated; the JSON record wins
+            return None
+        with open(file, 'rb') as f:
+            session_data = pickle.load(f)
+        if not isinstance(session_data, InstagramClient):
+            logger.warning(f"Invalid session file for {username}")
+            return None
+        self._register(username, session_data)
+        with self.lock:
+            self.dirty.add(username)
+        self.legacy_files.add(username)
+        logger.info(f"Loaded pickled session for {username}, it will be rewritten as JSON")
+        return username
+
+    def _start_validation(self, usernames: List[str]):
+        """Check the loaded sessions' logins on a thread pool, off the startup path."""
+        if not usernames:
+            return
+        with self.lock:
+            self.validating.update(usernames)
+        self.validation_progress.clear()
+        threading.Thread(
+            target=self._validate_sessions,
+            args=(usernames,),
+            name="session-validation",
+            daemon=True
+        ).start()
+
+    def _validate_sessions(self, usernames: List[str]):
+        workers = max(1, min(self.validation_workers, len(usernames)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="session-validate") as executor:
+            for future in as_completed([executor.submit(self._validate, username) for username in usernames]):
+                future.result()
+        logger.info(f"Validated {len(usernames)} saved sessions")
+        self.validation_progress.set()
+        self.standby_needed.set()
+
+    def _validate(self, username: str):
+        entry = self.sessions.get(username)
+        try:
+            logged_in = bool(entry) and isinstance(entry.session, InstagramClient) and entry.session.is_logged_in()
+        except Exception as e:
+            logger.error(f"Error validating session for {username}: {str(e)}")
+            logged_in = False
+        self.record_health(username, logged_in)
+        with self.lock:
+            self.validating.discard(username)
+            self.lease_changed.notify_all()
+        if logged_in:
+            # Wake get_best_session callers waiting for a confirmed session
+            self.validation_progress.set()
+        else:
+            logger.warning(f"Invalid or expired session for {username}")
+
+    def is_confirmed(self, username: str) -> bool:
+        """Whether a check (or a fresh login) has shown this session logged in."""
+        entry = self.health.get(username)
+        return bool(entry and entry[0])
+
     def create_session(self, username: str, password: str, proxy: Optional[str] = None) -> InstagramClient:
-        """Create a new Instagram session."""
+        """Create a new Instagram session, logging in through the account's proxy."""
         try:
-            client = InstagramClient(username, password)
+            proxy = get_proxy_manager().proxy_for(username, proxy)
+            client = InstagramClient(username, password, client_factory=self.client_factory, proxy=proxy)
+            client.connect()
             self.save_session(username, client)
+            # A fresh login is worth keeping right away
+            self.flush()
             logger.info(f"Created new session for {username}")
             return client
         except Exception as e:
@@ -57,62 +256,441 @@ class SessionManager:
             raise
 
     def save_session(self, username: str, session_data: InstagramClient):
-        """Save a session to disk."""
+        """Register or update a session; it is written to disk by the next flush."""
         try:
-            file_path = self.sessions_dir / f"{username}.pkl"
-            with open(file_path, 'wb') as f:
-                pickle.dump(session_data, f)
-
-            self.sessions[username] = {
-                "session": session_data,
-                "last_used": datetime.now(),
-                "challenges": 0,
-                "requests": 0
-            }
-            logger.info(f"Saved session for {username}")
+            with self.lock:
+                if username not in self.sessions:
+                    # Sessions are saved right after a login
+                    self.record_health(username, True)
+                    # A new account may fill the standby pool
+                    self.standby_needed.set()
+                # A session saved again keeps its usage counters
+                self._register(username, session_data)
+                self.dirty.add(username)
+            self._ensure_flusher()
+            logger.debug(f"Saved session for {username}")
 
         except Exception as e:
             logger.error(f"Error saving session for {username}: {str(e)}")
 
-    def get_best_session(self) -> Optional[InstagramClient]:
-        """Get the best available session based on usage and challenges."""
-        try:
-            if not self.sessions:
-                return None
+    def _register(self, username: str, session: InstagramClient, **counters):
+        """Add a session to the registry; its client reports challenges and re-logins back here."""
+        session.on_challenge = self._record_challenge
+        session.on_login = self.mark_dirty
+        self.sessions.add(username, session, **counters)
+
+    def _record_challenge(self, session: InstagramClient):
+        # Counted towards retirement, and written with the next flush
+        self.increment_challenges(session)
+        self.mark_dirty(session)
+
+    def mark_dirty(self, session: InstagramClient):
+        """Flag a session whose client state (cookies, tokens) changed for the next flush."""
+        entry = self.sessions.find(session)
+        if entry:
+            with self.lock:
+                self.dirty.add(entry.session_id)
+            self._ensure_flusher()
+
+    def _write_session(self, username: str, record: Dict[str, Any]):
+        """Write a session record next to its file and atomically replace the old one."""
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        file_path = self.sessions_dir / f"{username}.json"
+        tmp_path = self.sessions_dir / f".{username}.json.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+        if username in self.legacy_files:
+            # The pickle held the plaintext password; the JSON record replaces it
+            (self.sessions_dir / f"{username}.pkl").unlink(missing_ok=True)
+            self.legacy_files.discard(username)
+
+    def _record(self, entry) -> Dict[str, Any]:
+        """What is persisted of a session: cookie jar, device settings and counters."""
+        return {
+            "version": SESSION_FORMAT_VERSION,
+            "username": entry.session_id,
+            "settings": _encode(entry.session.get_settings()),
+            "challenges": entry.challenges,
+            "requests": entry.requests,
+            "proxy": getattr(entry.session, "proxy", None),
+            "saved_at": datetime.now().isoformat()
+        }
 
-            # Sort sessions by challenges and last used time
-            valid_sessions = [
-                (username, data) for username, data in self.sessions.items()
-                if self.is_session_valid(username)
+    def flush(self) -> int:
+        """Write every dirty session to disk. Returns the number written."""
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            pending = [self.sessions.get(username) for username in dirty if username in self.sessions]
+        written = 0
+        for entry in pending:
+            username = entry.session_id
+            try:
+                self._write_session(username, self._record(entry))
+                written += 1
+            except Exception as e:
+                logger.error(f"Error saving session for {username}: {str(e)}")
+                with self.lock:
+                    self.dirty.add(username)
+        if written:
+            logger.info(f"Flushed {written} sessions to disk")
+        return written
+
+    def _ensure_flusher(self):
+        with self.lock:
+            if self.stop_event.is_set() or (self.flusher and self.flusher.is_alive()):
+                return
+            self.flusher = threading.Thread(target=self._flush_loop, name="session-flusher", daemon=True)
+            self.flusher.start()
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def record_health(self, username: str, logged_in: bool):
+        with self.lock:
+            self.health[username] = (logged_in, time.monotonic())
+
+    def _is_stale(self, username: str, now: float) -> bool:
+        entry = self.health.get(username)
+        if entry is None or now - entry[1] > self.health_ttl:
+            return True
+        # An auth error since the check invalidates it
+        return get_circuit_breakers().get(username).opened_at > entry[1]
+
+    def is_logged_in(self, username: str) -> bool:
+        """Cached login state of a session; never makes a request.
+
+        A stale entry keeps its last answer until the prober refreshes it. A
+        session never checked yet is trusted; get_best_session still prefers
+        the confirmed ones while startup validation runs.
+        """
+        entry = self.health.get(username)
+        if self._is_stale(username, time.monotonic()):
+            self._ensure_health_prober()
+            self.probe_requested.set()
+        return entry[0] if entry else True
+
+    def probe_health(self) -> int:
+        """Re-check every session whose cached login state is stale. Returns the number checked."""
+        now = time.monotonic()
+        with self.lock:
+            stale = [
+                (entry.session_id, entry.session) for entry in self.sessions.values()
+                if self._is_stale(entry.session_id, now)
+                and entry.session_id not in self.validating
+                # Sessions behind an open circuit are probed by the circuit breaker
+                and get_circuit_breakers().is_available(entry.session_id)
             ]
+        for username, session in stale:
+            logged_in = isinstance(session, InstagramClient) and session.is_logged_in()
+            self.record_health(username, logged_in)
+            if not logged_in:
+                logger.warning(f"Session for {username} is no longer logged in")
+        return len(stale)
 
-            if not valid_sessions:
-                return None
+    def _ensure_health_prober(self):
+        with self.lock:
+            if self.stop_event.is_set() or (self.health_prober and self.health_prober.is_alive()):
+                return
+            self.health_prober = threading.Thread(target=self._health_loop, name="session-health", daemon=True)
+            self.health_prober.start()
 
-            # Sort by challenges (ascending) and last used time (oldest first)
-            valid_sessions.sort(
-                key=lambda x: (x[1]["challenges"], x[1]["last_used"])
+    def _health_loop(self):
+        while not self.stop_event.is_set():
+            self.probe_requested.wait(min(self.health_ttl, 60))
+            self.probe_requested.clear()
+            if self.stop_event.is_set():
+                break
+            try:
+                self.probe_health()
+            except Exception as e:
+                logger.error(f"Error probing session health: {str(e)}")
+
+    def close(self):
+        """Stop the background threads and write what is still dirty."""
+        self.stop_event.set()
+        self.probe_requested.set()
+        self.standby_needed.set()
+        if self.flusher:
+            self.flusher.join()
+        if self.health_prober:
+            self.health_prober.join()
+        if self.standby_warmer:
+            self.standby_warmer.join()
+        self.flush()
+
+    def in_rotation(self, username: str) -> bool:
+        """Whether a session may be handed out (it is not on standby or being warmed)."""
+        return username not in self.standby and username not in self.warming
+
+    def _promote_standby(self, accept: Callable[[Any], bool]) -> Optional[Any]:
+        """Move the best standby session ``accept`` takes into rotation."""
+        with self.lock:
+            entry = self.sessions.best(lambda entry: entry.session_id in self.standby and accept(entry))
+            if entry:
+                self.standby.discard(entry.session_id)
+                logger.info(f"Promoted standby session {entry.session_id}")
+                # Refill the pool in the background
+                self.standby_needed.set()
+            return entry
+
+    def replenish_standby(self) -> int:
+        """Warm sessions up until ``standby_size`` are on standby. Returns the number added."""
+        with self.lock:
+            # Standby sessions that expired or were logged out since they were warmed
+            for username in [username for username in self.standby if not self.is_session_valid(username)]:
+                self.standby.discard(username)
+                logger.warning(f"Standby session {username} is no longer usable")
+        added = 0
+        while len(self.standby) < self.standby_size and not self.stop_event.is_set():
+            username = self._standby_candidate()
+            if username is None:
+                break
+            if self._warm(username):
+                added += 1
+        return added
+
+    def _standby_candidate(self) -> Optional[str]:
+        """Reserve an idle saved session, or an account with credentials but no session, to warm."""
+        now = time.monotonic()
+        with self.lock:
+            def idle(entry):
+                username = entry.session_id
+                return (
+                    self.in_rotation(username)
+                    and username not in self.leases
+                    and username not in self.validating
+                    and now >= self.standby_retry_at.get(username, 0.0)
+                    and self.is_session_valid(username)
+                )
+
+            entry = self.sessions.best(idle)
+            username = entry.session_id if entry else next(
+                (
+                    username for username in self.standby_accounts
+                    if username not in self.sessions and username not in self.warming
+                    and now >= self.standby_retry_at.get(username, 0.0)
+                ),
+                None
             )
+            if username:
+                self.warming.add(username)
+            return username
+
+    def _warm(self, username: str) -> bool:
+        """Build a session's client and make sure it is logged in, then put it on standby."""
+        try:
+            entry = self.sessions.get(username)
+            if entry is None:
+                password = self.credentials(username)
+                if not password:
+                    raise ValueError("no password available")
+                self.create_session(username, password)
+            else:
+                session = entry.session
+                session.connect()
+                if not session.is_logged_in():
+                    session._login()
+                    if not session.is_logged_in():
+                        raise RuntimeError("still not logged in after login")
+                    self.mark_dirty(session)
+            self.record_health(username, True)
+            # Warming counts as use: idle sessions expire after 24 hours
+            self.sessions.update(username, touch=True)
+            with self.lock:
+                self.warming.discard(username)
+                self.standby.add(username)
+                self.lease_changed.notify_all()
+            logger.info(f"Session for {username} is warm on standby")
+            return True
+        except Exception as e:
+            logger.error(f"Error warming standby session for {username}: {str(e)}")
+            with self.lock:
+                self.warming.discard(username)
+                self.standby_retry_at[username] = time.monotonic() + self.health_ttl
+                if username in self.sessions:
+                    self.record_health(username, False)
+            return False
+
+    def _ensure_standby_warmer(self):
+        with self.lock:
+            if (
+                not self.standby_size or self.stop_event.is_set()
+                or (self.standby_warmer and self.standby_warmer.is_alive())
+            ):
+                return
+            self.standby_warmer = threading.Thread(target=self._standby_loop, name="session-standby", daemon=True)
+            self.standby_warmer.start()
 
-            # Get the best session
-            username, data = valid_sessions[0]
-            data["last_used"] = datetime.now()
-            data["requests"] += 1
-            logger.info(f"Using session for {username}")
-            return data["session"]
+    def _standby_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.replenish_standby()
+            except Exception as e:
+                logger.error(f"Error replenishing standby sessions: {str(e)}")
+            self.standby_needed.wait(self.standby_check_interval)
+            self.standby_needed.clear()
+
+    def get_best_session(self) -> Optional[InstagramClient]:
+        """Get the best available session based on usage and challenges.
+
+        The session is not leased: other callers may be using it. Use
+        ``acquire``/``lease`` for exclusive use.
+        """
+        try:
+            # Fewest challenges first, then least recently used, straight off the heap;
+            # sessions confirmed logged in go before the ones still being validated
+            def confirmed(entry):
+                return self.is_confirmed(entry.session_id) and self._usable(entry)
+
+            entry = self.sessions.best(confirmed)
+            if not entry and self.validating:
+                # Startup validation is still running: take the first session it confirms
+                self.validation_progress.wait(self.validation_timeout)
+                entry = self.sessions.best(confirmed)
+            if not entry:
+                entry = self.sessions.best(self._usable)
+            if not entry:
+                # Nothing in rotation can work: swap a warm standby session in
+                entry = self._promote_standby(lambda entry: self.is_session_valid(entry.session_id))
+            if not entry:
+                return None
+
+            self.sessions.update(entry.session_id, requests=1, touch=True)
+            logger.info(f"Using session for {entry.session_id}")
+            return entry.session
 
         except Exception as e:
             logger.error(f"Error getting best session: {str(e)}")
             return None
 
+    def _usable(self, entry) -> bool:
+        return self.in_rotation(entry.session_id) and self.is_session_valid(entry.session_id)
+
+    def _has_slot(self, entry) -> bool:
+        return self.leases.get(entry.session_id, 0) < self.max_leases and self.is_session_valid(entry.session_id)
+
+    def _leasable(self, entry) -> bool:
+        return self.in_rotation(entry.session_id) and self._has_slot(entry)
+
+    def acquire(
+        self,
+        timeout: Optional[float] = None,
+        interrupt: Optional[threading.Event] = None,
+        recheck: Optional[Callable[[], None]] = None
+    ) -> Optional[InstagramClient]:
+        """Lease the best account with a free slot, waiting up to ``timeout`` seconds.
+
+        Waiters are served in arrival order: only the oldest one may take the
+        next free account. Returns None on timeout, or as soon as ``interrupt``
+        is set (see ``wake_waiters``). ``recheck`` runs on every wake-up (at
+        least once a second) and may raise to end the wait, giving up the
+        caller's place in the queue. Every lease must be returned with
+        ``release``.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+        with self.lease_changed:
+            self.lease_waiters.append(ticket)
+            try:
+                while True:
+                    if interrupt is not None and interrupt.is_set():
+                        return None
+                    if recheck:
+                        recheck()
+                    if self.lease_waiters[0] is ticket:
+                        entry = self.sessions.best(lambda entry: self.is_confirmed(entry.session_id) and self._leasable(entry))
+                        if not entry and not self.validating:
+                            entry = self.sessions.best(self._leasable)
+                        if not entry:
+                            # Nothing in rotation is free or healthy: swap a warm standby session in
+                            entry = self._promote_standby(self._has_slot)
+                        if entry:
+                            self.leases[entry.session_id] = self.leases.get(entry.session_id, 0) + 1
+                            self.sessions.update(entry.session_id, requests=1, touch=True)
+                            logger.info(f"Leased session for {entry.session_id}")
+                            return entry.session
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return None
+                    # Releases and validations notify; the cap also catches circuits closing
+                    self.lease_changed.wait(1.0 if remaining is None else min(remaining, 1.0))
+            finally:
+                self.lease_waiters.remove(ticket)
+                self.lease_changed.notify_all()
+
+    def wake_waiters(self):
+        """Wake every ``acquire`` call so it notices its interrupt event."""
+        with self.lease_changed:
+            self.lease_changed.notify_all()
+
+    def quota_wait(self) -> float:
+        """Seconds until an account that is otherwise usable has quota again (0: one has now).
+
+        Jobs are parked this long when every account has spent its quota, instead
+        of waiting for a lease that cannot come.
+        """
+        quota_tracker = get_quota_tracker()
+        circuit_breakers = get_circuit_breakers()
+        waits = [
+            quota_tracker.wait_time(entry.session_id) for entry in self.sessions.values()
+            if entry.challenges < 3 and circuit_breakers.is_available(entry.session_id)
+        ]
+        return min(waits) if waits else 0.0
+
+    def try_acquire(self, session: InstagramClient) -> bool:
+        """Lease this particular account if it has a free slot and nobody is queued."""
+        with self.lease_changed:
+            entry = self.sessions.find(session)
+            if self.lease_waiters or not entry or not self._leasable(entry):
+                return False
+            self.leases[entry.session_id] = self.leases.get(entry.session_id, 0) + 1
+            return True
+
+    def release(self, session: InstagramClient):
+        """Return a lease taken with ``acquire`` or ``try_acquire``."""
+        with self.lease_changed:
+            entry = self.sessions.find(session)
+            if not entry or not self.leases.get(entry.session_id):
+                logger.warning(f"Released session {getattr(session, 'username', None)} without a lease")
+                return
+            self.leases[entry.session_id] -= 1
+            if not self.leases[entry.session_id]:
+                del self.leases[entry.session_id]
+            self.lease_changed.notify_all()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        """``with session_manager.lease() as session:`` (None when the wait timed out)."""
+        session = self.acquire(timeout)
+        try:
+            yield session
+        finally:
+            if session is not None:
+                self.release(session)
+
+    def get_valid_sessions(self) -> List[InstagramClient]:
+        """Get every valid session, best first, to spread one target over several accounts."""
+        try:
+            valid_sessions = [entry for entry in self.sessions.ordered() if self._usable(entry)]
+            # Stable sort: confirmed sessions first, each group still best first
+            valid_sessions.sort(key=lambda entry: not self.is_confirmed(entry.session_id))
+            return [entry.session for entry in valid_sessions]
+
+        except Exception as e:
+            logger.error(f"Error getting valid sessions: {str(e)}")
+            return []
+
     def increment_challenges(self, session: InstagramClient):
         """Increment the challenge count for a session."""
         try:
-            for username, data in self.sessions.items():
-                if data["session"] == session:
-                    data["challenges"] += 1
-                    logger.info(f"Incremented challenges for {username} to {data['challenges']}")
-                    break
+            entry = self.sessions.find(session)
+            if entry:
+                self.sessions.update(entry.session_id, challenges=1)
+                logger.info(f"Incremented challenges for {entry.session_id} to {entry.challenges}")
 
         except Exception as e:
             logger.error(f"Error incrementing challenges: {str(e)}")
@@ -120,34 +698,42 @@ class SessionManager:
     def increment_requests(self, session: InstagramClient):
         """Increment the request count for a session."""
         try:
-            for username, data in self.sessions.items():
-                if data["session"] == session:
-                    data["requests"] += 1
-                    data["last_used"] = datetime.now()
-                    break
+            entry = self.sessions.find(session)
+            if entry:
+                self.sessions.update(entry.session_id, requests=1, touch=True)
         except Exception as e:
             logger.error(f"Error incrementing requests: {str(e)}")
 
     def is_session_valid(self, username: str) -> bool:
         """Check if a session is valid based on challenges and age."""
         try:
-            data = self.sessions.get(username)
-            if not data:
+            entry = self.sessions.get(username)
+            if not entry:
                 return False
 
             # Check if session is too old (24 hours)
-            session_age = datetime.now() - data["last_used"]
+            session_age = datetime.now() - entry.last_used
             if session_age > timedelta(hours=24):
                 logger.warning(f"Session for {username} is too old")
                 return False
 
             # Check if too many challenges
-            if data["challenges"] >= 3:
+            if entry.challenges >= 3:
                 logger.warning(f"Session for {username} has too many challenges")
                 return False
 
-            # Verify session is still logged in
-            if not isinstance(data["session"], InstagramClient) or not data["session"].is_logged_in():
+            # Sessions recovering from a challenge get no work until a probe closes their circuit
+            if not get_circuit_breakers().is_available(username):
+                logger.info(f"Session for {username} is recovering, skipping it")
+                return False
+
+            # Sessions that used up their hourly or daily quota wait for the window to move on
+            if not get_quota_tracker().has_budget(username):
+                logger.info(f"Session for {username} reached its request quota, skipping it")
+                return False
+
+            # Verify session is still logged in (cached, refreshed in the background)
+            if not isinstance(entry.session, InstagramClient) or not self.is_logged_in(username):
                 logger.warning(f"Session for {username} is no longer logged in")
                 return False
 
@@ -160,17 +746,40 @@ class SessionManager:
     def clear_challenges(self, username: str):
         """Reset the challenge count for a session."""
         try:
-            if username in self.sessions:
-                self.sessions[username]["challenges"] = 0
+            if self.sessions.update(username, reset_challenges=True):
                 logger.info(f"Cleared challenges for {username}")
         except Exception as e:
             logger.error(f"Error clearing challenges: {str(e)}")
 
     def get_session_stats(self) -> Dict:
         """Get statistics about all sessions."""
+        entries = self.sessions.values()
         return {
-            "total_sessions": len(self.sessions),
-            "valid_sessions": sum(1 for username in self.sessions if self.is_session_valid(username)),
-            "total_challenges": sum(data["challenges"] for data in self.sessions.values()),
-            "total_requests": sum(data["requests"] for data in self.sessions.values())
-        } 
\ No newline at end of file
+            "total_sessions": len(entries),
+            "valid_sessions": sum(1 for entry in entries if self.is_session_valid(entry.session_id)),
+            "total_challenges": sum(entry.challenges for entry in entries),
+            "total_requests": sum(entry.requests for entry in entries),
+            "leased_sessions": len(self.leases),
+            "standby_sessions": len(self.standby),
+            "lease_waiters": len(self.lease_waiters)
+        } 
+
+
+_session_manager: Optional[SessionManager] = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager() -> SessionManager:
+    """Return the process-wide SessionManager, loading the saved sessions on first use."""
+    global _session_manager
+    with _session_manager_lock:
+        if _session_manager is None:
+            _session_manager = SessionManager()
+        return _session_manager
+
+
+def set_session_manager(session_manager: Optional[SessionManager]):
+    """Replace the process-wide SessionManager (benchmarks and tests)."""
+    global _session_manager
+    with _session_manager_lock:
+        _session_manager = session_manager
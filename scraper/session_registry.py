@@ -0,0 +1,131 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class SessionEntry:
+    """Usage bookkeeping of one saved session."""
+
+    __slots__ = ("session_id", "session", "challenges", "requests", "last_used", "version")
+
+    def __init__(self, session_id: str, session: Any):
+        self.session_id = session_id
+        self.session = session
+        self.challenges = 0
+        self.requests = 0
+        self.last_used = datetime.now()
+        self.version = 0
+
+    def priority(self):
+        # Fewest challenges first, then the session left alone the longest
+        return (self.challenges, self.last_used)
+
+
+class SessionRegistry:
+    """Sessions keyed by a stable id (the account username) with a priority heap.
+
+    The heap holds ``(challenges, last_used, tiebreak, version, session_id)``
+    items. An update bumps the entry's version and pushes a fresh item instead
+    of re-sorting; items whose version is behind are dropped when they surface.
+    Lookups and updates are O(1) plus one O(log n) push; picking the best
+    session copies the heap and pops only past stale or rejected items.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, SessionEntry] = {}
+        self.heap: List[tuple] = []
+        self.tiebreak = itertools.count()
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.entries))
+
+    def get(self, session_id: str) -> Optional[SessionEntry]:
+        return self.entries.get(session_id)
+
+    def values(self) -> List[SessionEntry]:
+        with self.lock:
+            return list(self.entries.values())
+
+    def find(self, session: Any) -> Optional[SessionEntry]:
+        """Entry holding this client object, looked up by its username."""
+        entry = self.entries.get(getattr(session, "username", None))
+        if entry and entry.session is session:
+            return entry
+        return None
+
+    def _push(self, entry: SessionEntry):
+        entry.version += 1
+        heapq.heappush(self.heap, entry.priority() + (next(self.tiebreak), entry.version, entry.session_id))
+        # Updates leave superseded items behind; rebuild before they dominate the heap
+        if len(self.heap) > 4 * len(self.entries) + 64:
+            self.heap = [
+                entry.priority() + (next(self.tiebreak), entry.version, entry.session_id)
+                for entry in self.entries.values()
+            ]
+            heapq.heapify(self.heap)
+
+    def add(self, session_id: str, session: Any, challenges: int = 0, requests: int = 0) -> SessionEntry:
+        """Register a session, or swap the client of a known one keeping its counters.
+
+        ``challenges`` and ``requests`` seed a new entry (counters loaded from disk).
+        """
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry:
+                entry.session = session
+                entry.last_used = datetime.now()
+            else:
+                entry = SessionEntry(session_id, session)
+                entry.challenges = challenges
+                entry.requests = requests
+                self.entries[session_id] = entry
+            self._push(entry)
+            return entry
+
+    def update(self, session_id: str, challenges: int = 0, requests: int = 0, touch: bool = False,
+               reset_challenges: bool = False) -> Optional[SessionEntry]:
+        """Apply counter changes to a session and reposition it in the heap."""
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if not entry:
+                return None
+            entry.challenges = 0 if reset_challenges else entry.challenges + challenges
+            entry.requests += requests
+            if touch:
+                entry.last_used = datetime.now()
+            self._push(entry)
+            return entry
+
+    def best(self, accept: Callable[[SessionEntry], bool]) -> Optional[SessionEntry]:
+        """Highest-priority session ``accept`` takes, or None.
+
+        ``accept`` runs on a snapshot taken under the lock, after releasing it:
+        callers hold their own locks around this call and ``accept`` may take
+        them too, so running it under the registry lock could deadlock.
+        """
+        with self.lock:
+            heap = list(self.heap)
+            entries = dict(self.entries)
+            versions = {session_id: entry.version for session_id, entry in entries.items()}
+        while heap:
+            item = heapq.heappop(heap)
+            entry = entries.get(item[-1])
+            if entry is None or versions[item[-1]] != item[-2]:
+                continue  # Superseded by a later update
+            if accept(entry):
+                return entry
+        return None
+
+    def ordered(self) -> List[SessionEntry]:
+        """Every session, best first."""
+        with self.lock:
+            return sorted(self.entries.values(), key=SessionEntry.priority)
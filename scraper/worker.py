@@ -1,15 +1,284 @@
+import heapq
+import itertools
 import threading
-import queue
 import time
-from typing import List, Dict, Any
+import queue
+from typing import List, Dict, Any, Optional, Callable
 from database.models import InstagramAccount, Follower, ScrapingSession
 from sqlalchemy.orm import Session
 from .session_manager import SessionManager
+from .circuit_breaker import SessionUnavailable, get_circuit_breakers
+from .quota import QuotaExceeded, get_quota_tracker
+from .filters import FollowerFilter
+from .hydration import SplitHydrator
 import logging
 
 logger = logging.getLogger(__name__)
 
+class ScrapeJob:
+    """Pagination state shared by the page tasks of one scraping session.
+
+    A worker that fetched page ``seq`` chains page ``seq + 1`` back into the
+    task queue before hydrating its own users, so up to ``max_in_flight`` pages
+    of one job are worked on at once and their results can complete out of
+    order. The checkpoint sent with each result is the first page whose result
+    is not out yet, so resuming from it never skips an unfinished page.
+
+    Workers check the job between requests: once it is cancelled or its
+    ``max_followers`` budget is claimed, no further page is listed and no
+    further follower is hydrated.
+    """
+
+    def __init__(
+        self,
+        session_id: int,
+        target_username: str,
+        cursor: Dict[str, Any],
+        session: Any = None,
+        listing_filter: Optional[FollowerFilter] = None,
+        known_usernames: Optional[set] = None,
+        hydrator: Optional[SplitHydrator] = None,
+        max_followers: Optional[int] = None,
+        max_in_flight: int = 1,
+        on_finish: Optional[Callable[["ScrapeJob"], None]] = None,
+        leased: bool = False,
+        lease_timeout: Optional[float] = None
+    ):
+        self.session_id = session_id
+        self.target_username = target_username
+        self.user_id = cursor.get("user_id")
+        self.rank_token = cursor.get("rank_token")
+        self.session = session
+        self.listing_filter = listing_filter
+        self.known_usernames = known_usernames if known_usernames is not None else set()
+        self.hydrator = hydrator
+        self.max_followers = max_followers
+        self.max_in_flight = max(1, max_in_flight)
+        self.on_finish = on_finish
+        # The pager is leased from the SessionManager for the job's lifetime
+        self.leased = leased
+        self.lease_timeout = lease_timeout
+        self.pager_lock = threading.RLock()
+        self.page_ids: Dict[int, Optional[str]] = {0: cursor.get("max_id")}  # seq -> max_id of that page
+        self.done = set()
+        self.frontier = 0  # First page whose result is not out yet
+        self.last_seq: Optional[int] = None  # Final page, once the listing says so
+        self.in_flight = 1  # The first page task
+        self.deferred: Optional[Dict[str, Any]] = None
+        self.followers_found = 0
+        self.claimed: Dict[str, int] = {}  # username -> page whose hydration counts against the budget
+        self.cancelled = threading.Event()
+        self.stopped = False
+        self.finished = False
+        self.lock = threading.Lock()
+        # Results are put on the queue outside the lock, in the order of these tickets
+        self.tickets = itertools.count()
+        self.published = 0
+        self.publish_turn = threading.Condition()
+
+    def task(self, seq: int) -> Dict[str, Any]:
+        return {"job": self, "session_id": self.session_id, "target_username": self.target_username, "seq": seq}
+
+    def cursor(self, seq: int) -> Dict[str, Any]:
+        return {"user_id": self.user_id, "rank_token": self.rank_token, "max_id": self.page_ids.get(seq)}
+
+    def pager(self, session_manager: SessionManager, interrupt: Optional[threading.Event] = None) -> Any:
+        """Session walking the cursor; replaced when its circuit opens or its quota runs out.
+
+        Raises QuotaExceeded, with the time until an account has quota again,
+        when every account has spent its quota, and SessionUnavailable when no
+        lease came free within ``lease_timeout``. ``interrupt`` ends the wait
+        for a lease early.
+        """
+        with self.pager_lock:
+            session = self.session
+            if (
+                session is None
+                or not get_circuit_breakers().is_available(session.username)
+                or not get_quota_tracker().has_budget(session.username)
+            ):
+                if self.leased:
+                    # Hand the tripped account back before waiting for another one
+                    self.release_session(session_manager)
+                    session = self._acquire(session_manager, interrupt)
+                else:
+                    self._check_quota(session_manager)
+                    session = session_manager.get_best_session()
+                if session is None:
+                    if self.leased:
+                        # Every account is busy with other jobs: the page waits its turn again
+                        raise SessionUnavailable(f"No account free for {self.target_username} yet")
+                    raise RuntimeError(f"No valid session available for {self.target_username}")
+                self.session = session
+            return session
+
+    @staticmethod
+    def _check_quota(session_manager: SessionManager):
+        quota_wait = session_manager.quota_wait()
+        if quota_wait > 0:
+            raise QuotaExceeded("Every account reached its request quota", retry_after=quota_wait)
+
+    def _acquire(self, session_manager: SessionManager, interrupt: Optional[threading.Event]) -> Any:
+        # One place in the lease queue for the whole wait; the accounts still
+        # holding quota may spend it meanwhile, and then the job is parked
+        # rather than left waiting here
+        return session_manager.acquire(
+            timeout=self.lease_timeout,
+            interrupt=interrupt,
+            recheck=lambda: self._check_quota(session_manager)
+        )
+
+    def release_session(self, session_manager: SessionManager):
+        """Return the pager's lease, if the job holds one."""
+        with self.pager_lock:
+            if self.leased and self.session is not None:
+                session_manager.release(self.session)
+                self.session = None
+
+    def cancel(self):
+        """Stop the job: pages in flight end after their current request."""
+        self.cancelled.set()
+        with self.lock:
+            self.stopped = True
+            self.deferred = None
+
+    def is_stopped(self) -> bool:
+        return self.stopped or self.cancelled.is_set()
+
+    def claim(self, seq: int, username: str) -> bool:
+        """Count a hydrated follower of page ``seq`` against the budget.
+
+        Returns False once the job is stopped or the budget is used up, and for
+        a follower already claimed by another page.
+        """
+        with self.lock:
+            owner = self.claimed.get(username)
+            if owner is not None:
+                return owner == seq  # Same page retried after an error
+            if self.is_stopped():
+                return False
+            self.claimed[username] = seq
+            if self.max_followers and len(self.claimed) >= self.max_followers:
+                # Budget used up: stop listing and hydrating the other pages
+                self.stopped = True
+                self.deferred = None
+            return True
+
+    def skip_page(self, seq: int):
+        """Drop a queued page of a stopped job without fetching it."""
+        with self.lock:
+            self.in_flight -= 1
+
+    def page_fetched(self, seq: int, next_max_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Record the listing of page ``seq``; returns the next page task to enqueue, if any."""
+        with self.lock:
+            if next_max_id is None:
+                self.last_seq = seq
+                return None
+            if seq + 1 in self.page_ids:
+                # Page read again after a session switch: it was chained already
+                return None
+            self.page_ids[seq + 1] = next_max_id
+            if self.is_stopped():
+                return None
+            if self.in_flight >= self.max_in_flight:
+                self.deferred = self.task(seq + 1)
+                return None
+            self.in_flight += 1
+            return self.task(seq + 1)
+
+    def complete_page(
+        self,
+        seq: int,
+        followers: List[Dict[str, Any]],
+        result_queue: queue.Queue,
+        batch_size: int
+    ) -> Optional[Dict[str, Any]]:
+        """Publish the followers of a page with the checkpoint that covers them.
+
+        Returns a deferred page task that may now be enqueued.
+        """
+        with self.lock:
+            # Overlapping pages worked on concurrently may list the same follower
+            followers = [f for f in followers if f["username"] not in self.known_usernames]
+            self.known_usernames.update(f["username"] for f in followers)
+            self.followers_found += len(followers)
+            self.done.add(seq)
+            self.in_flight -= 1
+            while self.frontier in self.done:
+                self.frontier += 1
+            exhausted = self.last_seq is not None and self.frontier > self.last_seq
+            if self.max_followers and self.followers_found >= self.max_followers:
+                self.stopped = True
+
+            checkpoint = dict(self.cursor(self.frontier), exhausted=exhausted)
+            next_cursor = self.cursor(seq + 1) if seq + 1 in self.page_ids else None
+            batches = [followers[i:i + batch_size] for i in range(0, len(followers), batch_size)] or [[]]
+            results = []
+            for index, batch in enumerate(batches):
+                last = index == len(batches) - 1
+                results.append({
+                    "success": True,
+                    "session_id": self.session_id,
+                    "data": {"followers": batch, "next_cursor": next_cursor if last else None},
+                    "next_cursor": next_cursor if last else None,
+                    "cursor": checkpoint if last else None
+                })
+            # Taken under the lock so checkpoints reach the queue in frontier order
+            ticket = next(self.tickets)
+
+            released = None
+            if self.deferred and not self.stopped:
+                released, self.deferred = self.deferred, None
+                self.in_flight += 1
+
+        # The queue is bounded: a slow writer must not block claims and cancels
+        self._publish(ticket, results, result_queue)
+        return released
+
+    def fail_page(self, seq: int, error: str, result_queue: queue.Queue):
+        """Stop chaining pages after a page failed for good."""
+        with self.lock:
+            self.in_flight -= 1
+            self.stopped = True
+            self.deferred = None
+            ticket = next(self.tickets)
+        self._publish(ticket, [{"success": False, "session_id": self.session_id, "error": error}], result_queue)
+
+    def _publish(self, ticket: int, results: List[Dict[str, Any]], result_queue: queue.Queue):
+        """Put results on the queue once every earlier ticket of the job is out."""
+        with self.publish_turn:
+            while self.published != ticket:
+                self.publish_turn.wait()
+        try:
+            for result in results:
+                result_queue.put(result)
+        finally:
+            with self.publish_turn:
+                self.published += 1
+                self.publish_turn.notify_all()
+
+    def finish_if_idle(self) -> bool:
+        """Run on_finish once no page is in flight and no more will be chained."""
+        with self.lock:
+            if self.finished or self.in_flight > 0:
+                return False
+            if not self.stopped and (self.last_seq is None or self.frontier <= self.last_seq):
+                return False
+            self.finished = True
+        if self.hydrator:
+            self.hydrator.close()
+        if self.on_finish:
+            self.on_finish(self)
+        return True
+
+
 class ScrapeWorker(threading.Thread):
+    # Attempts per page before the job is reported as failed (session switches not counted)
+    max_task_attempts = 3
+    # Shortest time a page waiting for quota is parked
+    min_park_delay = 1.0
+
     def __init__(
         self,
         task_queue: queue.Queue,
@@ -17,15 +286,20 @@ class ScrapeWorker(threading.Thread):
         db: Session,
         session_manager: SessionManager,
         batch_size: int = 50,
-        delay: int = 2
+        delay: int = 2,
+        park: Optional[Callable[[Dict, float], None]] = None,
+        stop_event: Optional[threading.Event] = None
     ):
-        super().__init__()
+        super().__init__(daemon=True)
         self.task_queue = task_queue
         self.result_queue = result_queue
         self.db = db
         self.session_manager = session_manager
         self.batch_size = batch_size
         self.delay = delay
+        # Puts a task back on the queue after a delay (jobs waiting for quota)
+        self.park = park
+        self.stop_event = stop_event or threading.Event()
         self.running = True
 
     def run(self):
@@ -35,45 +309,57 @@ class ScrapeWorker(threading.Thread):
                 if task is None:
                     break
 
-                target_username = task["target_username"]
-                session_id = task["session_id"]
-                cursor = task.get("cursor")
+                job: ScrapeJob = task["job"]
+                seq = task["seq"]
 
-                try:
-                    # Get a valid Instagram session
-                    insta_session = self.session_manager.get_best_session()
-                    if not insta_session:
-                        logger.error(f"No valid session available for {target_username}")
-                        continue
+                if job.is_stopped():
+                    # Stopped or at its cap while this page waited in the queue
+                    job.skip_page(seq)
+                    job.finish_if_idle()
+                    continue
 
+                try:
                     # Fetch followers
-                    followers_data = self._fetch_followers(
-                        insta_session,
-                        target_username,
-                        cursor,
-                        self.batch_size
-                    )
-
-                    # Process results
-                    if followers_data:
-                        self.result_queue.put({
-                            "success": True,
-                            "session_id": session_id,
-                            "data": followers_data,
-                            "next_cursor": followers_data.get("next_cursor")
-                        })
-                    
-                    # Add delay between requests
-                    time.sleep(self.delay)
+                    followers_data = self._fetch_followers(job, seq)
+                    released = job.complete_page(seq, followers_data["followers"], self.result_queue, self.batch_size)
+                    if released:
+                        self.task_queue.put(released)
+                    # Pacing between requests is done by the shared rate limiter
+
+                except QuotaExceeded as e:
+                    # The page is fetched again once an account has quota; no worker waits for it
+                    job.release_session(self.session_manager)
+                    # Never requeued straight away: quota that freed up meanwhile may be gone again
+                    wait = max(self.session_manager.quota_wait(), self.min_park_delay)
+                    logger.info(f"Parking page {seq} of @{job.target_username} for {wait:.0f}s: {str(e)}")
+                    if self.park:
+                        self.park(task, wait)
+                    else:
+                        self.stop_event.wait(wait)
+                        self.task_queue.put(task)
+                    continue
+
+                except SessionUnavailable as e:
+                    # The pager's circuit opened, or no account was free: the same page
+                    # goes to another session later, without using up an attempt
+                    logger.warning(f"Requeueing page {seq} of @{job.target_username}: {str(e)}")
+                    self.task_queue.put(task)
+                    continue
 
                 except Exception as e:
+                    if self.stop_event.is_set():
+                        # Shutting down: the job resumes from its checkpoint, don't fail it
+                        logger.info(f"Dropping page {seq} of @{job.target_username} on shutdown: {str(e)}")
+                        continue
+                    attempts = task.get("attempts", 0) + 1
+                    if attempts < self.max_task_attempts:
+                        logger.warning(f"Retrying page {seq} of @{job.target_username} (attempt {attempts}): {str(e)}")
+                        self.task_queue.put(dict(task, attempts=attempts))
+                        continue
                     logger.error(f"Error processing task: {str(e)}")
-                    self.result_queue.put({
-                        "success": False,
-                        "session_id": session_id,
-                        "error": str(e)
-                    })
-                    self.session_manager.increment_challenges(insta_session)
+                    job.fail_page(seq, str(e), self.result_queue)
+
+                job.finish_if_idle()
 
             except queue.Empty:
                 continue
@@ -81,23 +367,43 @@ class ScrapeWorker(threading.Thread):
                 logger.error(f"Worker error: {str(e)}")
                 continue
 
-    def _fetch_followers(
-        self,
-        session: Any,
-        username: str,
-        cursor: str = None,
-        limit: int = 50
-    ) -> Dict:
-        """Fetch followers for a given username using the provided session."""
+    def _fetch_followers(self, job: ScrapeJob, seq: int) -> Dict:
+        """Fetch and hydrate one followers page of a job, chaining the next page first."""
         try:
-            # Use session to fetch followers
-            # This is a placeholder - implement actual Instagram API call
-            followers = []  # TODO: Implement actual follower fetching
-            next_cursor = None  # TODO: Get next cursor from response
+            session = job.pager(self.session_manager, interrupt=self.stop_event)
+            cursor = job.cursor(seq)
+            if job.rank_token is None:
+                job.rank_token = cursor["rank_token"] = session.client.generate_uuid()
+
+            results = session.fetch_follower_page(cursor["user_id"], cursor["rank_token"], cursor["max_id"])
+            users = results.get('users', [])
+            next_max_id = results.get('next_max_id') if users else None
+
+            # Let another worker list the next page while this one is hydrated
+            next_task = job.page_fetched(seq, next_max_id)
+            if next_task:
+                self.task_queue.put(next_task)
+
+            followers = []
+            hydrated = session.hydrate_users(
+                users,
+                listing_filter=job.listing_filter,
+                hydrator=job.hydrator,
+                should_stop=job.is_stopped
+            )
+            try:
+                for profile in hydrated:
+                    if job.claim(seq, profile["username"]):
+                        followers.append(profile)
+                    if job.is_stopped():
+                        # No more user_info requests once stopped or at the cap
+                        break
+            finally:
+                hydrated.close()
 
             return {
                 "followers": followers,
-                "next_cursor": next_cursor
+                "next_cursor": job.cursor(seq + 1) if next_max_id else None
             }
 
         except Exception as e:
@@ -115,40 +421,108 @@ class WorkerPool:
         db: Session,
         session_manager: SessionManager,
         batch_size: int = 50,
-        delay: int = 2
+        delay: int = 2,
+        max_queued_results: int = 0
     ):
         self.task_queue = queue.Queue()
-        self.result_queue = queue.Queue()
+        # Bounded: workers block on put while the writer is behind (0 = unbounded)
+        self.result_queue = queue.Queue(maxsize=max_queued_results)
         self.workers: List[ScrapeWorker] = []
         self.num_workers = num_workers
         self.db = db
         self.session_manager = session_manager
         self.batch_size = batch_size
         self.delay = delay
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        # Tasks waiting for quota: heap of (monotonic due time, sequence, task)
+        self.parked: List[tuple] = []
+        self.parked_changed = threading.Condition()
+        self.park_sequence = itertools.count()
+        self.scheduler: Optional[threading.Thread] = None
 
     def start(self):
         """Start the worker pool."""
-        for _ in range(self.num_workers):
-            worker = ScrapeWorker(
-                self.task_queue,
-                self.result_queue,
-                self.db,
-                self.session_manager,
-                self.batch_size,
-                self.delay
-            )
-            worker.start()
-            self.workers.append(worker)
+        with self.lock:
+            if self.workers:
+                return
+            self.stop_event.clear()
+            for _ in range(self.num_workers):
+                worker = ScrapeWorker(
+                    self.task_queue,
+                    self.result_queue,
+                    self.db,
+                    self.session_manager,
+                    self.batch_size,
+                    self.delay,
+                    park=self.park,
+                    stop_event=self.stop_event
+                )
+                worker.start()
+                self.workers.append(worker)
+            self.scheduler = threading.Thread(target=self._schedule_parked, name="worker-scheduler", daemon=True)
+            self.scheduler.start()
+            logger.info(f"Started WorkerPool with {self.num_workers} workers")
+
+    def configure(self, batch_size: Optional[int] = None, delay: Optional[float] = None):
+        """Change the batch size and delay of the pool and its running workers."""
+        with self.lock:
+            if batch_size is not None:
+                self.batch_size = batch_size
+            if delay is not None:
+                self.delay = delay
+            for worker in self.workers:
+                worker.batch_size = self.batch_size
+                worker.delay = self.delay
+
+    def park(self, task: Dict, delay: float):
+        """Queue a task again after ``delay`` seconds."""
+        with self.parked_changed:
+            heapq.heappush(self.parked, (time.monotonic() + delay, next(self.park_sequence), task))
+            self.parked_changed.notify()
+
+    def _schedule_parked(self):
+        with self.parked_changed:
+            while not self.stop_event.is_set():
+                if not self.parked:
+                    self.parked_changed.wait()
+                    continue
+                due = self.parked[0][0] - time.monotonic()
+                if due > 0:
+                    self.parked_changed.wait(due)
+                    continue
+                task = heapq.heappop(self.parked)[2]
+                self.task_queue.put(task)
+
+    def get_parked_count(self) -> int:
+        with self.parked_changed:
+            return len(self.parked)
 
     def stop(self):
-        """Stop all workers in the pool."""
+        """Stop all workers in the pool.
+
+        Workers waiting for a lease are woken up. Parked pages are dropped;
+        their jobs resume from the stored checkpoint.
+        """
+        self.stop_event.set()
+        with self.parked_changed:
+            if self.parked:
+                logger.info(f"Dropping {len(self.parked)} pages waiting for quota")
+            self.parked = []
+            self.parked_changed.notify_all()
+        self.session_manager.wake_waiters()
+
         # Send stop signal to all workers
-        for _ in range(self.num_workers):
+        for worker in self.workers:
+            worker.stop()
             self.task_queue.put(None)
 
         # Wait for all workers to finish
         for worker in self.workers:
             worker.join()
+        if self.scheduler:
+            self.scheduler.join()
+            self.scheduler = None
 
         self.workers = []
 
@@ -156,9 +530,14 @@ class WorkerPool:
         """Add a task to the queue."""
         self.task_queue.put(task)
 
+    def add_job(self, job: ScrapeJob):
+        """Start a job: queue its first page; later pages are chained by the workers."""
+        self.start()
+        self.add_task(job.task(0))
+
     def get_result(self, timeout: int = 1) -> Dict:
         """Get a result from the queue."""
         try:
             return self.result_queue.get(timeout=timeout)
         except queue.Empty:
-            return None 
\ No newline at end of file
+            return None
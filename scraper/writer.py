@@ -0,0 +1,149 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class WriteFailed(Exception):
+    """Raised by a write callable for the results it could not store.
+
+    ``results`` are the ones left unwritten, in queue order; the others are
+    committed already.
+    """
+
+    def __init__(self, message: str, results: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.results = results
+
+
+class ResultWriter(threading.Thread):
+    """Single thread persisting scraping results from a bounded queue.
+
+    Workers put results on ``result_queue``; once it holds ``maxsize`` results
+    their ``put`` blocks until the writer catches up, so a slow database slows
+    the scrapers down instead of growing memory. Buffered results are written
+    with ``write`` when they reach ``flush_rows`` followers or when the oldest
+    one has waited ``flush_interval`` seconds. ``stop()`` drains the queue and
+    writes what is left before returning.
+
+    Results a write could not store (all of them, or the ones named by a
+    ``WriteFailed``) go back to the front of the buffer and are retried with a
+    growing delay. After ``max_attempts`` failed flushes in a row they are
+    kept in ``dead_letters`` instead, and counted in the stats.
+    """
+
+    # Failed flushes in a row before the results left unwritten are set aside
+    max_attempts = 5
+    retry_delay = 1.0
+    max_retry_delay = 30.0
+
+    def __init__(
+        self,
+        result_queue: queue.Queue,
+        write: Callable[[List[Dict[str, Any]]], None],
+        flush_rows: int = 500,
+        flush_interval: float = 1.0
+    ):
+        super().__init__(name="result-writer", daemon=True)
+        self.result_queue = result_queue
+        self.write = write
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.buffer: List[Dict[str, Any]] = []
+        self.buffered_rows = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.retry_at = 0.0
+        self.dead_letters: List[Dict[str, Any]] = []
+        self.flush_requested = threading.Event()
+        self.stop_event = threading.Event()
+
+    @staticmethod
+    def _rows(result: Dict[str, Any]) -> int:
+        return len((result.get("data") or {}).get("followers") or [])
+
+    def run(self):
+        deadline = None
+        while not self.stop_event.is_set():
+            try:
+                result = self.result_queue.get(timeout=0.1)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                self.buffer.append(result)
+                self.buffered_rows += self._rows(result)
+            except queue.Empty:
+                pass
+
+            if self.buffer and time.monotonic() >= self.retry_at and (
+                self.buffered_rows >= self.flush_rows
+                or time.monotonic() >= deadline
+                or self.flush_requested.is_set()
+                or self.failed_flushes
+            ):
+                self._flush()
+                deadline = time.monotonic() + self.flush_interval if self.buffer else None
+            if not self.buffer:
+                self.flush_requested.clear()
+
+        # Shutdown: whatever the workers queued before they stopped is written too
+        while True:
+            try:
+                result = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.buffer.append(result)
+            self.buffered_rows += self._rows(result)
+        self._flush()
+        while self.buffer:
+            # Results that failed get their remaining attempts before the thread ends
+            time.sleep(max(0.0, self.retry_at - time.monotonic()))
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        results, self.buffer, self.buffered_rows = self.buffer, [], 0
+        try:
+            self.write(results)
+            self.flushes += 1
+            self.failed_flushes = 0
+            return
+        except WriteFailed as e:
+            unwritten = e.results
+            logger.error(f"Could not write {len(unwritten)} of {len(results)} results: {str(e)}")
+        except Exception as e:
+            unwritten = results
+            logger.error(f"Error writing {len(results)} results: {str(e)}")
+
+        self.failed_flushes += 1
+        if self.failed_flushes >= self.max_attempts:
+            logger.error(f"Setting {len(unwritten)} results aside after {self.failed_flushes} failed writes")
+            self.dead_letters.extend(unwritten)
+            self.failed_flushes = 0
+            return
+        # Retried ahead of anything queued since, so each session's checkpoints stay in order
+        self.buffer = unwritten + self.buffer
+        self.buffered_rows = sum(self._rows(result) for result in self.buffer)
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (self.failed_flushes - 1))
+        self.retry_at = time.monotonic() + delay
+
+    def flush(self):
+        """Ask the writer to write its buffer without waiting for the thresholds."""
+        self.flush_requested.set()
+
+    def stop(self, timeout: float = None):
+        """Write everything queued so far and stop the thread."""
+        self.stop_event.set()
+        self.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queued_results": self.result_queue.qsize(),
+            "queue_capacity": self.result_queue.maxsize,
+            "buffered_rows": self.buffered_rows,
+            "flushes": self.flushes,
+            "dead_letters": len(self.dead_letters)
+        }
@@ -0,0 +1,111 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import scraper.profile_cache
+from scraper.async_client import AsyncInstagramClient
+from scraper.profile_cache import ProfileCache
+from scraper.rate_limiter import RateLimiter, get_rate_limiter
+
+
+@pytest.fixture(autouse=True)
+def fresh_profile_cache(monkeypatch):
+    monkeypatch.setattr(scraper.profile_cache, "_profile_cache", ProfileCache(path=":memory:"))
+
+
+class StubApi:
+    """Minimal instagram_private_api.Client stand-in with two pages of followers."""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _request(self, name):
+        with self.lock:
+            self.calls.append(name)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+
+    def generate_uuid(self):
+        return "rank-token"
+
+    def username_info(self, username):
+        self._request("username_info")
+        return {"user": {"pk": 1, "username": username}}
+
+    def user_followers(self, user_id, rank_token=None, max_id=None):
+        self._request("user_followers")
+        if max_id is None:
+            return {"users": [{"pk": pk, "username": f"user_{pk}"} for pk in range(10, 16)], "next_max_id": "page2"}
+        return {"users": [{"pk": pk, "username": f"user_{pk}"} for pk in range(16, 20)], "next_max_id": None}
+
+    def user_info(self, pk):
+        self._request("user_info")
+        return {"user": {"pk": pk, "username": f"user_{pk}", "follower_count": pk, "media_count": 1}}
+
+
+class StubSession:
+    def __init__(self, api):
+        self.username = "stub"
+        self.client = api
+
+    def _login(self):
+        pass
+
+
+def test_hydration_respects_concurrency_bound():
+    api = StubApi()
+    client = AsyncInstagramClient(StubSession(api), max_concurrency=3, requests_per_second=1000, rate_limiter=RateLimiter())
+
+    async def collect():
+        return [follower async for follower in client.get_followers("target")]
+
+    followers = asyncio.run(collect())
+
+    assert sorted(f["username"] for f in followers) == [f"user_{pk}" for pk in range(10, 20)]
+    assert api.calls.count("user_info") == 10
+    assert 1 < api.peak <= 3
+
+
+def test_list_only_mode_makes_no_user_info_calls():
+    api = StubApi(latency=0)
+    client = AsyncInstagramClient(StubSession(api), requests_per_second=1000, rate_limiter=RateLimiter())
+
+    async def collect():
+        return [follower async for follower in client.get_followers("target", hydrate=False, user_id=1)]
+
+    followers = asyncio.run(collect())
+
+    assert len(followers) == 10
+    assert "user_info" not in api.calls
+    assert "username_info" not in api.calls
+
+
+def test_rate_limit_spaces_requests():
+    api = StubApi(latency=0)
+    rate_limiter = RateLimiter()
+    client = AsyncInstagramClient(StubSession(api), max_concurrency=5, requests_per_second=20, rate_limiter=rate_limiter)
+
+    async def fetch_all():
+        await asyncio.gather(*(client.get_account_info(f"user_{i}") for i in range(5)))
+
+    started = time.monotonic()
+    asyncio.run(fetch_all())
+
+    # Five requests at 20/s need at least four 50 ms gaps
+    assert time.monotonic() - started >= 0.2
+    # The pace is set on the client's own limiter, not the process-wide one
+    assert ("account", "stub") in rate_limiter.buckets
+    assert ("account", "stub") not in get_rate_limiter().buckets
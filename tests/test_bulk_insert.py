@@ -0,0 +1,15 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_writes import run_write_benchmark
+
+
+def test_bulk_and_orm_paths_store_the_same_rows():
+    orm = run_write_benchmark(sessions=3, rows=600, batch_size=50, bulk=False, in_memory=True)
+    bulk = run_write_benchmark(sessions=3, rows=600, batch_size=50, bulk=True, in_memory=True)
+
+    assert orm["stored_rows"] == bulk["stored_rows"] == 600
+    # The ORM path commits per queued result, the bulk path once per drain
+    assert orm["transactions"] == 12
+    assert bulk["transactions"] == 1
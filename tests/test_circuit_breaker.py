@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+from scraper.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, CLOSED, OPEN, HALF_OPEN
+
+
+class StubSession:
+    def __init__(self, username, recovers=True):
+        self.username = username
+        self.recovers = recovers
+        self.logins = 0
+
+    def _login(self):
+        self.logins += 1
+
+    def is_logged_in(self):
+        return self.recovers
+
+
+def test_breaker_opens_and_backs_off():
+    breaker = CircuitBreaker("account", recovery_timeout=10, max_recovery_timeout=25)
+
+    assert breaker.record_failure(Exception("challenge_required"))
+    assert breaker.state == OPEN and not breaker.allow()
+    # Already open: a second failure does not re-trip
+    assert not breaker.record_failure()
+
+    breaker.retry_at = 0
+    assert breaker.start_probe() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.retry_at - time.monotonic() > 15
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_background_probe_recovers_only_healthy_sessions():
+    registry = CircuitBreakerRegistry(recovery_timeout=0.05, probe_interval=0.01)
+    healthy = StubSession("healthy")
+    stuck = StubSession("stuck", recovers=False)
+    try:
+        registry.trip(healthy, Exception("challenge_required"))
+        registry.trip(stuck, Exception("challenge_required"))
+        assert not registry.is_available("healthy")
+
+        deadline = time.monotonic() + 2
+        # Each probe round tries both sessions; wait until both were tried
+        while not (registry.is_available("healthy") and stuck.logins) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert registry.is_available("healthy")
+        assert not registry.is_available("stuck")
+        assert stuck.logins >= 1
+    finally:
+        registry.stop()
@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_throughput import run_benchmark
+
+
+def test_scrape_against_fake_backend():
+    result = run_benchmark(targets=2, followers=120, page_size=40, latency=0.001, rate=500, timeout=60)
+
+    # Private followers are skipped on the listing, everyone else is stored
+    assert result["hydrations_saved"]["private"] > 0
+    assert result["stored_profiles"] + result["hydrations_saved"]["private"] == 240
+    assert result["session_statuses"] == ["completed", "completed"]
+    # One user_info per stored follower plus a few page and lookup requests
+    assert result["requests"]["user_info"] == result["stored_profiles"]
+    assert result["requests_per_profile"] < 1.1
+
+
+def test_scrape_survives_throttling():
+    result = run_benchmark(
+        targets=1,
+        followers=60,
+        page_size=20,
+        latency=0.001,
+        max_requests_per_minute=20,
+        rate_window=0.5,
+        rate=500,
+        cooldown=0.05,
+        timeout=60
+    )
+
+    assert result["errors"].get("please_wait", 0) > 0
+    assert result["stored_profiles"] + result["hydrations_saved"].get("private", 0) == 60
+    assert result["session_statuses"] == ["completed"]
+
+
+def test_split_hydration_scales_one_target_across_accounts():
+    options = dict(targets=1, followers=120, accounts=3, page_size=40, latency=0.001, rate=40, timeout=60)
+    single = run_benchmark(split_hydration=False, **options)
+    split = run_benchmark(split_hydration=True, **options)
+
+    assert split["stored_profiles"] == single["stored_profiles"]
+    assert split["session_statuses"] == ["completed"]
+    # Every account hydrated part of the target instead of just the pager
+    assert len(split["requests_by_account"]) == 3
+    assert split["profiles_per_minute"] > 1.5 * single["profiles_per_minute"]
+
+
+def test_challenged_account_does_not_freeze_the_job():
+    # Whichever account gets the crawl is stuck in a challenge partway through,
+    # while it is hydrating and after that while paging; the crawl moves on
+    challenged_after = {"scraper_0": 30, "scraper_1": 30, "scraper_2": 30}
+    for split_hydration in (True, False):
+        result = run_benchmark(
+            targets=1,
+            followers=200,
+            accounts=4,
+            page_size=10,
+            latency=0.001,
+            rate=200,
+            cooldown=0.2,
+            split_hydration=split_hydration,
+            challenged_after=challenged_after,
+            timeout=60
+        )
+
+        assert sum(result["circuit_trips"].values()) >= 1
+        assert result["stored_profiles"] + result["hydrations_saved"]["private"] == 200
+        assert result["session_statuses"] == ["completed"]
+
+
+def test_capped_crawl_stops_fetching_at_max_followers():
+    result = run_benchmark(targets=1, followers=1000, max_followers=100, page_size=20, latency=0.001, rate=500, timeout=60)
+
+    assert result["stored_profiles"] == 100
+    assert result["session_statuses"] == ["completed"]
+    # Hydration stops at the cap instead of walking the whole 1000-follower target
+    assert result["requests"]["user_info"] < 130
+    assert result["requests"]["user_followers"] < 15
@@ -0,0 +1,29 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper.filters import FollowerFilter, skip_private, skip_usernames, skip_bot_patterns, parse_patterns, merge_stats
+
+
+def test_first_matching_rule_is_counted():
+    stored = {"already_here"}
+    listing_filter = FollowerFilter([skip_usernames(stored), skip_private(), skip_bot_patterns([r"\d{6,}$"])])
+
+    assert listing_filter.rejects({"username": "already_here", "is_private": True}) == "already_stored"
+    assert listing_filter.rejects({"username": "hidden", "is_private": True}) == "private"
+    assert listing_filter.rejects({"username": "promo123456", "is_private": False}) == "bot_pattern"
+    assert listing_filter.rejects({"username": "real_shop", "is_private": False}) is None
+
+    stored.add("real_shop")
+    assert listing_filter.rejects({"username": "real_shop", "is_private": False}) == "already_stored"
+    assert listing_filter.get_stats() == {"already_stored": 2, "private": 1, "bot_pattern": 1}
+
+
+def test_merge_stats_and_pattern_parsing():
+    first = FollowerFilter([skip_private()])
+    second = FollowerFilter([skip_private()])
+    first.rejects({"username": "a", "is_private": True})
+    second.rejects({"username": "b", "is_private": True})
+
+    assert merge_stats([first, second]) == {"private": 2}
+    assert parse_patterns(" ^bot_ , f4f ,, ") == ["^bot_", "f4f"]
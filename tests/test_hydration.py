@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+
+import scraper.circuit_breaker
+import scraper.quota
+from scraper.circuit_breaker import CircuitBreakerRegistry
+from scraper.hydration import SplitHydrator
+from scraper.quota import QuotaTracker
+
+
+class Session:
+    """Records how many user_info requests it has in flight at once."""
+
+    def __init__(self, username):
+        self.username = username
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def _hydrate_with_backoff(self, pk, should_stop=None):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.002 * (pk % 5 + 1))
+        with self.lock:
+            self.active -= 1
+        return {"pk": pk, "username": f"user_{pk}"}
+
+    @staticmethod
+    def _is_throttle(error):
+        return False
+
+
+def test_pages_in_flight_take_turns_on_each_account(monkeypatch):
+    monkeypatch.setattr(scraper.circuit_breaker, "_circuit_breakers", CircuitBreakerRegistry(recovery_timeout=60))
+    monkeypatch.setattr(scraper.quota, "_quota_tracker", QuotaTracker(hourly_quota=0, daily_quota=0))
+    sessions = [Session(f"scraper_{i}") for i in range(3)]
+    pager = sessions[0]
+    hydrator = SplitHydrator(sessions)
+
+    # Pages of the same job hydrated at once on the same helpers
+    profiles = {}
+
+    def page(seq):
+        users = [{"pk": seq * 100 + i} for i in range(30)]
+        profiles[seq] = list(hydrator.hydrate(users, pager=pager))
+
+    threads = [threading.Thread(target=page, args=(seq,)) for seq in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    hydrator.close()
+
+    assert [len(profiles[seq]) for seq in range(3)] == [30, 30, 30]
+    assert all(session.max_active == 1 for session in sessions)
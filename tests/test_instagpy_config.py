@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from benchmarks.fake_instagram import FakeInstagramBackend, FakeInstagramServer, patch_instagpy_paths
+
+# instagpy is installed from _instagpy/ (see instructions.md)
+instagpy = pytest.importorskip("instagpy")
+InstaGPy, config = instagpy.InstaGPy, instagpy.config
+
+# Nothing listens here, so requests through it fail to connect
+DEAD_PROXY = "http://127.0.0.1:9"
+
+
+def test_instances_keep_their_own_transport_settings():
+    backend = FakeInstagramBackend(name="instagpy-config-test", targets={"target": 10})
+    with FakeInstagramServer(backend) as server, patch_instagpy_paths(server.base_url):
+        direct = InstaGPy(timeout=2, max_retries=2, pool_size=4)
+        proxied = InstaGPy(proxy=DEAD_PROXY, timeout=1, max_retries=1)
+
+        assert config.PROXY is None and config.TIMEOUT == 5
+        assert direct.session.proxies == {}
+        assert proxied.session.proxies == {"http": DEAD_PROXY, "https": DEAD_PROXY}
+        adapter = direct.session.get_adapter(server.base_url)
+        assert adapter._pool_maxsize == 4
+        assert proxied.session.get_adapter(server.base_url)._pool_maxsize == config.POOL_SIZE
+
+        # One instance's dead proxy does not affect the other
+        assert direct.get_user_info("target")["data"]["user"]["username"] == "target"
+        assert proxied.get_user_info("target") is None
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+import pytest
+
+import scraper.circuit_breaker
+import scraper.profile_cache
+import scraper.proxy_manager
+import scraper.quota
+import scraper.rate_limiter
+from benchmarks.fake_instagram import FakeClient, FakeInstagramBackend
+from scraper.circuit_breaker import CircuitBreakerRegistry
+from scraper.instagram_client import InstagramClient
+from scraper.profile_cache import ProfileCache
+from scraper.proxy_manager import ProxyManager
+from scraper.quota import QuotaTracker
+from scraper.rate_limiter import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def fresh_globals(monkeypatch):
+    monkeypatch.setattr(scraper.circuit_breaker, "_circuit_breakers", CircuitBreakerRegistry(recovery_timeout=60))
+    monkeypatch.setattr(scraper.profile_cache, "_profile_cache", ProfileCache(path=":memory:", ttl=0))
+    monkeypatch.setattr(scraper.proxy_manager, "_proxy_manager", ProxyManager(proxies=[]))
+    monkeypatch.setattr(scraper.quota, "_quota_tracker", QuotaTracker(hourly_quota=0, daily_quota=0))
+    monkeypatch.setattr(scraper.rate_limiter, "_rate_limiter", RateLimiter(account_rate=1000, min_rate=1000, max_rate=1000))
+
+
+def build_client(backend):
+    return InstagramClient("scraper_0", "password", client=FakeClient("scraper_0", "password", backend=backend.name))
+
+
+def test_followers_are_listed_or_hydrated_once():
+    backend = FakeInstagramBackend(name="client-hydration-test", targets={"target": 50}, page_size=20, latency=0)
+    client = build_client(backend)
+
+    # List-only: the fields of the followers page, no per-user request
+    listed = list(client.get_followers("target", hydrate=False))
+    assert len(listed) == 50
+    assert "follower_count" not in listed[0]
+    assert backend.get_stats()["requests"].get("user_info", 0) == 0
+
+    # Hydrated: one user_info per follower and nothing else per user
+    hydrated = list(client.get_followers("target", user_id=backend.target_pks["target"]))
+    assert {profile["username"] for profile in hydrated} == {user["username"] for user in listed}
+    assert all("follower_count" in profile for profile in hydrated)
+    requests = backend.get_stats()["requests"]
+    assert requests["user_info"] == 50
+    assert requests["username_info"] == 1
+
+
+def test_overlapping_pages_do_not_fetch_a_profile_twice():
+    backend = FakeInstagramBackend(name="client-overlap-test", targets={"target": 30}, private_ratio=0, latency=0)
+    client = build_client(backend)
+    users = [backend.listing_entry(pk) for pk in backend.follower_pks(1)]
+
+    seen_pks = set()
+    first = list(client.hydrate_users(users[:20], seen_pks=seen_pks))
+    # The next page repeats five followers of the previous one
+    second = list(client.hydrate_users(users[15:], seen_pks=seen_pks))
+
+    assert len(first) == 20 and len(second) == 10
+    assert backend.get_stats()["requests"]["user_info"] == 30
+
+
+def test_prefetch_stays_within_the_configured_pages():
+    backend = FakeInstagramBackend(name="client-prefetch-test", targets={"target": 1000}, page_size=10, latency=0)
+    client = build_client(backend)
+    target_pk = backend.target_pks["target"]
+
+    def pages_requested():
+        return backend.get_stats()["requests"].get("user_followers", 0)
+
+    for depth in (0, 2):
+        started = pages_requested()
+        followers = client.get_followers("target", user_id=target_pk, prefetch_pages=depth)
+        for _ in range(5):
+            next(followers)
+        # Give the prefetcher time to run as far ahead as it may
+        time.sleep(0.3)
+        # The page being hydrated, `depth` buffered pages and one waiting to be buffered
+        assert pages_requested() - started <= 1 + depth + (1 if depth else 0)
+        assert pages_requested() - started >= 1 + depth
+
+        followers.close()
+        ahead = pages_requested()
+        time.sleep(0.7)
+        # A closed listing stops the prefetcher
+        assert pages_requested() == ahead
@@ -0,0 +1,290 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import scraper.circuit_breaker
+import scraper.profile_cache
+import scraper.quota
+import scraper.rate_limiter
+from benchmarks.fake_instagram import FakeClient, FakeInstagramBackend
+from database.models import Base, Follower, InstagramAccount, ScrapingSession
+from scraper.circuit_breaker import CircuitBreakerRegistry
+from scraper.instagram_client import InstagramClient
+from scraper.manager import ScraperManager
+from scraper.profile_cache import ProfileCache
+from scraper.quota import QuotaTracker
+from scraper.rate_limiter import RateLimiter
+from scraper.session_manager import SessionManager
+from scraper.writer import WriteFailed
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    """A fake backend, two saved accounts and a database shared by the managers of a test."""
+    monkeypatch.setattr(scraper.circuit_breaker, "_circuit_breakers", CircuitBreakerRegistry(recovery_timeout=60))
+    monkeypatch.setattr(scraper.profile_cache, "_profile_cache", ProfileCache(path=":memory:", ttl=0))
+    monkeypatch.setattr(scraper.quota, "_quota_tracker", QuotaTracker(hourly_quota=0, daily_quota=0))
+    monkeypatch.setattr(
+        scraper.rate_limiter, "_rate_limiter",
+        RateLimiter(account_rate=20, min_rate=20, max_rate=20, cooldown=0.001, max_cooldown=0.001)
+    )
+    backend = FakeInstagramBackend(name="manager-test", targets={"target": 5000, "resumed": 600}, page_size=20, latency=0.001)
+    session_manager = SessionManager(sessions_dir=tempfile.mkdtemp(), flush_interval=60, standby_accounts=[])
+    for i in range(2):
+        username = f"scraper_{i}"
+        client = FakeClient(username, "password", backend=backend.name)
+        session_manager.save_session(username, InstagramClient(username, "password", client=client))
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    managers = []
+
+    def build(db=None, **options):
+        options.setdefault("delay", 0.05)
+        manager = ScraperManager(db or sessionmaker(bind=engine), session_manager=session_manager, **options)
+        managers.append(manager)
+        return manager
+
+    yield build, backend
+    for manager in managers:
+        manager.shutdown()
+    session_manager.close()
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_any_manager_can_stop_a_crawl(setup):
+    build, backend = setup
+    # Streamlit builds one manager per browser session
+    first, second = build(), build()
+    session_id = first.start_scraping("target", max_followers=5000)
+    assert session_id and first.is_processing(session_id)
+
+    assert second.stop_scraping(session_id)
+    assert wait_until(lambda: not first.is_processing(session_id))
+    requests = backend.get_stats()["total_requests"]
+    time.sleep(0.3)
+    assert backend.get_stats()["total_requests"] == requests
+
+    # stop_all reaches crawls started elsewhere too
+    other = first.start_scraping("target", max_followers=5000)
+    assert second.stop_all()
+    assert wait_until(lambda: not first.is_processing(other))
+    with second.session_scope() as db:
+        assert db.get(ScrapingSession, other).status == "stopped"
+
+
+def test_settings_apply_to_the_running_manager(setup):
+    build, backend = setup
+    manager = build(batch_size=50)
+    session_id = manager.start_scraping("target", max_followers=40)
+    assert session_id
+    writer = manager.writer
+
+    manager.configure(batch_size=5, delay=0.5)
+    assert manager.worker_pool.batch_size == 5
+    assert all(worker.batch_size == 5 for worker in manager.worker_pool.workers)
+    assert manager.rate_limiter.account_rate == 2.0
+    # The crawl and the writer keep running on the same manager
+    assert manager.writer is writer and manager.is_processing(session_id)
+
+
+def test_start_does_not_wait_for_a_free_account(setup):
+    build, backend = setup
+    manager = build()
+    # Both accounts are busy with other jobs
+    held = [manager.session_manager.acquire(timeout=0) for _ in range(2)]
+    assert all(held)
+
+    started = time.monotonic()
+    session_id = manager.start_scraping("target", max_followers=20)
+    assert session_id and time.monotonic() - started < 1
+    assert backend.get_stats()["requests"].get("user_followers", 0) == 0
+
+    # The crawl's worker takes the first account given back
+    for session in held:
+        manager.session_manager.release(session)
+    assert wait_until(lambda: manager.get_session_status(session_id)["status"] == "completed")
+
+
+def test_crawl_resumes_from_its_checkpoint_after_a_restart(setup):
+    build, backend = setup
+    first = build(delay=0.01)
+    session_id = first.start_scraping("resumed", max_followers=600)
+
+    def stored():
+        with first.session_scope() as db:
+            return db.get(ScrapingSession, session_id).followers_scraped
+
+    assert wait_until(lambda: stored() >= 100)
+    # The process goes away mid-crawl; the session is left running
+    first.shutdown()
+    with first.session_scope() as db:
+        record = db.get(ScrapingSession, session_id)
+        assert record.status == "running" and record.last_cursor
+        stored_before = record.followers_scraped
+    pages_before = backend.get_stats()["requests"]["user_followers"]
+
+    second = build(delay=0.01)
+    assert second.resume_all() == [session_id]
+    assert wait_until(lambda: second.get_session_status(session_id)["status"] == "completed")
+
+    with second.session_scope() as db:
+        usernames = [username for (username,) in db.query(Follower.username).filter_by(scraping_session_id=session_id)]
+        assert db.get(ScrapingSession, session_id).followers_scraped == len(usernames)
+    # Nothing stored twice, and the crawl went on from the checkpoint, not page 0
+    assert len(usernames) == len(set(usernames)) > stored_before
+    pages_after = backend.get_stats()["requests"]["user_followers"] - pages_before
+    assert pages_after <= 30 - stored_before // 20
+
+
+
+def test_resuming_a_running_crawl_leaves_it_alone(setup):
+    build, backend = setup
+    # The crawl pages and hydrates on one account; the other one is free
+    first, second = build(split_hydration=False), build()
+    session_id = first.start_scraping("target", max_followers=5000)
+    assert session_id
+    assert wait_until(lambda: first.session_manager.get_session_stats()["leased_sessions"] == 1)
+    with first.session_scope() as db:
+        db.get(ScrapingSession, session_id).error_count = 2
+
+    # Every browser session resumes on startup; this crawl is already being processed
+    assert second.resume_all() == []
+    assert not second.resume_scraping(session_id, lease_timeout=2)
+    with second.session_scope() as db:
+        assert db.get(ScrapingSession, session_id).error_count == 2
+    # No account was leased for it either
+    assert first.session_manager.get_session_stats()["leased_sessions"] == 1
+    assert first.is_processing(session_id)
+    assert first.stop_scraping(session_id)
+
+
+def test_crawl_already_at_its_cap_completes_instead_of_resuming(setup):
+    build, backend = setup
+    manager = build()
+    with manager.session_scope() as db:
+        account = InstagramAccount(username="resumed")
+        db.add(account)
+        db.flush()
+        # The process went away right after the last page was stored
+        record = ScrapingSession(target_username="resumed", account_id=account.id, status="running", max_followers=3)
+        db.add(record)
+        db.flush()
+        session_id = record.id
+        db.add_all(Follower(username=f"follower_{i}", account_id=account.id, scraping_session_id=session_id) for i in range(3))
+
+    assert manager.resume_all() == []
+    assert not manager.is_processing(session_id)
+    with manager.session_scope() as db:
+        record = db.get(ScrapingSession, session_id)
+        assert record.status == "completed" and record.completed_at
+        assert db.query(Follower).filter_by(scraping_session_id=session_id).count() == 3
+    assert backend.get_stats()["total_requests"] == 0
+
+def test_each_thread_gets_its_own_db_session(setup):
+    build, backend = setup
+    # A pooled file database: one connection per thread, unlike the shared in-memory one
+    engine = create_engine(f"sqlite:///{tempfile.mkdtemp()}/scraper.db")
+    Base.metadata.create_all(bind=engine)
+    manager = build(db=sessionmaker(bind=engine))
+    sessions = {}
+    released = []
+    all_open = threading.Barrier(3)
+
+    def work(name):
+        with manager.session_scope() as db:
+            sessions[name] = db
+            # Every thread is inside its unit of work at the same time
+            all_open.wait(5)
+            db.add(InstagramAccount(username=name))
+        released.append(not manager.Session.registry.has())
+
+    threads = [threading.Thread(target=work, args=(f"account_{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len({id(db) for db in sessions.values()}) == 3
+    # Each scope gives its session back when it ends
+    assert released == [True, True, True]
+    with manager.session_scope() as db:
+        assert db not in sessions.values()
+        assert db.query(InstagramAccount).count() == 3
+
+
+def test_crawls_wait_for_an_account_without_failing(setup):
+    build, backend = setup
+    manager = build(delay=0.01)
+    manager.lease_timeout = 1
+    # More crawls than accounts: three of them wait several lease timeouts for their turn
+    session_ids = [manager.start_scraping("resumed", max_followers=100) for _ in range(5)]
+    assert all(session_ids)
+
+    def statuses():
+        return [manager.get_session_status(session_id)["status"] for session_id in session_ids]
+
+    assert wait_until(lambda: all(status != "running" for status in statuses()), timeout=60)
+    assert statuses() == ["completed"] * 5
+    assert not any(manager.is_processing(session_id) for session_id in session_ids)
+
+    # A page that failed for good ends the crawl instead of leaving it running
+    with manager.session_scope() as db:
+        db.get(ScrapingSession, session_ids[0]).status = "running"
+    manager._handle_scraping_error(session_ids[0], "Followers page failed")
+    assert manager.get_session_status(session_ids[0])["status"] == "failed"
+
+
+def test_a_result_that_cannot_be_stored_does_not_cost_the_batch(setup):
+    build, backend = setup
+    manager = build()
+    with manager.session_scope() as db:
+        account = InstagramAccount(username="target")
+        db.add(account)
+        db.flush()
+        records = [ScrapingSession(target_username="target", account_id=account.id, status="running", max_followers=100) for _ in range(2)]
+        db.add_all(records)
+        db.flush()
+        good, bad = (record.id for record in records)
+
+    def result(session_id, usernames, max_id):
+        return {
+            "success": True,
+            "session_id": session_id,
+            "data": {"followers": [{"username": username} for username in usernames]},
+            "cursor": {"user_id": 7, "rank_token": "rt", "max_id": max_id}
+        }
+
+    results = [
+        result(good, ["a", "b"], "1"),
+        # A follower without a username cannot be stored
+        {**result(bad, ["c"], "1"), "data": {"followers": [{"full_name": "No username"}]}},
+        result(bad, ["d"], "2"),
+        result(good, ["e"], "2")
+    ]
+    with pytest.raises(WriteFailed) as excinfo:
+        manager.write_results(results, bulk=True)
+
+    # The other session's rows and checkpoints are stored; the bad session's
+    # later page is held back with it, so its checkpoint does not skip a page
+    assert excinfo.value.results == results[1:3]
+    with manager.session_scope() as db:
+        assert sorted(username for (username,) in db.query(Follower.username)) == ["a", "b", "e"]
+        assert '"2"' in db.get(ScrapingSession, good).last_cursor
+        assert db.get(ScrapingSession, bad).last_cursor is None
\ No newline at end of file
@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+from scraper.profile_cache import ProfileCache
+
+
+def test_lookup_by_pk_and_username(tmp_path):
+    cache = ProfileCache(path=str(tmp_path / "cache.db"))
+    cache.put({"pk": 42, "username": "someone", "follower_count": 10})
+
+    assert cache.get_by_pk(42)["username"] == "someone"
+    assert cache.get_by_username("someone")["pk"] == 42
+    assert cache.get_by_pk(43) is None
+    assert cache.get_stats() == {"hits": 2, "misses": 1, "hit_rate": 2 / 3, "requests_saved": 2}
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = ProfileCache(path=str(tmp_path / "cache.db"), ttl=0.05)
+    cache.put({"pk": 1, "username": "someone"})
+    time.sleep(0.1)
+
+    assert cache.get_by_pk(1) is None
+    assert cache.purge_expired() == 1
+
+
+def test_entries_survive_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ProfileCache(path=path).put({"pk": 7, "username": "persisted"})
+
+    assert ProfileCache(path=path).get_by_username("persisted")["pk"] == 7
@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+from http.cookiejar import CookieJar
+from types import SimpleNamespace
+
+import pytest
+from instagram_private_api.errors import ClientConnectionError
+
+import scraper.profile_cache
+import scraper.proxy_manager
+import scraper.rate_limiter
+from benchmarks.fake_instagram import FakeClient, FakeInstagramBackend
+from scraper.instagram_client import InstagramClient
+from scraper.profile_cache import ProfileCache
+from scraper.proxy_manager import ProxyManager
+from scraper.rate_limiter import RateLimiter
+
+GOOD = "http://good.local:8080"
+BAD = "http://bad.local:8080"
+
+
+def test_proxies_load_from_file_and_accounts_stick_to_theirs():
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        f.write("# pool\nhttp://a.local:8080\n\nhttp://b.local:8080  # backup\nhttp://a.local:8080\n")
+    try:
+        manager = ProxyManager(proxy_file=f.name)
+    finally:
+        os.unlink(f.name)
+    assert manager.proxies[-2:] == ["http://a.local:8080", "http://b.local:8080"]
+
+    manager = ProxyManager(proxies=["http://a.local:8080", "http://b.local:8080"])
+    bound = manager.proxy_for("scraper_0")
+    assert all(manager.proxy_for("scraper_0") == bound for _ in range(20))
+    # A proxy saved with the session is kept while it is in the pool
+    assert manager.proxy_for("scraper_1", current="http://b.local:8080") == "http://b.local:8080"
+    assert ProxyManager(proxies=[]).proxy_for("scraper_0") is None
+
+
+def test_new_bindings_prefer_healthy_proxies():
+    manager = ProxyManager(proxies=[GOOD, BAD], max_error_rate=0.9, max_failures=100)
+    for _ in range(10):
+        manager.record(GOOD, 0.05)
+        manager.record(BAD, 0.5, failed=True)
+    assert manager.score(GOOD) > 10 * manager.score(BAD)
+    bindings = [manager.proxy_for(f"scraper_{i}") for i in range(40)]
+    assert bindings.count(GOOD) > bindings.count(BAD)
+
+
+def test_failing_proxy_is_evicted_and_returns_on_probation(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scraper.proxy_manager.time, "monotonic", lambda: now[0])
+    manager = ProxyManager(proxies=[BAD], max_failures=3, eviction_time=60)
+    assert manager.proxy_for("scraper_0") == BAD
+    manager.add_proxy(GOOD)
+
+    for _ in range(3):
+        manager.record(BAD, 0.1, failed=True)
+    assert manager.get_proxy_count() == 1
+    assert "scraper_0" not in manager.bindings
+    assert manager.proxy_for("scraper_0") == GOOD
+    # Requests still in flight when it was evicted do not count
+    manager.record(BAD, 0.1, failed=True)
+    assert manager.stats[BAD].requests == 0
+
+    now[0] += 61
+    assert manager.get_proxy_count() == 2
+    assert manager.proxy_for("scraper_0") == GOOD
+    for _ in range(3):
+        manager.record(BAD, 0.1, failed=True)
+    assert manager.stats[BAD].evicted_until == now[0] + 60
+
+
+def test_client_moves_to_another_proxy_when_its_own_fails(monkeypatch):
+    manager = ProxyManager(proxies=[BAD], max_failures=2, eviction_time=60)
+    monkeypatch.setattr(scraper.proxy_manager, "_proxy_manager", manager)
+    monkeypatch.setattr(scraper.profile_cache, "_profile_cache", ProfileCache(path=":memory:", ttl=0))
+    monkeypatch.setattr(scraper.rate_limiter, "_rate_limiter", RateLimiter(account_rate=1000, proxy_rate=1000, max_rate=1000))
+    backend = FakeInstagramBackend(name="proxy-failover-test", targets={"target": 10}, proxy_failure_rates={BAD: 1.0})
+    client = InstagramClient("scraper_0", "password", client=FakeClient("scraper_0", "password", backend=backend.name))
+    manager.proxy_for("scraper_0")
+    manager.add_proxy(GOOD)
+
+    # Both retries through the bad proxy fail, the third attempt goes out through the good one
+    assert client.hydrate_user(1000)["pk"] == 1000
+    assert client.proxy == GOOD
+    assert client.client.proxy == GOOD
+    assert backend.get_stats()["requests_by_proxy"] == {BAD: 2, GOOD: 1}
+
+    # With nothing healthy left the connection error reaches the caller after the retries
+    manager.remove_proxy(GOOD)
+    with pytest.raises(ClientConnectionError):
+        client.hydrate_user(1001)
+
+
+def test_proxy_change_keeps_the_cookie_jar():
+    cookie_jar = CookieJar()
+    api = SimpleNamespace(opener=SimpleNamespace(cookie_jar=cookie_jar))
+    client = InstagramClient("scraper_0", "password", client=api)
+    client.set_proxy(GOOD)
+    assert api.opener.cookie_jar is cookie_jar
+    handlers = [handler for handler in api.opener.handlers if hasattr(handler, "proxies")]
+    assert handlers[0].proxies == {"http": GOOD, "https": GOOD}
@@ -0,0 +1,199 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import database.config
+import scraper.profile_cache
+import scraper.quota
+import scraper.rate_limiter
+from benchmarks.bench_throughput import run_benchmark
+from benchmarks.fake_instagram import FakeClient, FakeInstagramBackend
+from database.models import AccountUsage, Base, InstagramAccount
+from scraper.circuit_breaker import CircuitBreakerRegistry, set_circuit_breakers
+from scraper.instagram_client import InstagramClient
+from scraper.profile_cache import ProfileCache
+from scraper.quota import QuotaExceeded, QuotaTracker
+from scraper.rate_limiter import RateLimiter
+from scraper.session_manager import SessionManager
+
+
+class Clock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+def test_rolling_windows_slide_over_hour_buckets():
+    clock = Clock(datetime(2024, 1, 1, 10, 0))
+    tracker = QuotaTracker(hourly_quota=100, daily_quota=150, clock=clock)
+    tracker.record("scraper_0", requests=80)
+    assert tracker.usage("scraper_0") == {"hour": 80, "day": 80}
+    assert tracker.remaining("scraper_0") == 20
+
+    # Halfway through the next hour half of the previous bucket is still in the window
+    clock.now += timedelta(minutes=90)
+    tracker.record("scraper_0", requests=30)
+    assert tracker.usage("scraper_0")["hour"] == pytest.approx(70)
+    assert tracker.usage("scraper_0")["day"] == 110
+
+    # The daily quota binds once the hourly window has moved on
+    clock.now += timedelta(hours=2)
+    tracker.record("scraper_0", requests=40)
+    assert tracker.remaining("scraper_0") == 0
+    with pytest.raises(QuotaExceeded):
+        tracker.check("scraper_0")
+
+    clock.now += timedelta(hours=24)
+    assert tracker.has_budget("scraper_0")
+    # Accounts without a quota are never held back
+    assert QuotaTracker(hourly_quota=0, daily_quota=0).remaining("scraper_0") is None
+
+
+def test_usage_is_persisted_and_reloaded():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    factory = sessionmaker(bind=engine)
+    clock = Clock(datetime.utcnow().replace(minute=30))
+
+    tracker = QuotaTracker(hourly_quota=100, daily_quota=1000, session_factory=factory, flush_interval=60, clock=clock)
+    tracker.record("scraper_0", requests=60)
+    tracker.record("scraper_0", requests=0, challenges=1)
+    tracker.record("scraper_1", requests=5)
+    assert tracker.flush() == 2
+    tracker.record("scraper_0", requests=10)
+    tracker.close()
+
+    db = factory()
+    row = db.query(AccountUsage).filter_by(username="scraper_0").one()
+    assert (row.requests, row.challenges) == (70, 1)
+    db.close()
+
+    # A restart starts from the stored counts
+    reloaded = QuotaTracker(hourly_quota=100, daily_quota=1000, session_factory=factory, clock=clock)
+    assert reloaded.usage("scraper_0")["hour"] == 70
+    assert reloaded.remaining("scraper_0") == 30
+
+
+def test_usage_table_is_added_to_an_existing_database(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    monkeypatch.setattr(database.config, "engine", engine)
+    # A database created before request quotas were tracked
+    tables = [table for name, table in Base.metadata.tables.items() if name != "account_usage"]
+    Base.metadata.create_all(bind=engine, tables=tables)
+    db = sessionmaker(bind=engine)()
+    db.add(InstagramAccount(username="target"))
+    db.commit()
+
+    assert not database.config.tables_exist()
+    database.config.create_tables()
+    assert database.config.tables_exist()
+    assert db.query(InstagramAccount).count() == 1
+    db.close()
+
+
+def test_capacity_projects_profiles_per_day():
+    clock = Clock(datetime(2024, 1, 1, 10, 0))
+    tracker = QuotaTracker(hourly_quota=100, daily_quota=1000, clock=clock)
+    tracker.set_quota("scraper_1", hourly=20)
+    tracker.record("scraper_0", requests=400)
+
+    capacity = tracker.capacity(["scraper_0", "scraper_1"], requests_per_profile=1.25)
+    # min(1000, 24 * 100) + min(1000, 24 * 20) requests a day
+    assert capacity["profiles_per_day"] == int(1480 / 1.25)
+    assert capacity["profiles_left_today"] == int((600 + 480) / 1.25)
+    assert QuotaTracker(hourly_quota=0, daily_quota=0).capacity(["scraper_0"])["profiles_per_day"] is None
+
+
+def test_accounts_over_quota_get_no_work(monkeypatch):
+    set_circuit_breakers(CircuitBreakerRegistry(recovery_timeout=60))
+    tracker = QuotaTracker(hourly_quota=10, daily_quota=0)
+    monkeypatch.setattr(scraper.quota, "_quota_tracker", tracker)
+    monkeypatch.setattr(scraper.profile_cache, "_profile_cache", ProfileCache(path=":memory:", ttl=0))
+    monkeypatch.setattr(scraper.rate_limiter, "_rate_limiter", RateLimiter(account_rate=1000, max_rate=1000))
+    backend = FakeInstagramBackend(name="quota-scheduling-test", targets={"target": 10})
+    manager = SessionManager(sessions_dir=tempfile.mkdtemp(), flush_interval=60)
+    clients = {}
+    for i in range(2):
+        username = f"scraper_{i}"
+        clients[username] = InstagramClient(username, "password", client=FakeClient(username, "password", backend=backend.name))
+        manager.save_session(username, clients[username])
+
+    tracker.record("scraper_0", requests=10)
+    for _ in range(5):
+        assert manager.get_best_session() is clients["scraper_1"]
+    assert manager.acquire(timeout=0) is clients["scraper_1"]
+    assert manager.acquire(timeout=0) is None
+    assert [session.username for session in manager.get_valid_sessions()] == ["scraper_1"]
+
+    # Requests are counted where they are sent, and refused once the quota is spent
+    for pk in range(10):
+        clients["scraper_1"].hydrate_user(1000 + pk)
+    assert tracker.usage("scraper_1")["hour"] == 10
+    with pytest.raises(QuotaExceeded):
+        clients["scraper_1"].hydrate_user(1010)
+    assert backend.get_stats()["requests"]["user_info"] == 10
+
+
+def test_wait_time_is_when_the_window_frees_up():
+    clock = Clock(datetime(2024, 1, 1, 10, 0))
+    tracker = QuotaTracker(hourly_quota=100, daily_quota=0, clock=clock)
+    tracker.record("scraper_0", requests=100)
+    # The 10:00 bucket has to slide 1% out of the window after 11:00
+    assert tracker.wait_time("scraper_0") == pytest.approx(3600 + 36)
+    with pytest.raises(QuotaExceeded) as excinfo:
+        tracker.reserve("scraper_0")
+    assert excinfo.value.retry_after == pytest.approx(3636)
+
+    clock.now = datetime(2024, 1, 1, 11, 30)
+    assert tracker.wait_time("scraper_0") == 0
+    tracker.reserve("scraper_0")
+    assert tracker.usage("scraper_0")["hour"] == pytest.approx(51)
+
+    # The daily quota binds until the whole 10:00 bucket is a day old
+    daily = QuotaTracker(hourly_quota=0, daily_quota=100, clock=Clock(datetime(2024, 1, 1, 10, 30)))
+    daily.record("scraper_0", requests=100)
+    assert daily.wait_time("scraper_0") == pytest.approx((23.5 + 0.01) * 3600)
+
+
+def test_concurrent_reservations_never_exceed_the_quota():
+    tracker = QuotaTracker(hourly_quota=100, daily_quota=0)
+    sent = []
+
+    def send():
+        for _ in range(50):
+            try:
+                tracker.reserve("scraper_0")
+                sent.append(1)
+            except QuotaExceeded:
+                pass
+
+    threads = [threading.Thread(target=send) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(sent) == 100
+    assert tracker.usage("scraper_0")["hour"] == 100
+
+
+def test_jobs_over_quota_are_parked_without_holding_workers():
+    tracker = scraper.quota._quota_tracker
+    result = run_benchmark(targets=2, followers=500, accounts=2, page_size=50, latency=0.001, rate=500, hourly_quota=60, timeout=3)
+
+    assert sum(result["requests_by_account"].values()) <= 120
+    # Waiting for the window, not failed, and no worker stuck waiting for a lease
+    assert result["session_statuses"] == ["running", "running"]
+    assert result["parked_pages"] >= 1
+    assert result["elapsed_seconds"] < 5
+    # The benchmark's own tracker is gone again
+    assert scraper.quota._quota_tracker is tracker
@@ -0,0 +1,45 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper.rate_limiter import RateLimiter, TokenBucket
+
+
+def test_additive_increase_on_success():
+    bucket = TokenBucket(rate=0.5, increase=0.1, max_rate=0.8)
+    for _ in range(5):
+        bucket.on_success()
+    assert abs(bucket.rate - 0.8) < 1e-9
+
+
+def test_multiplicative_decrease_and_escalating_cooldown():
+    bucket = TokenBucket(rate=1.0, decrease=0.5, cooldown=60, max_cooldown=300)
+    assert bucket.on_throttle() == 60
+    assert bucket.rate == 0.5
+    assert bucket.on_throttle() == 120
+    assert bucket.rate == 0.25
+    assert bucket.reserve() >= 119
+
+
+def test_reservations_queue_behind_each_other():
+    bucket = TokenBucket(rate=10.0)
+    waits = [bucket.reserve() for _ in range(3)]
+    assert waits[0] == 0
+    assert 0.09 < waits[1] <= 0.1
+    assert 0.19 < waits[2] <= 0.2
+
+
+def test_proxy_bucket_is_shared_between_accounts():
+    limiter = RateLimiter(account_rate=100.0, proxy_rate=10.0, max_rate=100.0)
+    assert limiter.reserve("account_a", "http://proxy:1") == 0
+    assert limiter.reserve("account_b", "http://proxy:1") > 0
+    assert limiter.reserve("account_c") == 0
+
+
+def test_snapshot_reports_rates():
+    limiter = RateLimiter(account_rate=0.5)
+    limiter.record_throttle("account_a", cooldown=0)
+    snapshot = limiter.snapshot()
+    assert snapshot[0]["name"] == "account_a"
+    assert snapshot[0]["rate_per_minute"] == 15.0
+    assert snapshot[0]["throttles"] == 1
@@ -0,0 +1,290 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pickle
+import tempfile
+import threading
+import time
+
+import pytest
+
+import scraper.profile_cache
+import scraper.quota
+import scraper.rate_limiter
+from benchmarks.fake_instagram import FakeClient, FakeInstagramBackend
+from scraper.circuit_breaker import CircuitBreakerRegistry, SessionUnavailable, get_circuit_breakers, set_circuit_breakers
+from scraper.instagram_client import InstagramClient
+from scraper.profile_cache import ProfileCache
+from scraper.quota import QuotaTracker
+from scraper.rate_limiter import RateLimiter
+from scraper.session_manager import SessionManager
+
+
+def test_sessions_are_written_behind_and_flushed_on_close(tmp_path):
+    backend = FakeInstagramBackend(name="session-manager-test", targets={"target": 10})
+    client = InstagramClient("scraper_0", "password", client=FakeClient("scraper_0", "password", backend=backend.name))
+
+    manager = SessionManager(sessions_dir=str(tmp_path), flush_interval=60)
+    manager.save_session("scraper_0", client)
+    # Nothing touches the disk on the hot path
+    assert not (tmp_path / "scraper_0.json").exists()
+
+    manager.increment_requests(client)
+    manager.increment_challenges(client)
+    manager.save_session("scraper_0", client)
+    # Saving again keeps the usage counters
+    assert manager.sessions.get("scraper_0").requests == 1
+    assert manager.sessions.get("scraper_0").challenges == 1
+
+    assert manager.flush() == 1
+    assert manager.flush() == 0
+    manager.mark_dirty(client)
+    manager.close()
+    assert (tmp_path / "scraper_0.json").exists()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_sessions_are_stored_as_json_and_rebuilt_lazily(tmp_path):
+    backend = FakeInstagramBackend(name="session-store-test", targets={"target": 10})
+    built = []
+
+    def factory(username, password, settings):
+        built.append(username)
+        return FakeClient(username, password, backend=backend.name, settings=settings)
+
+    manager = SessionManager(sessions_dir=str(tmp_path), flush_interval=60)
+    api = FakeClient("scraper_0", "secret-password", backend=backend.name)
+    client = InstagramClient("scraper_0", "secret-password", client=api)
+    manager.save_session("scraper_0", client)
+    manager.increment_challenges(client)
+    manager.close()
+
+    record = json.loads((tmp_path / "scraper_0.json").read_text())
+    assert record["version"] == 1
+    assert "secret-password" not in (tmp_path / "scraper_0.json").read_text()
+    assert len((tmp_path / "scraper_0.json").read_bytes()) < 1024
+
+    reloaded = SessionManager(sessions_dir=str(tmp_path), client_factory=factory)
+    entry = reloaded.sessions.get("scraper_0")
+    assert entry.challenges == 1
+    # The login check runs in the background: it rebuilds the client once,
+    # from the saved cookies and device ids, without logging in again
+    assert reloaded.validation_progress.wait(5)
+    assert entry.session.client.uuid == api.uuid
+    assert built == ["scraper_0"]
+    assert "login" not in backend.get_stats()["requests"]
+    reloaded.close()
+
+
+def test_pickled_sessions_are_migrated_to_json(tmp_path):
+    backend = FakeInstagramBackend(name="session-migration-test", targets={"target": 10})
+    legacy = InstagramClient("scraper_0", "password", client=FakeClient("scraper_0", "password", backend=backend.name))
+    # The layout pickled before the client became lazy
+    legacy.__dict__["client"] = legacy.__dict__.pop("_client")
+    del legacy.__dict__["_settings"], legacy.__dict__["client_factory"]
+    with open(tmp_path / "scraper_0.pkl", "wb") as f:
+        pickle.dump(legacy, f)
+
+    manager = SessionManager(sessions_dir=str(tmp_path), flush_interval=60)
+    assert manager.sessions.get("scraper_0").session.client.username == "scraper_0"
+    manager.close()
+
+    assert (tmp_path / "scraper_0.json").exists()
+    assert not (tmp_path / "scraper_0.pkl").exists()
+
+
+def test_session_selection_reads_cached_health():
+    set_circuit_breakers(CircuitBreakerRegistry(recovery_timeout=60))
+    backend = FakeInstagramBackend(name="session-health-test", targets={"target": 10})
+    manager = SessionManager(sessions_dir=tempfile.mkdtemp(), flush_interval=60, health_ttl=60)
+    for i in range(3):
+        username = f"scraper_{i}"
+        manager.save_session(username, InstagramClient(username, "password", client=FakeClient(username, "password", backend=backend.name)))
+
+    for _ in range(10):
+        assert manager.get_best_session() is not None
+    assert manager.get_session_stats()["valid_sessions"] == 3
+    # Picking sessions made no timeline requests
+    assert backend.get_stats()["requests"].get("timeline", 0) == 0
+
+    # An auth error makes the cached entry stale; the prober re-checks only that session
+    breaker = get_circuit_breakers().get("scraper_1")
+    breaker.record_failure(Exception("challenge_required"))
+    breaker.record_success()
+    assert manager.probe_health() == 1
+    assert backend.get_stats()["requests"]["timeline"] == 1
+    assert manager.probe_health() == 0
+    manager.close()
+
+
+
+def test_auth_errors_and_relogins_reach_the_session_manager(tmp_path, monkeypatch):
+    set_circuit_breakers(CircuitBreakerRegistry(recovery_timeout=60))
+    monkeypatch.setattr(scraper.profile_cache, "_profile_cache", ProfileCache(path=":memory:", ttl=0))
+    monkeypatch.setattr(scraper.quota, "_quota_tracker", QuotaTracker(hourly_quota=0, daily_quota=0))
+    monkeypatch.setattr(scraper.rate_limiter, "_rate_limiter", RateLimiter(account_rate=1000, min_rate=1000, max_rate=1000))
+    backend = FakeInstagramBackend(name="session-challenge-test", targets={"target": 10}, latency=0)
+    client = InstagramClient("scraper_0", "password", client=FakeClient("scraper_0", "password", backend=backend.name))
+    manager = SessionManager(sessions_dir=str(tmp_path), flush_interval=60, standby_accounts=[])
+    manager.save_session("scraper_0", client)
+    assert manager.flush() == 1
+
+    backend.account_state["scraper_0"] = "login_required"
+    with pytest.raises(SessionUnavailable):
+        client.hydrate_user(1000)
+    # Counted towards retiring the account, and written with the next flush
+    assert manager.sessions.get("scraper_0").challenges == 1
+    assert manager.flush() == 1
+
+    # A recovery probe logs in again: the renewed cookies are written too
+    registry = get_circuit_breakers()
+    registry.probe(registry.get("scraper_0"), client)
+    assert registry.is_available("scraper_0")
+    assert manager.flush() == 1
+    manager.close()
+
+def test_startup_registers_sessions_and_validates_them_in_the_background(tmp_path):
+    set_circuit_breakers(CircuitBreakerRegistry(recovery_timeout=60))
+    # scraper_0 is stuck in a challenge: its login check fails
+    backend = FakeInstagramBackend(name="session-startup-test", targets={"target": 10}, latency=0.05,
+                                   challenged_after={"scraper_0": 0})
+
+    def factory(username, password, settings):
+        return FakeClient(username, password, backend=backend.name, settings=settings)
+
+    writer = SessionManager(sessions_dir=str(tmp_path), flush_interval=60)
+    for i in range(40):
+        username = f"scraper_{i}"
+        writer.save_session(username, InstagramClient(username, "password", client=factory(username, "password", None)))
+    writer.close()
+
+    started = time.monotonic()
+    manager = SessionManager(sessions_dir=str(tmp_path), client_factory=factory)
+    assert time.monotonic() - started < 0.5
+    assert len(manager.sessions) == 40
+
+    # The first session handed out is one the background validation confirmed
+    session = manager.get_best_session()
+    assert session.username != "scraper_0"
+    assert manager.is_confirmed(session.username)
+
+    # 40 checks of ~50 ms each run concurrently, not one after another (2 s)
+    while manager.validating and time.monotonic() - started < 1.0:
+        time.sleep(0.02)
+    assert not manager.validating
+    assert not manager.is_session_valid("scraper_0")
+    manager.close()
+
+
+def test_leases_are_exclusive_and_served_in_order():
+    set_circuit_breakers(CircuitBreakerRegistry(recovery_timeout=60))
+    backend = FakeInstagramBackend(name="session-lease-test", targets={"target": 10})
+    manager = SessionManager(sessions_dir=tempfile.mkdtemp(), flush_interval=60)
+    for i in range(2):
+        username = f"scraper_{i}"
+        manager.save_session(username, InstagramClient(username, "password", client=FakeClient(username, "password", backend=backend.name)))
+
+    first = manager.acquire(timeout=1)
+    second = manager.acquire(timeout=1)
+    assert {first.username, second.username} == {"scraper_0", "scraper_1"}
+    # One job per account: a third caller times out, and nobody may jump the queue
+    assert manager.acquire(timeout=0.05) is None
+    assert not manager.try_acquire(first)
+
+    served = []
+    waiters = [threading.Thread(target=lambda n=n: served.append((n, manager.acquire(timeout=5)))) for n in range(2)]
+    for waiter in waiters:
+        waiter.start()
+        time.sleep(0.05)
+    assert manager.get_session_stats()["lease_waiters"] == 2
+    assert not manager.try_acquire(first)
+    manager.release(first)
+    time.sleep(0.05)
+    manager.release(second)
+    for waiter in waiters:
+        waiter.join()
+    assert served == [(0, first), (1, second)]
+
+    for _, session in served:
+        manager.release(session)
+    assert manager.get_session_stats()["leased_sessions"] == 0
+    assert manager.try_acquire(first)
+
+
+def test_leasing_and_picking_sessions_concurrently_does_not_deadlock():
+    set_circuit_breakers(CircuitBreakerRegistry(recovery_timeout=60))
+    backend = FakeInstagramBackend(name="session-lock-order-test", targets={"target": 10}, latency=0)
+    # Health entries go stale at once, so every pick wakes the health prober
+    manager = SessionManager(sessions_dir=tempfile.mkdtemp(), flush_interval=60, health_ttl=0.001, standby_accounts=[])
+    for i in range(3):
+        username = f"scraper_{i}"
+        manager.save_session(username, InstagramClient(username, "password", client=FakeClient(username, "password", backend=backend.name)))
+    deadline = time.monotonic() + 1
+
+    def lease():
+        while time.monotonic() < deadline:
+            session = manager.acquire(timeout=0.01)
+            if session:
+                manager.release(session)
+
+    def pick():
+        while time.monotonic() < deadline:
+            manager.get_best_session()
+
+    threads = [threading.Thread(target=target, daemon=True) for target in (lease, lease, pick, pick)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    manager.close()
+
+
+def test_warm_standby_session_is_swapped_in_when_active_ones_trip():
+    set_circuit_breakers(CircuitBreakerRegistry(recovery_timeout=60))
+    backend = FakeInstagramBackend(name="session-standby-test", targets={"target": 10})
+    built = []
+
+    def factory(username, password, settings):
+        built.append(username)
+        return FakeClient(username, password, backend=backend.name, settings=settings)
+
+    manager = SessionManager(
+        sessions_dir=tempfile.mkdtemp(),
+        flush_interval=60,
+        client_factory=factory,
+        standby_size=1,
+        standby_accounts=[],
+        credentials=lambda username: "password"
+    )
+    for i in range(3):
+        username = f"scraper_{i}"
+        manager.save_session(username, InstagramClient(username, "password", client=FakeClient(username, "password", backend=backend.name)))
+
+    deadline = time.monotonic() + 5
+    while not manager.standby and time.monotonic() < deadline:
+        time.sleep(0.01)
+    (standby,) = manager.standby
+    # Only now, so the warmer cannot log it in before the saved sessions exist
+    manager.standby_accounts = ["scraper_3"]
+    # The standby session takes no work while the rotation can
+    active = [session.username for session in manager.get_valid_sessions()]
+    assert standby not in active and len(active) == 2
+    for _ in range(5):
+        assert manager.get_best_session().username != standby
+
+    for username in active:
+        get_circuit_breakers().get(username).record_failure(Exception("challenge_required"))
+    # Swapped in without waiting, and the pool is refilled in the background by logging in scraper_3
+    session = manager.acquire(timeout=0)
+    assert session.username == standby
+    deadline = time.monotonic() + 5
+    while manager.standby != {"scraper_3"} and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.standby == {"scraper_3"}
+    assert built == ["scraper_3"]
+    assert manager.get_session_stats()["standby_sessions"] == 1
+    manager.release(session)
+    manager.close()
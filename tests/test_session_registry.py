@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper.session_registry import SessionRegistry
+
+
+class Client:
+    def __init__(self, username):
+        self.username = username
+
+
+def test_best_follows_challenges_then_last_use():
+    registry = SessionRegistry()
+    clients = {name: Client(name) for name in ("a", "b", "c")}
+    for name, client in clients.items():
+        registry.add(name, client)
+
+    # Oldest use first, and a used session goes to the back
+    assert registry.best(lambda entry: True).session_id == "a"
+    registry.update("a", requests=1, touch=True)
+    assert registry.best(lambda entry: True).session_id == "b"
+
+    # A challenge outweighs recency
+    registry.update("b", challenges=1)
+    assert [entry.session_id for entry in registry.ordered()] == ["c", "a", "b"]
+    assert registry.best(lambda entry: True).session_id == "c"
+
+    # Rejected sessions stay available for later picks
+    assert registry.best(lambda entry: entry.session_id == "b").session_id == "b"
+    assert registry.best(lambda entry: True).session_id == "c"
+    assert registry.best(lambda entry: False) is None
+
+    assert registry.find(clients["a"]).requests == 1
+    assert registry.find(Client("a")) is None
+    # Saving a new client for a known id keeps its counters
+    registry.add("b", Client("b"))
+    assert registry.get("b").challenges == 1
+
+
+def test_heap_stays_bounded_under_updates():
+    registry = SessionRegistry()
+    for i in range(300):
+        registry.add(f"s{i}", Client(f"s{i}"))
+    for n in range(20000):
+        entry = registry.best(lambda entry: True)
+        registry.update(entry.session_id, requests=1, touch=True)
+
+    assert len(registry.heap) <= 4 * len(registry) + 64
+    # Round-robin over equally clean sessions
+    requests = [entry.requests for entry in registry.values()]
+    assert max(requests) - min(requests) <= 1
@@ -0,0 +1,199 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queue
+import threading
+import time
+
+import tempfile
+
+import pytest
+from instagram_private_api.errors import ClientError
+
+import scraper.circuit_breaker
+import scraper.profile_cache
+import scraper.quota
+import scraper.rate_limiter
+from benchmarks.fake_instagram import FakeClient, FakeInstagramBackend
+from scraper.circuit_breaker import CircuitBreakerRegistry
+from scraper.instagram_client import InstagramClient
+from scraper.profile_cache import ProfileCache
+from scraper.quota import QuotaExceeded, QuotaTracker
+from scraper.rate_limiter import RateLimiter
+from scraper.session_manager import SessionManager
+from scraper.worker import ScrapeJob, ScrapeWorker
+
+
+def drain(result_queue):
+    results = []
+    while not result_queue.empty():
+        results.append(result_queue.get())
+    return results
+
+
+def test_checkpoint_waits_for_unfinished_pages():
+    results = queue.Queue()
+    job = ScrapeJob(1, "target", {"user_id": 7, "rank_token": "rt"}, max_in_flight=3)
+
+    assert job.page_fetched(0, "p1")["seq"] == 1
+    assert job.page_fetched(1, "p2")["seq"] == 2
+    assert job.page_fetched(2, None) is None
+
+    # Page 1 finishes first: the checkpoint must stay on page 0
+    job.complete_page(1, [{"username": "b"}], results, batch_size=50)
+    job.complete_page(2, [{"username": "c"}], results, batch_size=50)
+    assert [r["cursor"]["max_id"] for r in drain(results)] == [None, None]
+    assert not job.finish_if_idle()
+
+    job.complete_page(0, [{"username": "a"}, {"username": "b"}], results, batch_size=50)
+    (last,) = drain(results)
+    assert last["cursor"]["exhausted"]
+    # "b" was already published with page 1
+    assert [f["username"] for f in last["data"]["followers"]] == ["a"]
+    assert job.finish_if_idle()
+
+
+def test_in_flight_limit_defers_next_page():
+    results = queue.Queue()
+    job = ScrapeJob(1, "target", {"user_id": 7, "rank_token": "rt"}, max_in_flight=1)
+
+    assert job.page_fetched(0, "p1") is None
+    released = job.complete_page(0, [{"username": "a"}], results, batch_size=50)
+    assert released["seq"] == 1
+    assert job.cursor(1)["max_id"] == "p1"
+    assert drain(results)[0]["cursor"]["max_id"] == "p1"
+
+
+def test_full_result_queue_does_not_block_the_job():
+    results = queue.Queue(maxsize=1)
+    results.put({"filler": True})
+    job = ScrapeJob(1, "target", {"user_id": 7, "rank_token": "rt"}, max_in_flight=3)
+    job.page_fetched(0, "p1")
+    job.page_fetched(1, None)
+
+    # Both pages wait for the writer; page 0 is first in line
+    first = threading.Thread(target=job.complete_page, args=(0, [{"username": "a"}], results, 50), daemon=True)
+    first.start()
+    time.sleep(0.1)
+    second = threading.Thread(target=job.complete_page, args=(1, [{"username": "b"}], results, 50), daemon=True)
+    second.start()
+    time.sleep(0.1)
+    # Other pages can still claim followers and the job can be stopped meanwhile
+    claimed = []
+    stopper = threading.Thread(target=lambda: (claimed.append(job.claim(1, "b")), job.cancel()), daemon=True)
+    stopper.start()
+    stopper.join(2)
+    assert not stopper.is_alive()
+    assert claimed == [True] and job.is_stopped()
+
+    published = []
+    while len(published) < 3:
+        published.append(results.get(timeout=5))
+    first.join(5)
+    second.join(5)
+    # Checkpoints come out in frontier order
+    assert [r.get("cursor", {}).get("max_id") for r in published[1:]] == ["p1", None]
+    assert published[2]["cursor"]["exhausted"]
+
+
+def test_budget_and_cancellation_stop_the_job():
+    job = ScrapeJob(1, "target", {"user_id": 7, "rank_token": "rt"}, max_followers=2, max_in_flight=3)
+
+    assert job.claim(0, "a")
+    assert job.claim(1, "b")
+    # The budget is used up: nothing more is claimed and no page is chained
+    assert job.is_stopped()
+    assert not job.claim(1, "c")
+    assert job.page_fetched(0, "p1") is None
+    # A retried page keeps the followers it claimed before
+    assert job.claim(0, "a")
+
+    cancelled = ScrapeJob(2, "target", {"user_id": 7, "rank_token": "rt"}, max_in_flight=3)
+    cancelled.cancel()
+    assert not cancelled.claim(0, "a")
+    cancelled.skip_page(0)
+    assert cancelled.finish_if_idle()
+
+
+def test_throttled_hydration_gives_up_after_capped_rounds(monkeypatch):
+    monkeypatch.setattr(scraper.profile_cache, "_profile_cache", ProfileCache(path=":memory:", ttl=0))
+    monkeypatch.setattr(
+        scraper.rate_limiter,
+        "_rate_limiter",
+        RateLimiter(account_rate=1000, min_rate=1000, max_rate=1000, cooldown=0.001, max_cooldown=0.001)
+    )
+    # One request per minute: everything after the first is throttled
+    backend = FakeInstagramBackend(name="throttle-cap-test", targets={"target": 10}, max_requests_per_minute=1)
+    client = InstagramClient("scraper_0", "password", client=FakeClient("scraper_0", "password", backend=backend.name))
+    assert client.hydrate_user(1000)["pk"] == 1000
+
+    with pytest.raises(ClientError):
+        client._hydrate_with_backoff(1001)
+    rounds = InstagramClient.max_throttle_rounds * InstagramClient.max_throttle_retries
+    assert backend.get_stats()["requests"]["user_info"] == 1 + rounds
+
+    # The whole page fails instead of dropping its users, so the worker retries it
+    with pytest.raises(ClientError):
+        list(client.hydrate_users([{"pk": 1002, "username": "u1002"}]))
+
+    # A stopped job sends nothing more
+    job = ScrapeJob(1, "target", {"user_id": 7, "rank_token": "rt"})
+    job.cancel()
+    assert list(client.hydrate_users([{"pk": 1003, "username": "u1003"}], should_stop=job.is_stopped)) == []
+    assert client._hydrate_with_backoff(1003, should_stop=job.is_stopped) is None
+    assert backend.get_stats()["requests"]["user_info"] == 1 + 2 * rounds
+
+
+def test_job_waiting_for_an_account_keeps_its_place(monkeypatch):
+    monkeypatch.setattr(scraper.circuit_breaker, "_circuit_breakers", CircuitBreakerRegistry(recovery_timeout=60))
+    monkeypatch.setattr(scraper.quota, "_quota_tracker", QuotaTracker(hourly_quota=0, daily_quota=0))
+    backend = FakeInstagramBackend(name="lease-order-test", targets={"target": 10})
+    manager = SessionManager(sessions_dir=tempfile.mkdtemp(), flush_interval=60, standby_accounts=[])
+    manager.save_session("scraper_0", InstagramClient("scraper_0", "password", client=FakeClient("scraper_0", "password", backend=backend.name)))
+    held = manager.acquire(timeout=0)
+
+    served = []
+    job = ScrapeJob(1, "target", {"user_id": 7, "rank_token": "rt"}, leased=True, lease_timeout=5)
+    waiter = threading.Thread(target=lambda: served.append(("job", job.pager(manager))))
+    waiter.start()
+    time.sleep(0.5)
+    later = threading.Thread(target=lambda: served.append(("later", manager.acquire(timeout=5))))
+    later.start()
+    # The job keeps waiting past its quota re-checks, still ahead of the later caller
+    time.sleep(1.2)
+    manager.release(held)
+    waiter.join(5)
+    assert served == [("job", held)]
+
+    job.release_session(manager)
+    later.join(5)
+    assert [name for name, _ in served] == ["job", "later"]
+    manager.release(served[1][1])
+    manager.close()
+
+
+def test_page_over_quota_is_parked_even_when_quota_just_freed_up(monkeypatch):
+    monkeypatch.setattr(scraper.circuit_breaker, "_circuit_breakers", CircuitBreakerRegistry(recovery_timeout=60))
+    monkeypatch.setattr(scraper.quota, "_quota_tracker", QuotaTracker(hourly_quota=0, daily_quota=0))
+    manager = SessionManager(sessions_dir=tempfile.mkdtemp(), flush_interval=60, standby_accounts=[])
+    tasks = queue.Queue()
+    parked = []
+    worker = ScrapeWorker(tasks, queue.Queue(), None, manager, park=lambda task, delay: parked.append(delay))
+    fetched = []
+
+    def fetch(job, seq):
+        fetched.append(seq)
+        # Raised for an account whose window has slid on by the time the worker looks
+        raise QuotaExceeded("Hourly quota reached", retry_after=0)
+
+    monkeypatch.setattr(worker, "_fetch_followers", fetch)
+    job = ScrapeJob(1, "target", {"user_id": 7, "rank_token": "rt"})
+    tasks.put(job.task(0))
+    tasks.put(None)
+    worker.run()
+
+    # Parked for a while instead of fetched again straight away
+    assert fetched == [0]
+    assert parked == [ScrapeWorker.min_park_delay]
+    manager.close()
@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queue
+import threading
+import time
+
+from scraper.writer import ResultWriter, WriteFailed
+
+
+def _result(rows):
+    return {"success": True, "session_id": 1, "data": {"followers": [{"username": f"u{i}"} for i in range(rows)]}}
+
+
+def test_writer_flushes_on_size_and_time_and_drains_on_stop():
+    written = []
+    results = queue.Queue(maxsize=10)
+    writer = ResultWriter(results, written.append, flush_rows=100, flush_interval=0.3)
+    writer.start()
+
+    # Two results of 50 rows reach the size threshold
+    results.put(_result(50))
+    results.put(_result(50))
+    time.sleep(0.2)
+    assert [len(batch) for batch in written] == [2]
+
+    # A lone small result is written once the interval elapses
+    results.put(_result(5))
+    time.sleep(0.6)
+    assert [len(batch) for batch in written] == [2, 1]
+
+    # Whatever is still queued at shutdown is written before stop() returns
+    writer.flush_interval = 60
+    for _ in range(3):
+        results.put(_result(1))
+    writer.stop()
+    assert sum(len(batch) for batch in written) == 6
+    assert not writer.is_alive()
+
+
+def test_full_queue_blocks_producers_until_the_writer_catches_up():
+    release = threading.Event()
+    written = []
+
+    def slow_write(batch):
+        release.wait()
+        written.append(batch)
+
+    results = queue.Queue(maxsize=2)
+    writer = ResultWriter(results, slow_write, flush_rows=1, flush_interval=0.05)
+    writer.start()
+
+    produced = []
+
+    def produce():
+        for i in range(6):
+            results.put(_result(1))
+            produced.append(i)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    time.sleep(0.3)
+    # One result is being written, two wait in the queue: the producer is held back
+    assert len(produced) < 6
+    assert producer.is_alive()
+
+    release.set()
+    producer.join(timeout=5)
+    writer.stop()
+    assert len(produced) == 6
+    assert sum(len(batch) for batch in written) == 6
+
+
+def test_failed_writes_are_retried_in_order_then_set_aside():
+    written = []
+    calls = []
+
+    def flaky_write(batch):
+        calls.append([result["session_id"] for result in batch])
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        # Session 1 can never be stored; the others are
+        written.extend(result for result in batch if result["session_id"] != 1)
+        unwritten = [result for result in batch if result["session_id"] == 1]
+        if unwritten:
+            raise WriteFailed(f"{len(unwritten)} results not stored", unwritten)
+
+    results = queue.Queue()
+    writer = ResultWriter(results, flaky_write, flush_rows=1, flush_interval=0.05)
+    writer.retry_delay = 0.05
+    writer.max_attempts = 4
+    results.put(dict(_result(1), session_id=1))
+    results.put(dict(_result(1), session_id=2))
+    writer.start()
+    time.sleep(0.3)
+    results.put(dict(_result(2), session_id=3))
+    writer.stop()
+
+    # Nothing dropped: every result is written once or kept aside, and the
+    # failed one is always retried ahead of the results queued after it
+    assert all(call[0] == 1 for call in calls[:4])
+    assert [result["session_id"] for result in written] == [2, 3]
+    assert [result["session_id"] for result in writer.dead_letters] == [1]
+    assert writer.get_stats()["dead_letters"] == 1